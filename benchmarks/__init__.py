@@ -0,0 +1,3 @@
+"""
+This package contains offline benchmarks for the forbid_secrets hooks.
+"""
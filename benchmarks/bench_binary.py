@@ -0,0 +1,112 @@
+"""
+Benchmarks scanning a tree of mixed text and binary files with the binary
+files rejected from their first bytes, against decoding every file whole
+and running the detectors on it, replacing what is not UTF-8.
+
+The tree holds manifests, compressed archives and random-byte assets, and
+Latin-1 and UTF-16 files with a secret, which decoding as UTF-8 misses.
+
+Usage:
+    python -m benchmarks.bench_binary [--text N] [--binary N]
+        [--binary-size KB] [--repeat N]
+"""
+
+import argparse
+import gzip
+import os
+import random
+import sys
+import tempfile
+import timeit
+from typing import List
+
+from benchmarks.corpus import SAMPLE_SECRETS, clean_yaml
+from hooks.detectors import SECRET_CHECKS, DetectorEngine
+from hooks.forbid_secrets import ENCRYPTED_FILE_REGEX, scan_file
+
+
+def write_tree(
+    root: str, text: int, binary: int, binary_size: int
+) -> List[str]:
+    """Writes the mixed tree and returns the paths of its files."""
+    rng = random.Random(0)
+    paths = []
+    for i in range(text):
+        path = os.path.join(root, f"manifest-{i:04d}.yaml")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(clean_yaml(rng, 200))
+        paths.append(path)
+    for i in range(binary):
+        if i % 2:
+            data = rng.randbytes(binary_size)
+            path = os.path.join(root, f"asset-{i:04d}.png")
+        else:
+            text_data = clean_yaml(rng, binary_size // 16).encode()
+            data = gzip.compress(text_data, mtime=0)
+            path = os.path.join(root, f"archive-{i:04d}.gz")
+        with open(path, "wb") as file:
+            file.write(data)
+        paths.append(path)
+    for codec in ("latin-1", "utf-16"):
+        path = os.path.join(root, f"secret-{codec}.yaml")
+        content = f"name: café\n{SAMPLE_SECRETS['gcp-api-key']}\n"
+        with open(path, "wb") as file:
+            file.write(content.encode(codec))
+        paths.append(path)
+    return paths
+
+
+def decode_whole(path: str) -> List[str]:
+    """Reads and decodes the whole file as UTF-8, then scans it."""
+    with open(path, "r", encoding="utf-8", errors="replace") as file:
+        content = file.read()
+    if ENCRYPTED_FILE_REGEX.search(content):
+        return []
+    return list(DetectorEngine.for_ids(SECRET_CHECKS).scan(content))
+
+
+def sniffed(path: str) -> List[str]:
+    """Scans the file as the hooks do, rejecting binary files early."""
+    return scan_file(path, list(SECRET_CHECKS), budget=0).detectors
+
+
+def main() -> int:
+    """Runs the benchmark and prints the results."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--text", type=int, default=500)
+    parser.add_argument("--binary", type=int, default=200)
+    parser.add_argument("--binary-size", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        paths = write_tree(
+            root, args.text, args.binary, args.binary_size * 1024
+        )
+        size = sum(os.path.getsize(path) for path in paths) / 1e6
+        print(
+            f"{args.text} text and {args.binary} binary files, {size:.1f} MB"
+        )
+        print(f"{'method':14} {'time':>10} {'encoded secrets':>16}")
+        results = {}
+        methods = (("decode whole", decode_whole), ("sniffed", sniffed))
+        for name, scan in methods:
+            elapsed = min(
+                timeit.repeat(
+                    lambda s=scan: [s(path) for path in paths],
+                    number=1,
+                    repeat=args.repeat,
+                )
+            )
+            found = sum(bool(scan(path)) for path in paths[-2:])
+            results[name] = elapsed
+            print(f"{name:14} {elapsed * 1000:8.1f}ms {found:>14}/2")
+    speedup = results["decode whole"] / results["sniffed"]
+    print(f"speedup: {speedup:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Benchmarks running the hooks through the scan daemon against starting them
+for every commit, on a handful of files.
+
+Usage:
+    python -m benchmarks.bench_daemon [--files N] [--repeat N]
+"""
+
+import argparse
+import os
+import random
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import clean_yaml, install_fake_sops
+from hooks import client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def prepare_repository(directory: str, files: int) -> dict:
+    """Creates a repository the environment checks pass in.
+
+    Returns:
+        The environment to run the hooks with.
+    """
+    subprocess.run(["git", "init", "-q", directory], check=True)
+    for name in (".sops.yaml", ".age.pub", ".age.agekey"):
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write("age: <PUBLIC_KEY>\n")
+    rng = random.Random(0)
+    for i in range(files):
+        path = os.path.join(directory, f"manifest-{i}.yaml")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(clean_yaml(rng, 200))
+
+    bin_dir = os.path.join(directory, ".bin")
+    os.mkdir(bin_dir)
+    age = os.path.join(bin_dir, "age")
+    with open(age, "w", encoding="utf-8") as file:
+        file.write("#!/bin/sh\n")
+    os.chmod(age, os.stat(age).st_mode | stat.S_IEXEC)
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    env["PATH"] = install_fake_sops(bin_dir)
+    env["PYTHONPATH"] = ROOT
+    env["SOPS_AGE_KEY_FILE"] = os.path.join(directory, ".age.agekey")
+    return env
+
+
+def timed(command, env, repeat: int) -> float:
+    """Returns the mean wall time of a command."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        subprocess.run(command, env=env, check=True, capture_output=True)
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> int:
+    """Runs the benchmark and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = prepare_repository(directory, args.files)
+        os.chdir(directory)
+        hook_args = ["--hook-id", "all"] + sorted(
+            name for name in os.listdir(".") if name.endswith(".yaml")
+        )
+        python = [sys.executable, "-m"]
+
+        interpreter = timed([sys.executable, "-c", "pass"], env, args.repeat)
+        direct = timed(
+            python + ["hooks.forbid_secrets"] + hook_args, env, args.repeat
+        )
+        daemon = subprocess.Popen(  # pylint: disable=consider-using-with
+            python + ["hooks.forbid_secrets", "--serve"],
+            env=env,
+            stdout=subprocess.PIPE,
+        )
+        try:
+            daemon.stdout.readline()
+            via_client = timed(
+                python + ["hooks.client"] + hook_args, env, args.repeat
+            )
+            os.environ.update(env)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                if client.run(hook_args)[0] != 0:
+                    print("ERROR: the daemon reported a failure")
+                    return 1
+            round_trip = (time.perf_counter() - start) / args.repeat
+        finally:
+            client.request({"stop": True})
+            daemon.wait()
+
+    print(f"{args.files} files, mean of {args.repeat} runs:")
+    print(f"  python -c pass:        {interpreter * 1000:7.1f}ms")
+    print(f"  forbid_secrets:        {direct * 1000:7.1f}ms")
+    print(f"  forbid_secrets_client: {via_client * 1000:7.1f}ms")
+    print(f"  daemon round trip:     {round_trip * 1000:7.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
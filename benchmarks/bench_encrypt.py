@@ -0,0 +1,63 @@
+"""
+Benchmarks encrypting files one sops process at a time against the batched,
+concurrent encryption stage, using a fake sops stand-in.
+
+Usage:
+    python -m benchmarks.bench_encrypt [--files N] [--jobs N] [--delay S]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import SAMPLE_SECRETS, install_fake_sops
+from hooks.sops import run_sops, run_sops_batch
+
+
+def write_secrets(directory: str, count: int):
+    """Writes files that each hold a secret."""
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"secret-{i:04d}.yaml")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(SAMPLE_SECRETS["aws-access-key-id"] + "\n")
+        paths.append(path)
+    return paths
+
+
+def main() -> int:
+    """Runs the benchmark and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=64)
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["PATH"] = install_fake_sops(directory)
+        os.environ["FAKE_SOPS_DELAY"] = str(args.delay)
+
+        paths = write_secrets(directory, args.files)
+        start = time.perf_counter()
+        serial_errors = [run_sops("encrypt", path) for path in paths]
+        serial = time.perf_counter() - start
+
+        paths = write_secrets(directory, args.files)
+        start = time.perf_counter()
+        batch_errors = run_sops_batch("encrypt", paths, args.jobs)
+        batch = time.perf_counter() - start
+
+    if any(serial_errors) or any(batch_errors.values()):
+        print("ERROR: fake sops failed")
+        return 1
+    print(f"files: {args.files}, sops start-up: {args.delay * 1000:.0f}ms")
+    print(f"one at a time: {serial:8.3f}s")
+    print(f"batched:       {batch:8.3f}s ({args.jobs} jobs)")
+    print(f"speedup:       {serial / batch:8.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Benchmarks excluding files with the patterns compiled into a single regex,
+against searching each --exclude pattern in each path, and matching the
+globs of .forbidsecretsignore with excluded directories pruned, against
+matching them against every file.
+
+Paths are those of a synthetic repository of nested directories, like the
+file list of a pre-commit run with --all-files. The patterns mix anchored
+directories, file name suffixes and substrings, and every other glob
+excludes a directory.
+
+Usage:
+    python -m benchmarks.bench_exclude [--paths N] [--patterns N]
+        [--repeat N]
+"""
+
+import argparse
+import random
+import re
+import sys
+import timeit
+from typing import List
+
+from hooks.exclude import ExcludeMatcher, parse_glob
+
+
+def synthetic_paths(count: int, rng: random.Random) -> List[str]:
+    """Returns paths spread over apps and their nested directories."""
+    paths = []
+    for i in range(count):
+        app = f"apps/app-{rng.randrange(200):03d}"
+        depth = "/".join(
+            f"d{rng.randrange(5)}" for _ in range(rng.randrange(4))
+        )
+        paths.append(f"{app}/{depth}/file-{i}.yaml".replace("//", "/"))
+    return paths
+
+
+def main() -> int:
+    """Runs the benchmark and prints the results."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--paths", type=int, default=20_000)
+    parser.add_argument("--patterns", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    paths = synthetic_paths(args.paths, rng)
+    kinds = (
+        lambda i: rf"^apps/app-{i:03d}/",
+        lambda i: rf"file-{i}\d*\.ya?ml$",
+        lambda i: rf"/d{i}/",
+        lambda i: rf"\.j{i}$",
+    )
+    patterns = [kinds[i % 4](i) for i in range(args.patterns)]
+    globs = [
+        parse_glob(f"apps/app-{i:03d}/" if i % 2 else f"**/file-{i}*.y*ml")
+        for i in range(args.patterns)
+    ]
+    compiled = [re.compile(pattern) for pattern in patterns]
+
+    def one_by_one() -> List[str]:
+        return [p for p in paths if not any(r.search(p) for r in compiled)]
+
+    def combined() -> List[str]:
+        matcher = ExcludeMatcher(patterns)
+        return [p for p in paths if not matcher.excluded(p)]
+
+    def every_file() -> List[str]:
+        # The directory globs, matched against each file's directories
+        regexes = [re.compile(g.regex) for g in globs]
+        kept = []
+        for path in paths:
+            parts = path.split("/")
+            prefixes = ["/".join(parts[:n]) for n in range(1, len(parts))]
+            if not any(
+                r.fullmatch(prefix) for r in regexes for prefix in prefixes
+            ) and not any(r.fullmatch(path) for r in regexes):
+                kept.append(path)
+        return kept
+
+    def pruned() -> List[str]:
+        matcher = ExcludeMatcher((), globs)
+        return [p for p in paths if not matcher.excluded(p)]
+
+    print(f"{args.paths} paths, {args.patterns} patterns")
+    print(f"{'method':22} {'time':>10} {'kept':>7}")
+    for labels, before, after in (
+        (("regex: one by one", "regex: combined"), one_by_one, combined),
+        (("glob: every file", "glob: pruned"), every_file, pruned),
+    ):
+        assert before() == after()
+        times = [
+            min(timeit.repeat(f, number=1, repeat=args.repeat))
+            for f in (before, after)
+        ]
+        for label, elapsed in zip(labels, times):
+            print(f"{label:22} {elapsed * 1000:8.1f}ms {len(after()):>7}")
+        print(f"{'speedup':22} {times[0] / times[1]:9.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
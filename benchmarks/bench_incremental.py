@@ -0,0 +1,75 @@
+"""
+Benchmarks scanning only the lines a staged diff adds against scanning the
+whole staged file, for a one-line change to a large values file.
+
+Usage:
+    python -m benchmarks.bench_incremental [--lines N [N ...]]
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import SAMPLE_SECRETS, clean_yaml
+from hooks import git
+from hooks.detectors import resolve_hook_ids
+from hooks.forbid_secrets import scan_staged
+
+
+def run(*command: str) -> None:
+    """Runs a git command quietly."""
+    subprocess.run(["git", *command], check=True, capture_output=True)
+
+
+def main() -> int:
+    """Runs the benchmark and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--lines", type=int, nargs="+", default=[20_000, 200_000]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--hook-id", default="all")
+    args = parser.parse_args()
+    hook_ids = resolve_hook_ids(args.hook_id)
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        run("init", "-q")
+        git._rev_parse.cache_clear()  # pylint: disable=protected-access
+        for lines in args.lines:
+            content = clean_yaml(random.Random(0), lines)
+            with open("values.yaml", "w", encoding="utf-8") as file:
+                file.write(content)
+            run("add", "values.yaml")
+            run("-c", "user.name=b", "-c", "user.email=b@b", "commit", "-qm.")
+            with open("values.yaml", "a", encoding="utf-8") as file:
+                file.write(SAMPLE_SECRETS["jwt"] + "\n")
+            run("add", "values.yaml")
+
+            timings = {}
+            for incremental in (False, True):
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    (result,) = scan_staged(
+                        ["values.yaml"], hook_ids, incremental=incremental
+                    )
+                    if result.detectors != ["jwt"]:
+                        print(f"ERROR: found {result.detectors}")
+                        return 1
+                timings[incremental] = (
+                    time.perf_counter() - start
+                ) / args.repeat
+            print(
+                f"{lines} lines: full {timings[False] * 1000:.1f}ms, "
+                f"incremental {timings[True] * 1000:.1f}ms, "
+                f"speedup {timings[False] / timings[True]:.1f}x"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
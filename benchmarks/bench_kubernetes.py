@@ -0,0 +1,118 @@
+"""
+Benchmarks finding unencrypted Kubernetes Secrets in large manifest bundles
+with the line probe and safe loader against a full round-trip parse.
+
+Usage:
+    python -m benchmarks.bench_kubernetes [--documents N [N ...]]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from ruamel.yaml import YAML  # pylint: disable=import-error
+
+from hooks.forbid_secrets import ScanContext
+
+DEPLOYMENT = """\
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: app-{i}
+  labels:
+    app: app-{i}  # the app label
+spec:
+  replicas: 2
+  template:
+    spec:
+      containers:
+        - name: app
+          image: registry.example.com/app:{i}
+          envFrom:
+            - secretRef:
+                name: app-{i}
+"""
+
+ENCRYPTED_SECRET = """\
+apiVersion: v1
+kind: Secret
+metadata:
+  name: app-{i}
+data:
+  password: ENC[AES256_GCM,data:ZmFrZQ==,type:str]
+sops:
+  version: 3.8.1
+"""
+
+UNENCRYPTED_SECRET = """\
+apiVersion: v1
+kind: Secret
+metadata:
+  name: last
+stringData:
+  password: hunter2
+"""
+
+
+def write_bundle(path: str, documents: int) -> None:
+    """Writes Deployments and encrypted Secrets, then one plain Secret."""
+    with open(path, "w", encoding="utf-8") as file:
+        for i in range(documents - 1):
+            template = ENCRYPTED_SECRET if i % 10 == 0 else DEPLOYMENT
+            file.write(template.format(i=i) + "---\n")
+        file.write(UNENCRYPTED_SECRET)
+
+
+def round_trip(path: str) -> bool:
+    """The previous path: round-trip parse every document."""
+    with open(path, "r", encoding="utf-8") as file:
+        for doc in YAML(typ="rt").load_all(file):
+            if (
+                isinstance(doc, dict)
+                and doc.get("kind") == "Secret"
+                and "sops" not in doc
+            ):
+                return True
+    return False
+
+
+def probed(path: str) -> bool:
+    """The line probe, parsing only candidate documents."""
+    return ScanContext(path).kubernetes_secret
+
+
+def main() -> int:
+    """Runs the benchmark and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--documents", type=int, nargs="+", default=[1000, 5000]
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for documents in args.documents:
+            path = os.path.join(directory, f"bundle-{documents}.yaml")
+            write_bundle(path, documents)
+            timings = {}
+            for name, function in (
+                ("round trip", round_trip),
+                ("probed", probed),
+            ):
+                start = time.perf_counter()
+                if not function(path):
+                    print(f"ERROR: {name} missed the unencrypted Secret")
+                    return 1
+                timings[name] = time.perf_counter() - start
+            print(
+                f"{documents} documents: "
+                f"round trip {timings['round trip']:.3f}s, "
+                f"probed {timings['probed']:.3f}s, "
+                f"speedup {timings['round trip'] / timings['probed']:.1f}x"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Benchmarks scanning large files by reading them whole against scanning them
+from a memory map or as a stream of chunks, in time and peak memory.
+
+Usage:
+    python -m benchmarks.bench_large_files [--sizes MB [MB ...]]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.corpus import SAMPLE_SECRETS, clean_yaml
+from hooks.detectors import SECRET_CHECKS, DetectorEngine
+from hooks.forbid_secrets import is_encrypted_file
+from hooks.scan import scan_large_file, scan_stream
+
+
+def write_large_file(path: str, megabytes: int) -> None:
+    """Writes a large manifest with a secret at the very end."""
+    block = clean_yaml(random.Random(0), 2000).encode()
+    with open(path, "wb") as file:
+        for _ in range(megabytes * 1024 * 1024 // len(block)):
+            file.write(block)
+        file.write(SAMPLE_SECRETS["jwt"].encode() + b"\n")
+
+
+def read_whole(path: str):
+    """The small file path: decode the whole file, twice."""
+    is_encrypted_file(path)
+    with open(path, "r", encoding="utf-8") as file:
+        return list(DetectorEngine.for_ids(SECRET_CHECKS).scan(file.read()))
+
+
+def memory_mapped(path: str):
+    """The large file path: scan the memory-mapped bytes."""
+    return scan_large_file(path, list(SECRET_CHECKS))[1]
+
+
+def streamed(path: str):
+    """The fallback path: scan the file in overlapping chunks."""
+    with open(path, "rb") as file:
+        return scan_stream(file, DetectorEngine.for_ids(SECRET_CHECKS))[1]
+
+
+def measure(function, path):
+    """Returns the result, wall time and peak traced memory of a call."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(path)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main() -> int:
+    """Runs the benchmark and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 64])
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'method':14} {'time':>9} {'peak memory':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for megabytes in args.sizes:
+            path = os.path.join(directory, f"large-{megabytes}.yaml")
+            write_large_file(path, megabytes)
+            for name, function in (
+                ("read whole", read_whole),
+                ("memory mapped", memory_mapped),
+                ("streamed", streamed),
+            ):
+                result, elapsed, peak = measure(function, path)
+                if result != ["jwt"]:
+                    print(f"ERROR: {name} found {result}")
+                    return 1
+                print(
+                    f"{megabytes:>4}MB {name:14} {elapsed:8.3f}s "
+                    f"{peak / 1024 / 1024:10.1f}MB"
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
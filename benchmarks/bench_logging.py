@@ -0,0 +1,100 @@
+"""
+Micro-benchmarks the buffered log against the per-call debug() it replaced,
+which looked up the hostname, the date and DEBUG_LEVEL for every message,
+for messages that are printed and for messages below the level threshold.
+Both write to os.devnull.
+
+Usage:
+    python -m benchmarks.bench_logging [--messages N] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from typing import Callable, TextIO
+
+from hooks.log import DEBUG_LEVELS, Logger
+
+
+def legacy_debug(log_file: TextIO) -> Callable[..., None]:
+    """Returns the debug() of the hooks before the log was buffered."""
+
+    def debug(level: int, *messages: str) -> None:
+        debug_levels = ["INFO", "WARN", "ERROR", "DEBUG", "TRACE", "FATAL"]
+        color_codes = [
+            "\033[1;32m",
+            "\033[1;33m",
+            "\033[1;31m",
+            "\033[1;34m",
+            "\033[1;38;5;208m",
+            "\033[1;3;31m",
+        ]
+        # pylint: disable=import-outside-toplevel
+        from datetime import datetime
+        import socket
+
+        reset_color = "\033[0m"
+        current_date = datetime.now().strftime("%b %d %H:%M:%S")
+        hostname = socket.gethostname()
+
+        if (
+            level <= DEBUG_LEVELS.get(os.environ.get("DEBUG_LEVEL", "WARN"), 1)
+            or level == DEBUG_LEVELS["FATAL"]
+        ):
+            color = color_codes[level]
+            level_str = debug_levels[level]
+            print(
+                f"{current_date} {hostname} {color}{level_str}:{reset_color}"
+                f"\t{color}{' '.join(messages)}{reset_color}",
+                file=log_file,
+            )
+
+    return debug
+
+
+def main() -> int:
+    """Runs the benchmark and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        logger = Logger(devnull)
+
+        def buffered(level: int) -> None:
+            for i in range(args.messages):
+                logger.debug(level, f"File is already encrypted: {i}.yaml")
+            logger.flush()
+
+        legacy = legacy_debug(devnull)
+
+        def unbuffered(level: int) -> None:
+            for i in range(args.messages):
+                legacy(level, f"File is already encrypted: {i}.yaml")
+
+        print(f"{args.messages} messages")
+        print(f"{'level':12} {'legacy':>10} {'buffered':>10} {'speedup':>8}")
+        for name in ("WARN", "DEBUG"):
+            level = DEBUG_LEVELS[name]
+            before = min(
+                timeit.repeat(
+                    lambda: unbuffered(level), number=1, repeat=args.repeat
+                )
+            )
+            after = min(
+                timeit.repeat(
+                    lambda: buffered(level), number=1, repeat=args.repeat
+                )
+            )
+            label = "printed" if name == "WARN" else "filtered"
+            print(
+                f"{label:12} {before * 1000:8.2f}ms {after * 1000:8.2f}ms"
+                f" {before / after:7.1f}x"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+Micro-benchmarks the literal prefix prefilter against a plain regex search
+for each detector.
+
+Usage:
+    python -m benchmarks.bench_prefilter [--files N] [--lines N]
+"""
+
+import argparse
+import random
+import sys
+import timeit
+
+from benchmarks.corpus import SAMPLE_SECRETS, clean_yaml
+from hooks.detectors import DETECTORS
+
+
+def main() -> int:
+    """Runs the benchmark and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    clean = [clean_yaml(rng, args.lines) for _ in range(args.files)]
+    dirty = [c + "\n".join(SAMPLE_SECRETS.values()) for c in clean[:50]]
+    size = sum(len(c) for c in clean) / 1e6
+
+    print(f"clean corpus: {args.files} files, {size:.1f} MB")
+    print(f"{'detector':28} {'regex':>10} {'prefilter':>10} {'speedup':>8}")
+    total_regex = total_prefilter = 0.0
+    for detector in DETECTORS.values():
+        for content in dirty:
+            expected = detector.regex.search(content)
+            assert detector.search(content).span() == expected.span()
+
+        regex = min(
+            timeit.repeat(
+                lambda d=detector: [d.regex.search(c) for c in clean],
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        prefilter = min(
+            timeit.repeat(
+                lambda d=detector: [d.search(c) for c in clean],
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        total_regex += regex
+        total_prefilter += prefilter
+        print(
+            f"{detector.id:28} {regex * 1000:8.2f}ms {prefilter * 1000:8.2f}ms"
+            f" {regex / prefilter:7.1f}x"
+        )
+    print(
+        f"{'total':28} {total_regex * 1000:8.2f}ms "
+        f"{total_prefilter * 1000:8.2f}ms {total_regex / total_prefilter:7.1f}x"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
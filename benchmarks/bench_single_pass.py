@@ -0,0 +1,90 @@
+"""
+Benchmarks running every detector in a single pass against running the
+hooks one by one.
+
+Usage:
+    python -m benchmarks.bench_single_pass [--files N] [--lines N]
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import write_corpus
+from hooks.detectors import SECRET_CHECKS, DetectorEngine
+
+
+def read(path: str) -> str:
+    """Reads a file the way the hooks do."""
+    with open(path, "r", encoding="utf-8") as file:
+        return file.read()
+
+
+def per_hook(paths):
+    """Runs each hook over every file, one hook at a time."""
+    found = set()
+    for hook_id, check_function in SECRET_CHECKS.items():
+        for path in paths:
+            if check_function(read(path)):
+                found.add((path, hook_id))
+    return found
+
+
+def single_pass(paths):
+    """Runs every detector over each file in a single pass."""
+    engine = DetectorEngine.for_ids(SECRET_CHECKS)
+    found = set()
+    for path in paths:
+        for hook_id in engine.scan(read(path)):
+            found.add((path, hook_id))
+    return found
+
+
+def startup_time() -> float:
+    """Measures the interpreter startup and import time of one hook."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", "import hooks.detectors"], check=True
+    )
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    """Runs the benchmark and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--lines", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_corpus(directory, args.files, args.lines)
+
+        start = time.perf_counter()
+        expected = per_hook(paths)
+        per_hook_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = single_pass(paths)
+        single_pass_time = time.perf_counter() - start
+
+    if actual != expected:
+        print("ERROR: single pass findings differ from per-hook findings")
+        return 1
+
+    startup = startup_time()
+    hooks = len(SECRET_CHECKS)
+    print(f"files: {args.files}, findings: {len(actual)}")
+    print(f"per-hook:    {per_hook_time:8.3f}s ({hooks} reads per file)")
+    print(f"single pass: {single_pass_time:8.3f}s (1 read per file)")
+    print(f"speedup:     {per_hook_time / single_pass_time:8.2f}x")
+    print(
+        f"startup:     {startup:8.3f}s per process, "
+        f"{startup * (hooks - 1):.3f}s saved by running one hook"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+A stand-in for the sops binary used by the benchmarks and tests.
+
+It sleeps for FAKE_SOPS_DELAY seconds (default 0.05) to simulate the sops
+start-up, .sops.yaml parsing and key loading, then rewrites the file in
+place. Files whose name contains "fail" are rejected. The keyservice command
+listens on a unix socket until it is terminated.
+"""
+
+import os
+import socket
+import sys
+import time
+
+
+def keyservice(argv):
+    """Listens on the unix socket given with --address until killed."""
+    address = argv[argv.index("--address") + 1]
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(address)
+    server.listen()
+    while True:
+        time.sleep(1)
+
+
+def main(argv):
+    """Encrypts or decrypts the file given last on the command line."""
+    if argv[:1] == ["keyservice"]:
+        keyservice(argv)
+
+    delay = float(os.environ.get("FAKE_SOPS_DELAY", "0.05"))
+    if "--keyservice" in argv:
+        delay /= 2
+    time.sleep(delay)
+
+    path = argv[-1]
+    if "fail" in os.path.basename(path):
+        print(f"Error: no matching creation rules found for {path}", file=sys.stderr)
+        return 1
+    with open(path, "r", encoding="utf-8") as file:
+        content = file.read()
+    if "--encrypt" in argv:
+        content += "ENC[AES256_GCM,data:ZmFrZQ==,type:str]\n"
+    else:
+        content = content.replace("ENC[AES256_GCM,data:ZmFrZQ==,type:str]\n", "")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(content)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,387 @@
+"""
+Runs every stage of the hooks over a synthetic repository and reports the
+time of each stage, as a table and optionally as JSON, to track performance
+across releases. Runs offline: sops is replaced by a stand-in.
+
+Stages:
+    startup          importing hooks.forbid_secrets in a new interpreter
+    preflight-cold   the environment checks, without a snapshot
+    preflight-warm   the environment checks, with a current snapshot
+    encrypted-check  detecting files encrypted with SOPS
+    detection        every detector over the content of each manifest
+    detection-large  every detector over the large files, memory-mapped
+    yaml-parse       finding unencrypted Kubernetes Secrets
+    scan             scanning every file, as the hook does without a cache
+    encryption       encrypting the files with secrets with the fake sops
+
+Usage:
+    python -m benchmarks.suite [--files N] [--repeat N] [--json FILE]
+        [--baseline FILE [--max-regression RATIO]]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.bench_daemon import prepare_repository
+from benchmarks.corpus import Repository, write_repository
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Bump when the layout of the JSON results changes
+RESULTS_FORMAT = 1
+
+STAGES = (
+    "startup",
+    "preflight-cold",
+    "preflight-warm",
+    "encrypted-check",
+    "detection",
+    "detection-large",
+    "yaml-parse",
+    "scan",
+    "encryption",
+)
+
+
+def measure(
+    function: Callable[[], object],
+    repeat: int,
+    items: int = 1,
+    size: int = 0,
+    setup: Optional[Callable[[], object]] = None,
+) -> dict:
+    """Times a stage several times.
+
+    Args:
+        function: The stage.
+        repeat: The number of runs.
+        items: The number of files or runs the stage handles per run.
+        size: The number of bytes the stage handles per run.
+        setup: Run before each run, untimed (optional).
+
+    Returns:
+        The best, median and mean wall time in seconds, with the
+        throughput of the best run.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    result = {
+        "best": best,
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "runs": repeat,
+        "items": items,
+        "bytes": size,
+        "items_per_second": items / best if best else None,
+    }
+    if size:
+        result["mb_per_second"] = size / 1e6 / best if best else None
+    return result
+
+
+def interpreter_time(code: str, env: dict, repeat: int) -> List[float]:
+    """Returns the wall times of running code in new interpreters."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", code], env=env, check=True, cwd=ROOT
+        )
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run_stages(
+    repository: Repository, stages: List[str], repeat: int, jobs: int
+) -> Dict[str, dict]:
+    """Runs the selected stages in the repository, which must be current.
+
+    Args:
+        repository: The synthetic repository.
+        stages: The names of the stages to run.
+        repeat: The number of runs of each stage.
+        jobs: The number of concurrent sops processes.
+
+    Returns:
+        The measurements of each stage, in order.
+    """
+    # pylint: disable=import-outside-toplevel
+    from hooks import forbid_secrets, git
+    from hooks.detectors import SECRET_CHECKS, DetectorEngine
+    from hooks.environment import snapshot_path
+    from hooks.forbid_secrets import ScanContext, scan_files
+    from hooks.scan import scan_large_file
+    from hooks.sops import run_sops_batch
+    from ruamel.yaml import YAMLError  # pylint: disable=import-error
+
+    git._rev_parse.cache_clear()  # pylint: disable=protected-access
+    hook_ids = list(SECRET_CHECKS) + ["kubernetes-secret"]
+    small = repository.clean + repository.dirty + repository.encrypted
+    data = {}
+    for path in small:
+        with open(path, "rb") as file:
+            data[path] = file.read()
+    small_size = sum(map(len, data.values()))
+    manifests = [p for p in small if p not in repository.encrypted]
+    manifest_size = sum(len(data[p]) for p in manifests)
+    large_size = sum(map(os.path.getsize, repository.large))
+    engine = DetectorEngine.for_ids(SECRET_CHECKS)
+
+    def kubernetes_secret(path):
+        # Like the hook, which reports files it cannot parse as errors
+        try:
+            return ScanContext(path, data[path]).kubernetes_secret
+        except YAMLError:
+            return None
+
+    def preflight():
+        # pylint: disable-next=protected-access
+        forbid_secrets._preflight.cache_clear()
+        forbid_secrets.preflight()
+
+    def remove_snapshot():
+        path = snapshot_path()
+        if path and os.path.exists(path):
+            os.unlink(path)
+
+    results: Dict[str, dict] = {}
+    for stage in stages:
+        if stage == "startup":
+            env = dict(os.environ, PYTHONPATH=ROOT)
+            env.pop("PYTHONDONTWRITEBYTECODE", None)
+            interpreter_time("import hooks.forbid_secrets", env, 1)  # .pyc
+            bare = interpreter_time("pass", env, repeat)
+            full = interpreter_time("import hooks.forbid_secrets", env, repeat)
+            times = [max(0.0, t - min(bare)) for t in full]
+            results[stage] = {
+                "best": min(times),
+                "median": statistics.median(times),
+                "mean": statistics.fmean(times),
+                "runs": repeat,
+                "items": 1,
+                "bytes": 0,
+                "items_per_second": None,
+                "interpreter": min(bare),
+            }
+        elif stage == "preflight-cold":
+            results[stage] = measure(preflight, repeat, setup=remove_snapshot)
+        elif stage == "preflight-warm":
+            preflight()
+            results[stage] = measure(preflight, repeat)
+        elif stage == "encrypted-check":
+            results[stage] = measure(
+                lambda: [ScanContext(p, data[p]).encrypted for p in small],
+                repeat,
+                len(small),
+                small_size,
+            )
+        elif stage == "detection":
+            results[stage] = measure(
+                lambda: [
+                    engine.scan(data[p].decode("utf-8")) for p in manifests
+                ],
+                repeat,
+                len(manifests),
+                manifest_size,
+            )
+        elif stage == "detection-large":
+            results[stage] = measure(
+                lambda: [
+                    scan_large_file(p, list(SECRET_CHECKS))
+                    for p in repository.large
+                ],
+                repeat,
+                len(repository.large),
+                large_size,
+            )
+        elif stage == "yaml-parse":
+            results[stage] = measure(
+                lambda: [kubernetes_secret(p) for p in small],
+                repeat,
+                len(small),
+                small_size,
+            )
+        elif stage == "scan":
+            files = repository.files
+            results[stage] = measure(
+                lambda: list(scan_files(files, hook_ids)),
+                repeat,
+                len(files),
+                small_size + large_size,
+            )
+        elif stage == "encryption":
+            results[stage] = measure(
+                lambda: run_sops_batch("encrypt", repository.dirty, jobs),
+                repeat,
+                len(repository.dirty),
+            )
+    return results
+
+
+def compare(
+    results: Dict[str, dict], baseline: Dict[str, dict], max_regression: float
+) -> List[str]:
+    """Compares the best times of each stage with a baseline.
+
+    Args:
+        results: The measurements of this run.
+        baseline: The measurements of an earlier run.
+        max_regression: The ratio above which a stage counts as a
+            regression.
+
+    Returns:
+        The stages slower than max_regression times their baseline.
+    """
+    regressions = []
+    for stage, result in results.items():
+        before = baseline.get(stage, {}).get("best")
+        if before:
+            result["baseline_ratio"] = result["best"] / before
+            if result["baseline_ratio"] > max_regression:
+                regressions.append(stage)
+    return regressions
+
+
+def package_version() -> Optional[str]:
+    """Returns the installed version of the hooks, if they are installed."""
+    # pylint: disable=import-outside-toplevel
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("sops-pre-commit")
+    except PackageNotFoundError:
+        return None
+
+
+def print_table(results: Dict[str, dict]) -> None:
+    """Prints the measurements of each stage."""
+    print(f"{'stage':<16} {'best':>10} {'median':>10} {'throughput':>14}")
+    for stage, result in results.items():
+        throughput = ""
+        if result.get("mb_per_second"):
+            throughput = f"{result['mb_per_second']:.1f} MB/s"
+        elif result["items"] > 1 and result["items_per_second"]:
+            throughput = f"{result['items_per_second']:.0f} files/s"
+        line = (
+            f"{stage:<16} {result['best'] * 1000:8.2f}ms "
+            f"{result['median'] * 1000:8.2f}ms {throughput:>14}"
+        )
+        if "baseline_ratio" in result:
+            line += f"  {result['baseline_ratio']:.2f}x baseline"
+        print(line)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Runs the suite and prints the results."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--large-files", type=int, default=1)
+    parser.add_argument("--large-size", type=int, default=16 * 1024 * 1024)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--sops-delay", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--stages", nargs="+", choices=STAGES, default=list(STAGES)
+    )
+    parser.add_argument(
+        "--directory", help="Write the repository here and keep it."
+    )
+    parser.add_argument("--json", help="Write the results to this file.")
+    parser.add_argument(
+        "--baseline", help="Compare with the JSON results of an earlier run."
+    )
+    parser.add_argument("--max-regression", type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as temporary:
+        root = args.directory or os.path.join(temporary, "repo")
+        repository = write_repository(
+            root,
+            files=args.files,
+            lines=args.lines,
+            large_files=args.large_files,
+            large_size=args.large_size,
+            seed=args.seed,
+        )
+        environment = dict(os.environ)
+        cwd = os.getcwd()
+        os.environ.update(prepare_repository(root, 0))
+        os.environ["FAKE_SOPS_DELAY"] = str(args.sops_delay)
+        os.chdir(root)
+        try:
+            results = run_stages(
+                repository, list(args.stages), args.repeat, args.jobs
+            )
+        finally:
+            os.chdir(cwd)
+            os.environ.clear()
+            os.environ.update(environment)
+        files = repository.files
+
+    regressions: List[str] = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)["stages"]
+        regressions = compare(results, baseline, args.max_regression)
+
+    # pylint: disable=import-outside-toplevel
+    from hooks.cache import code_version
+
+    document = {
+        "format": RESULTS_FORMAT,
+        "version": package_version(),
+        "code": hashlib.sha256(code_version().encode()).hexdigest()[:16],
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "corpus": {
+            "files": len(files),
+            "clean": len(repository.clean),
+            "dirty": len(repository.dirty),
+            "encrypted": len(repository.encrypted),
+            "large": len(repository.large),
+            "lines": args.lines,
+            "large_size": args.large_size,
+            "seed": args.seed,
+        },
+        "stages": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(document, file, indent=2)
+            file.write("\n")
+
+    corpus = document["corpus"]
+    print(
+        f"corpus: {corpus['files']} files ({corpus['dirty']} with secrets, "
+        f"{corpus['encrypted']} encrypted, {corpus['large']} large)"
+    )
+    print_table(results)
+    if regressions:
+        print(f"REGRESSION: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+This module guards the scans against regex backtracking.
+
+Python's regex engine backtracks: a pattern where two quantifiers can match
+the same characters, such as \\s*[A-Za-z\\s]+\\s*, tries every way of
+splitting a run of those characters between them, which takes polynomial or
+exponential time in the length of the run. hazards() finds such constructs
+in a pattern, so that the built-in detectors can be kept free of them and
+custom detectors are rejected when they have them.
+
+Patterns without hazards can still take quadratic time on adversarial input,
+being retried from every position of a long run. time_budget() bounds the
+time spent on one file, so that such a file is reported instead of stalling
+the run.
+"""
+
+import signal
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, List, NamedTuple, Optional
+
+# Bounded repeats at least this long backtrack like unbounded ones
+LONG_REPEAT = 256
+
+# Character sets are bitmasks: a bit per Latin-1 character, and a bit per
+# class of the characters beyond, so that e.g. \d and \s do not overlap
+_WIDE_DIGIT = 1 << 256
+_WIDE_LETTER = 1 << 257
+_WIDE_SPACE = 1 << 258
+_WIDE_OTHER = 1 << 259
+_ALL = (1 << 260) - 1
+
+ADJACENT = "quantifiers that can match the same characters follow each other"
+NESTED = "a repeated group ends and starts with the same characters"
+ALTERNATIVES = "alternatives of a repeated group start with the same characters"
+
+
+class _Info(NamedTuple):
+    """What the analysis knows about a part of a pattern.
+
+    Attributes:
+        chars: The characters it can match.
+        first: The characters its matches can start with.
+        last: The characters its matches can end with.
+        head: The characters a quantifier at its start can match.
+        tail: The characters a quantifier at its end can match.
+        nullable: Whether it can match the empty string.
+        single: Whether it always matches exactly one character.
+    """
+
+    chars: int
+    first: int
+    last: int
+    head: int
+    tail: int
+    nullable: bool
+    single: bool
+
+
+_EMPTY = _Info(0, 0, 0, 0, 0, True, False)
+
+
+def hazards(pattern: str, flags: int = 0) -> List[str]:
+    """Finds the constructs of a pattern that can backtrack catastrophically.
+
+    Possessive quantifiers and atomic groups are never backtracked into and
+    count as safe. The analysis is conservative: a pattern without hazards
+    matches in linear time from each position, but some patterns with
+    hazards would not backtrack on any input.
+
+    Args:
+        pattern: The regex pattern.
+        flags: The regex flags of the pattern.
+
+    Returns:
+        A description of each kind of hazard found, empty if there is none.
+
+    Raises:
+        re.error: If the pattern is invalid.
+    """
+    # pylint: disable=import-outside-toplevel,deprecated-module
+    try:
+        from re import _parser as parser  # type: ignore[attr-defined]
+    except ImportError:  # Python < 3.11
+        import sre_parse as parser
+
+    found: List[str] = []
+    _Analysis(found).sequence(parser.parse(pattern, flags), flags)
+    return list(dict.fromkeys(found))
+
+
+class _Analysis:
+    """Walks a parsed pattern, collecting the hazards in it."""
+
+    def __init__(self, found: List[str]):
+        # pylint: disable=import-outside-toplevel,deprecated-module
+        try:
+            from re import _constants as constants  # type: ignore
+        except ImportError:  # Python < 3.11
+            import sre_constants as constants
+
+        self.found = found
+        self.constants = constants
+
+    def sequence(self, items, flags: int) -> _Info:
+        """Analyses a sequence of items, flattening plain groups."""
+        infos = [
+            self.item(op, av, item_flags)
+            for op, av, item_flags in _flat(items, flags, self.constants)
+        ]
+        running = 0  # What the quantifiers so far can still absorb
+        for info in infos:
+            if running & info.head:
+                self.found.append(ADJACENT)
+            if info.nullable:
+                running |= info.tail
+            elif info.single:
+                running = (running & info.chars) | info.tail
+            else:
+                running = info.tail
+
+        chars = first = last = head = tail = 0
+        nullable = True
+        for info in infos:
+            chars |= info.chars
+            if nullable:
+                first |= info.first
+                head |= info.head
+            nullable = nullable and info.nullable
+        trailing = True
+        for info in reversed(infos):
+            if trailing:
+                last |= info.last
+                tail |= info.tail
+            trailing = trailing and info.nullable
+        single = len(infos) == 1 and infos[0].single
+        return _Info(chars, first, last, head, tail, nullable, single)
+
+    def item(self, op, av, flags: int) -> _Info:
+        """Analyses one item of a sequence."""
+        # pylint: disable=too-many-return-statements
+        c = self.constants
+        if op in (c.LITERAL, c.NOT_LITERAL, c.ANY, c.IN):
+            chars = _charset(op, av, flags, c)
+            return _Info(chars, chars, chars, 0, 0, False, True)
+        if op in (c.MAX_REPEAT, c.MIN_REPEAT) or op is getattr(
+            c, "POSSESSIVE_REPEAT", None
+        ):
+            low, high, body = av
+            inner = self.sequence(body, flags)
+            unbounded = high == c.MAXREPEAT or high >= LONG_REPEAT
+            possessive = op is getattr(c, "POSSESSIVE_REPEAT", None)
+            if unbounded and not possessive:
+                if inner.tail & (inner.first | inner.head) or (
+                    inner.last & inner.head
+                ):
+                    self.found.append(NESTED)
+                self._alternatives(body, flags)
+                head = inner.first | inner.head
+                tail = inner.last | inner.tail
+            elif possessive:
+                head = tail = 0
+            else:
+                head, tail = inner.head, inner.tail
+            return _Info(
+                inner.chars,
+                inner.first,
+                inner.last,
+                head,
+                tail,
+                low == 0 or inner.nullable,
+                low == high == 1 and inner.single,
+            )
+        if op is c.BRANCH:
+            branches = [self.sequence(b, flags) for b in av[1]]
+            return _merge(branches)
+        if op is c.GROUPREF_EXISTS:
+            _, yes, no = av
+            return _merge(
+                [self.sequence(yes, flags)]
+                + ([self.sequence(no, flags)] if no else [_EMPTY])
+            )
+        if op is getattr(c, "ATOMIC_GROUP", None):
+            inner = self.sequence(av, flags)
+            return inner._replace(head=0, tail=0)
+        if op in (c.ASSERT, c.ASSERT_NOT):
+            self.sequence(av[1], flags)
+            return _EMPTY
+        if op is c.GROUPREF:
+            return _Info(_ALL, _ALL, _ALL, 0, 0, True, False)
+        return _EMPTY  # Anchors and other zero-width items
+
+    def _alternatives(self, body, flags: int) -> None:
+        """Flags a repeated alternation whose branches start alike."""
+        for op, av, item_flags in _flat(body, flags, self.constants):
+            if op is not self.constants.BRANCH:
+                continue
+            seen = 0
+            for branch in av[1]:
+                first = self.sequence(branch, item_flags).first
+                if seen & first:
+                    self.found.append(ALTERNATIVES)
+                seen |= first
+
+
+def _flat(items, flags: int, c) -> Iterator[tuple]:
+    """Yields the items of a sequence with plain groups inlined.
+
+    Args:
+        items: The parsed items.
+        flags: The flags in effect.
+        c: The regex constants module.
+
+    Yields:
+        Each item, with the flags in effect for it.
+    """
+    for op, av in items:
+        if op is c.SUBPATTERN:
+            _, add_flags, del_flags, body = av
+            yield from _flat(body, (flags | add_flags) & ~del_flags, c)
+        else:
+            yield op, av, flags
+
+
+def _merge(branches: List[_Info]) -> _Info:
+    """Combines the analyses of the alternatives of a branch."""
+    chars = first = last = head = tail = 0
+    for info in branches:
+        chars |= info.chars
+        first |= info.first
+        last |= info.last
+        head |= info.head
+        tail |= info.tail
+    return _Info(
+        chars,
+        first,
+        last,
+        head,
+        tail,
+        any(info.nullable for info in branches),
+        all(info.single for info in branches),
+    )
+
+
+def _charset(op, av, flags: int, c) -> int:
+    """Returns the characters a single-character item matches, as a mask."""
+    if op is c.LITERAL:
+        return _literal(av, flags, c)
+    if op is c.NOT_LITERAL:
+        return _ALL & ~_literal(av, flags, c)
+    if op is c.ANY:
+        return _ALL if flags & c.SRE_FLAG_DOTALL else _ALL & ~(1 << 10)
+    chars = 0
+    negate = False
+    for item_op, item_av in av:
+        if item_op is c.NEGATE:
+            negate = True
+        elif item_op is c.LITERAL:
+            chars |= _literal(item_av, flags, c)
+        elif item_op is c.RANGE:
+            low, high = item_av
+            for code in range(low, min(high, 255) + 1):
+                chars |= _literal(code, flags, c)
+            if high > 255:
+                chars |= _WIDE_DIGIT | _WIDE_LETTER | _WIDE_SPACE | _WIDE_OTHER
+        elif item_op is c.CATEGORY:
+            chars |= _category(item_av, flags, c)
+    return _ALL & ~chars if negate else chars
+
+
+def _literal(code: int, flags: int, c) -> int:
+    """Returns the mask of a character, and its other case if ignored."""
+    if code > 255:
+        char = chr(code)
+        if char.isdigit():
+            return _WIDE_DIGIT
+        if char.isspace():
+            return _WIDE_SPACE
+        return _WIDE_LETTER if char.isalpha() else _WIDE_OTHER
+    mask = 1 << code
+    if flags & c.SRE_FLAG_IGNORECASE:
+        for other in (chr(code).lower(), chr(code).upper()):
+            if len(other) == 1 and ord(other) <= 255:
+                mask |= 1 << ord(other)
+    return mask
+
+
+def _category(category, flags: int, c) -> int:
+    """Returns the mask of a class such as \\d, \\s or \\w."""
+    return _category_mask(category, bool(flags & c.SRE_FLAG_ASCII), c)
+
+
+@lru_cache(maxsize=None)
+def _category_mask(category, ascii_only: bool, c) -> int:
+    """Returns the mask of a class, computed once per class."""
+    import re  # pylint: disable=import-outside-toplevel
+
+    names = {
+        c.CATEGORY_DIGIT: (r"\d", _WIDE_DIGIT),
+        c.CATEGORY_SPACE: (r"\s", _WIDE_SPACE),
+        c.CATEGORY_WORD: (r"\w", _WIDE_DIGIT | _WIDE_LETTER),
+    }
+    negated = {
+        c.CATEGORY_NOT_DIGIT: c.CATEGORY_DIGIT,
+        c.CATEGORY_NOT_SPACE: c.CATEGORY_SPACE,
+        c.CATEGORY_NOT_WORD: c.CATEGORY_WORD,
+    }
+    if category in negated:
+        return _ALL & ~_category_mask(negated[category], ascii_only, c)
+    regex, wide = names[category]
+    compiled = re.compile(regex, re.ASCII if ascii_only else 0)
+    mask = 0 if ascii_only else wide
+    for code in range(256):
+        if compiled.match(chr(code)):
+            mask |= 1 << code
+    return mask
+
+
+class ScanTimeout(Exception):
+    """Raised when scanning a file exceeds its time budget."""
+
+
+@contextmanager
+def time_budget(seconds: Optional[float]) -> Iterator[None]:
+    """Raises ScanTimeout in the block if it runs longer than a budget.
+
+    The budget is enforced with a real-time timer signal, which interrupts
+    the regex engine as well as Python code. It is only enforced in the
+    main thread, on platforms with setitimer(), and when the timer is not
+    already in use.
+
+    Args:
+        seconds: The budget, or None or 0 for no budget.
+
+    Yields:
+        Nothing.
+
+    Raises:
+        ScanTimeout: If the block runs out of time.
+    """
+    if (
+        not seconds
+        or not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+        or signal.getitimer(signal.ITIMER_REAL)[0]
+    ):
+        yield
+        return
+
+    def expire(signum, frame):  # pylint: disable=unused-argument
+        raise ScanTimeout(f"exceeded the time budget of {seconds:g}s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
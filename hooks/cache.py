@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+This module provides a persistent scan cache so that files whose content has
+not changed since a previous run are not scanned again.
+
+Verdicts are keyed by the git blob SHA of the file content and a fingerprint
+of the active detectors, so changing a detector pattern or upgrading the tool
+invalidates every verdict. A second table maps file paths and their stat
+information to blob SHAs, so unchanged files are not even read. Changed files
+are hashed by the scan itself, from the content it reads anyway.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+from hooks import detectors
+from hooks.detectors import DETECTORS
+from hooks.git import git_dir
+
+# Bump when the layout of the cache or of a verdict changes
+CACHE_FORMAT = 1
+
+# Default maximum number of verdicts (and of file stat entries) kept
+DEFAULT_CACHE_SIZE = 100_000
+
+# Bytes read at a time to hash a file too large to read whole
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def code_version() -> str:
+    """Identifies the installed hooks code.
+
+    The size and modification time of the hooks modules change whenever the
+    package is upgraded or edited, and unlike the package metadata they can
+    be read without importing importlib.metadata.
+
+    Returns:
+        A string that changes whenever the hooks code changes.
+    """
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    parts = []
+    for name in sorted(os.listdir(package_dir)):
+        if name.endswith(".py"):
+            stat = os.stat(os.path.join(package_dir, name))
+            parts.append(f"{name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return ",".join(parts)
+
+
+def detector_fingerprint(hook_ids: Sequence[str]) -> str:
+    """Hashes the active detectors and the hooks code version.
+
+    Args:
+        hook_ids: The identifiers of the hooks being run.
+
+    Returns:
+        A hex digest that changes whenever a detector pattern, the set of
+        hooks or the hooks code changes.
+    """
+    digest = hashlib.sha256(f"{CACHE_FORMAT}:{code_version()}".encode())
+    for hook_id in hook_ids:
+        detector = DETECTORS.get(hook_id)
+        if detector is None:
+            digest.update(f"\0{hook_id}".encode())
+        else:
+            # The repr covers the pattern, flags and any other settings,
+            # such as the thresholds of entropy detectors
+            digest.update(f"\0{hook_id}\0{detector!r}".encode())
+    return digest.hexdigest()
+
+
+def blob_sha(content: bytes) -> str:
+    """Computes the git blob SHA of some content.
+
+    Args:
+        content: The file content.
+
+    Returns:
+        The SHA-1 git would give the content as a blob.
+    """
+    header = f"blob {len(content)}\0".encode()
+    return hashlib.sha1(header + content, usedforsecurity=False).hexdigest()
+
+
+def file_blob_sha(path: str) -> str:
+    """Computes the git blob SHA of a file, a chunk at a time.
+
+    Args:
+        path: The path of the file.
+
+    Returns:
+        The SHA-1 git would give the file content as a blob.
+
+    Raises:
+        OSError: If the file cannot be read.
+    """
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        digest = hashlib.sha1(f"blob {size}\0".encode(), usedforsecurity=False)
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def default_cache_path() -> Optional[str]:
+    """Returns the cache database path inside the git directory.
+
+    Returns:
+        The path, or None if the current directory is not in a git
+        repository.
+    """
+    directory = git_dir()
+    if directory is None:
+        return None
+    return os.path.join(directory, "sops-pre-commit", "cache", "scan.sqlite3")
+
+
+class ScanCache:
+    """A size-bounded LRU cache of scan verdicts stored in SQLite.
+
+    Lookups read the database, or the in-memory copy of the entries this
+    instance already saw, which long-lived processes such as the scan daemon
+    benefit from. The LRU timestamps of hit entries are written back in one
+    batch by flush() or close().
+    """
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_CACHE_SIZE):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._used: Dict[str, int] = {}
+        self._files_used: Dict[str, int] = {}
+        self._fingerprints: Dict[tuple, Tuple[int, str]] = {}
+        self._shas: Dict[Tuple[str, str], str] = {}
+        self._changed: Dict[str, str] = {}
+        self._verdicts: Dict[str, dict] = {}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS verdicts (
+                key TEXT PRIMARY KEY,
+                verdict TEXT NOT NULL,
+                used INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS verdicts_used ON verdicts (used);
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                stat TEXT NOT NULL,
+                sha TEXT NOT NULL,
+                used INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS files_used ON files (used);
+            """
+        )
+
+    def __enter__(self) -> "ScanCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @staticmethod
+    def _stat_key(path: str) -> Optional[str]:
+        """Returns the stat information used to detect file changes."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (
+            f"{stat.st_mtime_ns}:{stat.st_ctime_ns}:{stat.st_size}:"
+            f"{stat.st_ino}"
+        )
+
+    def file_sha(self, path: str) -> Optional[str]:
+        """Returns the blob SHA of a file, without reading it.
+
+        A file that changed since its SHA was recorded is not read here:
+        the scan hashes the content it reads, and put_file() records it
+        with the stat information taken by this call.
+
+        Args:
+            path: The path of the file.
+
+        Returns:
+            The blob SHA, or None if the file changed or cannot be read.
+        """
+        stat_key = self._stat_key(path)
+        if stat_key is None:
+            return None
+        abspath = os.path.abspath(path)
+        sha = self._shas.get((abspath, stat_key))
+        if sha is not None:
+            self._files_used[abspath] = time.time_ns()
+            return sha
+
+        row = self._db.execute(
+            "SELECT stat, sha FROM files WHERE path = ?", (abspath,)
+        ).fetchone()
+        if not row or row[0] != stat_key:
+            # Taken before the scan reads the file, so that a change made
+            # while it is read is seen next time
+            self._remember(self._changed, abspath, stat_key)
+            return None
+        self._files_used[abspath] = time.time_ns()
+        sha = row[1]
+        self._remember(self._shas, (abspath, stat_key), sha)
+        return sha
+
+    def get(
+        self, path: str, hook_ids: Sequence[str]
+    ) -> Tuple[Optional[str], Optional[dict]]:
+        """Looks up the verdict of a file.
+
+        Args:
+            path: The path of the file.
+            hook_ids: The identifiers of the hooks being run.
+
+        Returns:
+            The cache key of the file content (None if the file changed or
+            cannot be read, see put_file()) and the cached verdict (None on
+            a cache miss).
+        """
+        sha = self.file_sha(path)
+        if sha is None:
+            self.misses += 1
+            return None, None
+        return self.get_blob(sha, hook_ids)
+
+    def get_blob(
+        self, sha: str, hook_ids: Sequence[str]
+    ) -> Tuple[str, Optional[dict]]:
+        """Looks up the verdict of some content by its blob SHA.
+
+        Args:
+            sha: The git blob SHA of the content.
+            hook_ids: The identifiers of the hooks being run.
+
+        Returns:
+            The cache key of the content and the cached verdict (None on a
+            cache miss).
+        """
+        key = self._key(sha, hook_ids)
+        verdict = self._verdicts.get(key)
+        if verdict is None:
+            row = self._db.execute(
+                "SELECT verdict FROM verdicts WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return key, None
+            verdict = json.loads(row[0])
+            self._remember(self._verdicts, key, verdict)
+        self.hits += 1
+        self._used[key] = time.time_ns()
+        return key, verdict
+
+    def _key(self, sha: str, hook_ids: Sequence[str]) -> str:
+        """Returns the cache key of some content for the given hooks."""
+        hook_ids = tuple(hook_ids)
+        # Recomputed when the registry reloads the detectors
+        generation, fingerprint = self._fingerprints.get(hook_ids, (-1, ""))
+        if generation != detectors.generation:
+            generation = detectors.generation
+            fingerprint = detector_fingerprint(hook_ids)
+            self._fingerprints[hook_ids] = (generation, fingerprint)
+        return f"{sha}:{fingerprint}"
+
+    def put_file(
+        self, path: str, sha: str, hook_ids: Sequence[str], verdict: dict
+    ) -> None:
+        """Stores the SHA and verdict of a file get() found changed.
+
+        Args:
+            path: The path of the file.
+            sha: The blob SHA of the content the scan read.
+            hook_ids: The identifiers of the hooks that were run.
+            verdict: The verdict to store.
+        """
+        abspath = os.path.abspath(path)
+        stat_key = self._changed.pop(abspath, None)
+        if stat_key is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+            (abspath, stat_key, sha, time.time_ns()),
+        )
+        self._remember(self._shas, (abspath, stat_key), sha)
+        self.put(self._key(sha, hook_ids), verdict)
+
+    def put(self, key: str, verdict: dict) -> None:
+        """Stores the verdict of a file.
+
+        Args:
+            key: The cache key returned by get().
+            verdict: The verdict to store.
+        """
+        self._db.execute(
+            "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?)",
+            (key, json.dumps(verdict, sort_keys=True), time.time_ns()),
+        )
+        self._remember(self._verdicts, key, verdict)
+
+    def _remember(self, memory: dict, key, value) -> None:
+        """Keeps an entry in memory, forgetting all of them when full."""
+        if len(memory) >= self.max_entries:
+            memory.clear()
+        memory[key] = value
+
+    def flush(self) -> None:
+        """Writes back LRU timestamps, evicts old entries and commits."""
+        self._db.executemany(
+            "UPDATE verdicts SET used = ? WHERE key = ?",
+            ((used, key) for key, used in self._used.items()),
+        )
+        self._db.executemany(
+            "UPDATE files SET used = ? WHERE path = ?",
+            ((used, path) for path, used in self._files_used.items()),
+        )
+        for table in ("verdicts", "files"):
+            (count,) = self._db.execute(
+                f"SELECT COUNT(*) FROM {table}"
+            ).fetchone()
+            if count > self.max_entries:
+                self._db.execute(
+                    f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM "
+                    f"{table} ORDER BY used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+        self._db.commit()
+        self._used.clear()
+        self._files_used.clear()
+
+    def close(self) -> None:
+        """Flushes the cache and closes the database."""
+        self.flush()
+        self._db.close()
+
+
+def open_cache(max_entries: int = DEFAULT_CACHE_SIZE) -> Optional[ScanCache]:
+    """Opens the scan cache of the current git repository.
+
+    Args:
+        max_entries: The maximum number of verdicts kept.
+
+    Returns:
+        The scan cache, or None if there is no git repository or the cache
+        cannot be opened.
+    """
+    path = default_cache_path()
+    if path is None:
+        return None
+    try:
+        return ScanCache(path, max_entries)
+    except (OSError, sqlite3.Error):
+        return None
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+This module is a thin client for the scan daemon (forbid_secrets --serve).
+
+It sends its command line to the daemon of the current repository and
+prints the daemon's output, so a commit does not pay for loading the hooks,
+compiling the detectors and checking the environment. Without a daemon it
+runs the hooks in-process, exactly like forbid_secrets.
+
+Only the standard library modules needed to talk to the daemon are
+imported, to keep the client start-up as cheap as possible.
+"""
+
+# pylint: disable=import-outside-toplevel
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# Seconds to wait for the daemon to accept a connection
+CONNECT_TIMEOUT = 1.0
+
+# Longest path a Unix socket can be bound to on every platform
+MAX_SOCKET_PATH = 100
+
+# Environment variables the hooks, git and the sops processes they start
+# read; the rest of the client's environment is not sent to the daemon
+FORWARDED_ENV = frozenset(
+    (
+        "PATH",
+        "HOME",
+        "USER",
+        "LANG",
+        "TMPDIR",
+        "TERM",
+        "DEBUG_LEVEL",
+        "NO_COLOR",
+        "FORCE_COLOR",
+        "GNUPGHOME",
+        "XDG_CONFIG_HOME",
+    )
+)
+FORWARDED_ENV_PREFIXES = (
+    "SOPS_",
+    "GIT_",
+    "LC_",
+    "AWS_",
+    "AZURE_",
+    "GOOGLE_",
+    "CLOUDSDK_",
+    "VAULT_",
+)
+
+
+def socket_path() -> Optional[str]:
+    """Returns the path of the daemon socket of the current repository.
+
+    The git directory is found without running git when the current
+    directory is the root of a repository, as it is under pre-commit.
+
+    Returns:
+        The socket path, or None outside a git repository.
+    """
+    git_dir: Optional[str] = os.path.join(os.getcwd(), ".git")
+    if not os.path.isdir(git_dir):
+        from hooks.git import git_dir as find_git_dir
+
+        git_dir = find_git_dir()
+        if git_dir is None:
+            return None
+    git_dir = os.path.realpath(git_dir)
+    path = os.path.join(git_dir, "sops-pre-commit", "daemon.sock")
+    if len(path) <= MAX_SOCKET_PATH:
+        return path
+
+    import hashlib
+
+    digest = hashlib.sha256(git_dir.encode()).hexdigest()[:16]
+    # A directory only the user can write to, so that no one else can bind
+    # the socket first
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(
+        os.environ.get("TMPDIR", "/tmp"), f"sops-pre-commit-{os.getuid()}"
+    )
+    return os.path.join(runtime_dir, f"sops-pre-commit-{digest}.sock")
+
+
+def is_trusted(path: str) -> bool:
+    """Tells whether a socket was bound by the current user, for them only.
+
+    Args:
+        path: The socket path.
+
+    Returns:
+        True if the socket belongs to the current user and no one else can
+        connect to it.
+    """
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+    return (
+        stat.S_ISSOCK(info.st_mode)
+        and info.st_uid == os.getuid()
+        and not info.st_mode & 0o077
+    )
+
+
+def _peer_is_user(connection: socket.socket) -> bool:
+    """Tells whether the process at the other end runs as the current user.
+
+    The peer is only known on Linux; elsewhere the owner of the socket file
+    is trusted.
+    """
+    if not hasattr(socket, "SO_PEERCRED"):
+        return True
+    credentials = struct.Struct("3i")
+    _, uid, _ = credentials.unpack(
+        connection.getsockopt(
+            socket.SOL_SOCKET, socket.SO_PEERCRED, credentials.size
+        )
+    )
+    return uid == os.getuid()
+
+
+def forwarded_env() -> Dict[str, str]:
+    """Returns the environment variables sent to the daemon.
+
+    Returns:
+        The variables of FORWARDED_ENV and FORWARDED_ENV_PREFIXES that are
+        set.
+    """
+    return {
+        name: value
+        for name, value in os.environ.items()
+        if name in FORWARDED_ENV or name.startswith(FORWARDED_ENV_PREFIXES)
+    }
+
+
+def request(message: dict, path: Optional[str] = None) -> Optional[dict]:
+    """Sends a request to the scan daemon and waits for its reply.
+
+    Args:
+        message: The request.
+        path: The socket path (default: the one of the current repository).
+
+    Returns:
+        The reply, or None if no daemon answered, or if the socket or the
+        daemon belongs to another user.
+    """
+    path = path or socket_path()
+    if path is None or not is_trusted(path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(CONNECT_TIMEOUT)
+            connection.connect(path)
+            if not _peer_is_user(connection):
+                return None
+            connection.settimeout(None)
+            connection.sendall(json.dumps(message).encode())
+            connection.shutdown(socket.SHUT_WR)
+            reply = b"".join(iter(lambda: connection.recv(65536), b""))
+        return json.loads(reply)
+    except (OSError, ValueError):
+        return None
+
+
+def run(
+    argv: List[str], path: Optional[str] = None
+) -> Optional[Tuple[int, str, str]]:
+    """Runs a forbid_secrets command line in the scan daemon.
+
+    Args:
+        argv: The command line arguments.
+        path: The socket path (default: the one of the current repository).
+
+    Returns:
+        The exit code, standard output and standard error of the command,
+        or None if no daemon ran it.
+    """
+    env = forwarded_env()
+    # The daemon writes to a buffer: let it color the log for a terminal
+    if sys.stdout.isatty():
+        env.setdefault("FORCE_COLOR", "1")
+    reply = request({"argv": argv, "cwd": os.getcwd(), "env": env}, path)
+    try:
+        return int(reply["exit"]), str(reply["stdout"]), str(reply["stderr"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Runs forbid_secrets through the scan daemon, or in-process.
+
+    Args:
+        argv: List of command-line arguments; --stop stops the daemon.
+
+    Returns:
+        Exit code.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv == ["--stop"]:
+        return 0 if request({"stop": True}) is not None else 1
+
+    reply = None if "--serve" in argv else run(argv)
+    if reply is None:
+        from hooks.forbid_secrets import main as forbid_secrets_main
+
+        return forbid_secrets_main(argv)
+    exit_code, stdout, stderr = reply
+    sys.stdout.write(stdout)
+    sys.stderr.write(stderr)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+This module runs the scan daemon started by forbid_secrets --serve.
+
+The daemon listens on a Unix socket in the git directory of a repository
+and runs the command lines forbid_secrets_client sends it, one at a time,
+in a process where the detectors are compiled, the YAML loaders imported,
+the environment already checked and the scan cache open, with the verdicts
+it has seen kept in memory.
+"""
+
+import io
+import json
+import os
+import signal
+import socket
+import sys
+import traceback
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from typing import Dict, Iterator, Optional
+
+from hooks import forbid_secrets
+from hooks.cache import DEFAULT_CACHE_SIZE, ScanCache, open_cache
+from hooks.client import request, socket_path
+from hooks.detectors import SECRET_CHECKS, DetectorEngine
+
+# Seconds a client has to send its request before it is dropped
+REQUEST_TIMEOUT = 5.0
+
+
+def serve(
+    cache_size: int = DEFAULT_CACHE_SIZE, path: Optional[str] = None
+) -> int:
+    """Runs the scan daemon until it is stopped or interrupted.
+
+    Args:
+        cache_size: The maximum number of verdicts kept in the scan cache.
+        path: The socket path (default: the one of the current repository).
+
+    Returns:
+        Exit code.
+    """
+    path = path or socket_path()
+    if path is None:
+        print("ERROR: The scan daemon must be started in a git repository.")
+        return 1
+    if request({"ping": True}, path) is not None:
+        print(f"ERROR: A scan daemon is already listening on {path}")
+        return 1
+    socket_dir = os.path.dirname(path)
+    os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+    if os.stat(socket_dir).st_uid != os.getuid():
+        print(f"ERROR: {socket_dir} belongs to another user.")
+        return 1
+    if os.path.lexists(path):
+        os.unlink(path)
+
+    # Warm up everything a request needs but the environment checks, which
+    # run on the first request with the client's environment
+    DetectorEngine.for_ids(list(SECRET_CHECKS))
+    forbid_secrets._safe_yaml_loader()  # pylint: disable=protected-access
+    cache = open_cache(cache_size)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(umask)
+    server.listen()
+    try:
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    except ValueError:
+        pass  # Not in the main thread, e.g. in tests
+    print(f"Scan daemon listening on {path}", flush=True)
+
+    try:
+        while True:
+            connection, _ = server.accept()
+            with connection:
+                if not handle(connection, cache):
+                    break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.unlink(path)
+        if cache is not None:
+            cache.close()
+    return 0
+
+
+def handle(connection: socket.socket, cache: Optional[ScanCache]) -> bool:
+    """Answers one request.
+
+    Args:
+        connection: The connection to the client.
+        cache: The scan cache of the daemon.
+
+    Returns:
+        False if the client asked the daemon to stop, True otherwise.
+    """
+    connection.settimeout(REQUEST_TIMEOUT)
+    try:
+        data = b"".join(iter(lambda: connection.recv(65536), b""))
+    except OSError:
+        return True  # Too slow, or gone: serve the next client
+    connection.settimeout(None)
+    try:
+        message = json.loads(data)
+    except ValueError:
+        return True
+    if not isinstance(message, dict):
+        return True
+
+    reply: Dict[str, object] = {"ok": True}
+    if "argv" in message:
+        reply = run(message["argv"], message["cwd"], message["env"], cache)
+    try:
+        connection.sendall(json.dumps(reply).encode())
+    except OSError:
+        pass  # The client went away
+    return not message.get("stop")
+
+
+def run(
+    argv: list, cwd: str, env: Dict[str, str], cache: Optional[ScanCache]
+) -> Dict[str, object]:
+    """Runs a forbid_secrets command line for a client.
+
+    Args:
+        argv: The command line arguments.
+        cwd: The working directory of the client.
+        env: The environment variables of the client.
+        cache: The scan cache of the daemon.
+
+    Returns:
+        The exit code, standard output and standard error of the command.
+    """
+    stdout, stderr = io.StringIO(), io.StringIO()
+    with client_context(cwd, env):
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                exit_code = forbid_secrets.main(argv, cache=cache)
+            except SystemExit as e:
+                if e.code is None or isinstance(e.code, int):
+                    exit_code = e.code or 0
+                else:
+                    print(e.code, file=sys.stderr)
+                    exit_code = 1
+            except Exception:  # pylint: disable=broad-exception-caught
+                traceback.print_exc()
+                exit_code = 1
+    if cache is not None:
+        cache.flush()
+    return {
+        "exit": exit_code,
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+    }
+
+
+@contextmanager
+def client_context(cwd: str, env: Dict[str, str]) -> Iterator[None]:
+    """Switches to the working directory and environment of a client.
+
+    Args:
+        cwd: The working directory of the client.
+        env: The environment variables of the client.
+    """
+    saved_cwd, saved_env = os.getcwd(), dict(os.environ)
+    os.chdir(cwd)
+    os.environ.clear()
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_env)
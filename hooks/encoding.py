@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+This module tells text from binary content and finds the encoding of text.
+
+Only the first SNIFF_SIZE bytes of a file are looked at, so binary files,
+such as vendored executables, images or archives, are rejected without
+being read whole. Like git, content with a NUL byte in those bytes is
+binary, unless it looks like UTF-16 text, which has a NUL in every other
+byte for ASCII characters. Text that is not valid UTF-8 is read as Latin-1,
+which any byte sequence is: the detectors only look for ASCII secrets.
+"""
+
+import codecs
+import re
+from typing import Optional
+
+# Bytes looked at to tell text from binary content, as many as git does
+SNIFF_SIZE = 8000
+
+# Byte order marks, the longer ones first as the UTF-32 LE mark starts with
+# the UTF-16 LE one
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+# Encodings where ASCII characters are single bytes, so that the detectors
+# can run on the raw bytes
+ASCII_COMPATIBLE = frozenset({"utf-8", "utf-8-sig", "latin-1"})
+
+# Control characters that do not appear in text
+_CONTROL_REGEX = re.compile(r"[\x00-\x08\x0b\x0e-\x1a\x1c-\x1f]")
+
+
+def sniff(head: bytes) -> Optional[str]:
+    """Tells the encoding of content from its first bytes.
+
+    Args:
+        head: The first SNIFF_SIZE bytes of the content, or all of it if
+            shorter.
+
+    Returns:
+        The codec to decode the content with, or None if it is binary.
+    """
+    if head.isascii() and 0 not in head:
+        return "utf-8"
+    for bom, codec in _BOMS:
+        if head.startswith(bom):
+            return codec
+    if 0 not in head:
+        try:
+            # A character may be cut at the end of the head
+            codecs.getincrementaldecoder("utf-8")().decode(head)
+            return "utf-8"
+        except UnicodeDecodeError:
+            return "latin-1"
+    even, odd = head[0::2].count(0), head[1::2].count(0)
+    if even * 8 < odd:
+        return _utf16(head, "utf-16-le")
+    if odd * 8 < even:
+        return _utf16(head, "utf-16-be")
+    return None
+
+
+def _utf16(head: bytes, codec: str) -> Optional[str]:
+    """Returns the codec if the head is UTF-16 text, None otherwise."""
+    try:
+        text = codecs.getincrementaldecoder(codec)().decode(head)
+    except UnicodeDecodeError:
+        return None
+    return None if _CONTROL_REGEX.search(text) else codec
+
+
+def decode(data: bytes, codec: Optional[str]) -> str:
+    """Decodes content with the codec sniff() found for it.
+
+    As only the start of the content was sniffed, UTF-8 content that turns
+    out not to be is decoded as Latin-1, and undecodable UTF-16 or UTF-32
+    characters are replaced.
+
+    Args:
+        data: The content.
+        codec: The codec, or None if the content is binary.
+
+    Returns:
+        The text, empty for binary content.
+    """
+    if codec is None:
+        return ""
+    try:
+        return str(data, codec)
+    except UnicodeDecodeError:
+        if codec in ASCII_COMPATIBLE:
+            return str(data, "latin-1")
+        return str(data, codec, "replace")
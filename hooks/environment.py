@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+This module remembers that the environment checks passed, so that later
+runs can skip them while nothing they look at has changed.
+
+The snapshot is stored in the git directory. It is keyed on the stat
+information (modification time, inode and size) of every file the checks
+read or look for, on the environment variables they depend on and on the
+hooks code, and it records the age and sops binaries that were found. Only
+successful checks are recorded: failing checks exit, and run again next
+time.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, List, Optional, Tuple
+
+from hooks.cache import code_version
+from hooks.git import git_dir, repo_root
+
+# Bump when the checks change what they look at
+SNAPSHOT_FORMAT = 1
+
+# Environment variables the checks, sops or age depend on
+ENVIRONMENT_VARIABLES = (
+    "HOME",
+    "PATH",
+    "SOPS_AGE_KEY",
+    "SOPS_AGE_KEY_FILE",
+    "SOPS_AGE_RECIPIENTS",
+)
+
+# Binaries the checks look for on the PATH
+TOOLS = ("age", "sops")
+
+StatKey = Optional[Tuple[int, int, int]]
+
+
+def snapshot_path() -> Optional[str]:
+    """Returns the snapshot path inside the git directory.
+
+    Returns:
+        The path, or None if the current directory is not in a git
+        repository.
+    """
+    directory = git_dir()
+    if directory is None:
+        return None
+    return os.path.join(directory, "sops-pre-commit", "preflight.json")
+
+
+def stat_key(path: str) -> StatKey:
+    """Returns what identifies a version of a file, or None if it is missing.
+
+    Args:
+        path: The path to the file.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_ino, stat.st_size
+
+
+def watched_paths(private_key_paths: List[str]) -> List[str]:
+    """Lists the files the environment checks read or look for.
+
+    Args:
+        private_key_paths: The default locations of the age private key.
+
+    Returns:
+        The absolute paths, missing files included: creating one of them
+        changes the outcome of the checks too.
+    """
+    cwd = os.getcwd()
+    root = repo_root()
+    paths = []
+    directory = cwd
+    while True:
+        paths.append(os.path.join(directory, ".sops.yaml"))
+        parent = os.path.dirname(directory)
+        if directory == root or parent == directory:
+            break
+        directory = parent
+    paths += [
+        os.path.join(root, ".sops.yaml"),
+        os.path.join(root, ".age.pub"),
+        os.path.join(cwd, ".age.pub"),
+        os.path.join(cwd, ".age.agekey"),
+        *private_key_paths,
+    ]
+    key_file = os.environ.get("SOPS_AGE_KEY_FILE")
+    if key_file:
+        paths.append(os.path.abspath(key_file))
+    return paths
+
+
+def environment_key(private_key_paths: List[str]) -> str:
+    """Hashes everything the outcome of the environment checks depends on.
+
+    Args:
+        private_key_paths: The default locations of the age private key.
+
+    Returns:
+        A hex digest that changes whenever a checked file or environment
+        variable, the working directory or the hooks code changes.
+    """
+    digest = hashlib.sha256(f"{SNAPSHOT_FORMAT}:{code_version()}".encode())
+    digest.update(f"\0{os.getcwd()}".encode())
+    for name in ENVIRONMENT_VARIABLES:
+        digest.update(f"\0{name}={os.environ.get(name)}".encode())
+    for path in watched_paths(private_key_paths):
+        digest.update(f"\0{path}:{stat_key(path)}".encode())
+    return digest.hexdigest()
+
+
+def _read_snapshot(path: str) -> Optional[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            snapshot = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return snapshot if isinstance(snapshot, dict) else None
+
+
+def preflight_passed(private_key_paths: List[str]) -> bool:
+    """Checks if the environment checks passed in the same environment.
+
+    Args:
+        private_key_paths: The default locations of the age private key.
+
+    Returns:
+        True if a snapshot matches the current environment and the age and
+        sops binaries it recorded did not change.
+    """
+    path = snapshot_path()
+    snapshot = _read_snapshot(path) if path else None
+    if snapshot is None:
+        return False
+    if snapshot.get("key") != environment_key(private_key_paths):
+        return False
+    tools: Dict[str, list] = snapshot.get("tools", {})
+    if set(tools) != set(TOOLS):
+        return False
+    return all(
+        stat_key(binary) == tuple(stat)
+        for binary, stat in tools.values()
+        if stat is not None
+    )
+
+
+def record_preflight(private_key_paths: List[str]) -> None:
+    """Records that the environment checks passed.
+
+    Failing to write the snapshot is not an error; the checks just run
+    again next time.
+
+    Args:
+        private_key_paths: The default locations of the age private key.
+    """
+    path = snapshot_path()
+    if path is None:
+        return
+    tools = {}
+    for tool in TOOLS:
+        binary = shutil.which(tool)
+        tools[tool] = [binary, binary and stat_key(binary)]
+    snapshot = {"key": environment_key(private_key_paths), "tools": tools}
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(snapshot, file)
+        os.replace(temporary, path)
+    except OSError:
+        pass
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+This module decides which files the hooks skip.
+
+Files are excluded by the --exclude regex patterns, which are searched in
+the path as given, and by the gitignore-style globs of .forbidsecretsignore
+at the repository root, which are matched against the path from the root.
+Each set is compiled once into combined regexes. The regex patterns
+anchored at the start of the path are only tried there, so that the others,
+kept apart, can be searched for by the characters they start with. As in
+.gitignore, a later glob starting with ! includes files again, and the files
+of an excluded directory are excluded without being matched: walks prune
+the directory.
+"""
+
+import os
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+# The gitignore-style exclusion file at the repository root
+IGNORE_FILE = ".forbidsecretsignore"
+
+# Patterns that cannot be combined with others, as they refer to their own
+# groups by number or set global flags
+_UNCOMBINABLE_REGEX = re.compile(r"\\[1-9]|\(\?P=|\(\?\(|^\(\?[aiLmsux]+\)")
+
+
+class Glob(NamedTuple):
+    """A gitignore-style glob, translated to a regex.
+
+    Attributes:
+        regex: The regex matching the paths, or names, the glob matches.
+        negated: Whether the glob includes the paths again (a leading !).
+        directory: Whether the glob only matches directories (a trailing /).
+        name: Whether the glob matches names at any depth rather than paths
+            from the root, as it has no / but a trailing one.
+    """
+
+    regex: str
+    negated: bool
+    directory: bool
+    name: bool
+
+
+def parse_glob(line: str) -> Optional[Glob]:
+    """Parses a line of a gitignore-style file.
+
+    Args:
+        line: The line, without its line end.
+
+    Returns:
+        The glob, or None for blank lines and comments.
+    """
+    stripped = line.rstrip(" \t")
+    if stripped.endswith("\\") and len(stripped) < len(line):
+        stripped += " "  # An escaped trailing space
+    if not stripped or stripped.startswith("#"):
+        return None
+    negated = stripped.startswith("!")
+    if negated or stripped.startswith(("\\!", "\\#")):
+        stripped = stripped[1:]
+    directory = stripped.endswith("/")
+    stripped = stripped.rstrip("/")
+    if not stripped:
+        return None
+    anchored = "/" in stripped
+    body = translate_glob(stripped.lstrip("/"))
+    return Glob(body, negated, directory, not anchored)
+
+
+def translate_glob(pattern: str) -> str:
+    """Translates a glob to a regex matching whole paths.
+
+    * and ? match within a path segment, [...] a character of a class, and
+    ** a whole segment at any depth, e.g. a/**/b matches a/b and a/x/y/b.
+
+    Args:
+        pattern: The glob, without a leading !, nor a leading or trailing /.
+
+    Returns:
+        The regex, to be matched with fullmatch().
+    """
+    out: List[str] = []
+    i, n = 0, len(pattern)
+    while i < n:
+        char = pattern[i]
+        if char == "*":
+            end = i
+            while end < n and pattern[end] == "*":
+                end += 1
+            whole = (i == 0 or pattern[i - 1] == "/") and (
+                end == n or pattern[end] == "/"
+            )
+            if end - i >= 2 and whole:
+                if end == n:
+                    out.append(".*")
+                else:
+                    out.append("(?:.*/)?")
+                    end += 1  # The / after **
+            else:
+                out.append("[^/]*")
+            i = end
+        elif char == "?":
+            out.append("[^/]")
+            i += 1
+        elif char == "[":
+            end = pattern.find("]", i + 2)
+            if end < 0:
+                out.append(re.escape(char))
+                i += 1
+                continue
+            members = pattern[i + 1 : end].replace("\\", "\\\\")
+            if members[0] in "!^":
+                members = "^/" + members[1:]
+            out.append(f"[{members}]")
+            i = end + 1
+        elif char == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(char))
+            i += 1
+    return "".join(out)
+
+
+def read_globs(path: str) -> List[Glob]:
+    """Reads the globs of a gitignore-style file.
+
+    Args:
+        path: The path to the file.
+
+    Returns:
+        The globs, in order, empty if the file does not exist.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            lines = file.read().splitlines()
+    except FileNotFoundError:
+        return []
+    return [glob for glob in map(parse_glob, lines) if glob is not None]
+
+
+def _anchored(pattern: str) -> bool:
+    """Tells whether a regex pattern can only match at the start.
+
+    A pattern is anchored when it starts with ^ or \\A and has no top level
+    alternation; patterns with global flags, such as (?m), are never
+    combined and not checked. Anything else, e.g. an anchor inside a group,
+    is taken as not anchored, which is always safe: it is searched for.
+    """
+    if not pattern.startswith(("^", "\\A")):
+        return False
+    depth = 0
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\":
+            index += 1
+        elif char == "[":
+            # A ] first in the set, after an optional ^, is a literal
+            index += 2 if pattern[index + 1 : index + 2] == "^" else 1
+            index += 1 if pattern[index : index + 1] == "]" else 0
+            while index < len(pattern) and pattern[index] != "]":
+                index += 2 if pattern[index] == "\\" else 1
+        elif pattern.startswith("(?#", index):
+            index = pattern.find(")", index)
+            if index == -1:
+                break
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return False
+        index += 1
+    return True
+
+
+def _alternation(patterns: List[str]):
+    """Compiles patterns into one regex, or returns None if there is none."""
+    return re.compile("|".join(patterns)) if patterns else None
+
+
+def _combine(globs: Sequence[Glob], indexes: Iterable[int]):
+    """Compiles globs into one regex whose group names are their indexes.
+
+    The globs are tried last first, so that the first alternative that
+    matches is the last glob that matches, as in .gitignore.
+    """
+    alternatives = [f"(?P<g{i}>{globs[i].regex})" for i in indexes]
+    if not alternatives:
+        return None
+    return re.compile("|".join(reversed(alternatives)), re.DOTALL)
+
+
+class ExcludeMatcher:
+    """Tells which files are excluded, with the patterns compiled once.
+
+    Attributes:
+        patterns: The regex patterns, searched in the paths as given.
+        globs: The gitignore-style globs, matched from the root.
+        root: The directory the globs are relative to.
+    """
+
+    def __init__(
+        self,
+        patterns: Sequence[str] = (),
+        globs: Sequence[Glob] = (),
+        root: Optional[str] = None,
+        cwd: Optional[str] = None,
+    ):
+        """Compiles the patterns.
+
+        Args:
+            patterns: The regex patterns.
+            globs: The gitignore-style globs.
+            root: The directory the globs are relative to (default: the
+                current directory).
+            cwd: The directory relative paths are relative to (default:
+                the current directory).
+
+        Raises:
+            re.error: If a pattern is not a valid regex.
+        """
+        self.patterns = list(patterns)
+        self.globs = list(globs)
+        self.root = os.path.abspath(root or os.curdir)
+        cwd = os.path.abspath(cwd or os.curdir)
+        self._prefix = ""
+        if cwd != self.root:
+            self._prefix = os.path.relpath(cwd, self.root)
+
+        anchored, floating = [], []
+        self._separate = []
+        for pattern in self.patterns:
+            compiled = re.compile(pattern)
+            if _UNCOMBINABLE_REGEX.search(pattern):
+                self._separate.append(compiled)
+            elif _anchored(pattern):
+                anchored.append(f"(?:{pattern})")
+            else:
+                floating.append(f"(?:{pattern})")
+        try:
+            self._anchored = _alternation(anchored)
+            self._floating = _alternation(floating)
+        except re.error:  # e.g. the same group name in two patterns
+            self._anchored = self._floating = None
+            self._separate = [re.compile(p) for p in self.patterns]
+
+        # Files are matched by the globs that are not for directories only
+        files = [i for i, g in enumerate(self.globs) if not g.directory]
+        everything = range(len(self.globs))
+        self._file_paths = _combine(
+            self.globs, [i for i in files if not self.globs[i].name]
+        )
+        self._file_names = _combine(
+            self.globs, [i for i in files if self.globs[i].name]
+        )
+        self._dir_paths = _combine(
+            self.globs, [i for i in everything if not self.globs[i].name]
+        )
+        self._dir_names = _combine(
+            self.globs, [i for i in everything if self.globs[i].name]
+        )
+        self._directories: Dict[str, bool] = {}
+
+    def excluded(self, path: str) -> bool:
+        """Tells whether a file is excluded.
+
+        Args:
+            path: The path of the file, relative to the current directory
+                or absolute.
+
+        Returns:
+            True if a regex pattern is found in the path, or the last glob
+            matching the file or one of its directories excludes it.
+        """
+        if self._anchored is not None and self._anchored.match(path):
+            return True
+        if self._floating is not None and self._floating.search(path):
+            return True
+        if any(regex.search(path) for regex in self._separate):
+            return True
+        if not self.globs:
+            return False
+        relative = self._relative(path)
+        if relative is None:
+            return False
+        parent, _, name = relative.rpartition("/")
+        if parent and self._excluded_directory(parent):
+            return True
+        return self._last_match(
+            relative, name, self._file_paths, self._file_names
+        )
+
+    def excluded_directory(self, path: str) -> bool:
+        """Tells whether every file of a directory is excluded by the globs.
+
+        Walks skip such directories instead of matching each of their
+        files. The regex patterns only apply to files.
+
+        Args:
+            path: The path of the directory, relative to the current
+                directory or absolute.
+
+        Returns:
+            True if the last glob matching the directory or one of its
+            parents excludes it.
+        """
+        if not self.globs:
+            return False
+        relative = self._relative(path)
+        return relative is not None and self._excluded_directory(relative)
+
+    def _excluded_directory(self, relative: str) -> bool:
+        """Tells whether a directory is excluded, caching the answer."""
+        excluded = self._directories.get(relative)
+        if excluded is None:
+            parent, _, name = relative.rpartition("/")
+            # A file of an excluded directory cannot be included again
+            excluded = bool(
+                parent and self._excluded_directory(parent)
+            ) or self._last_match(
+                relative, name, self._dir_paths, self._dir_names
+            )
+            self._directories[relative] = excluded
+        return excluded
+
+    def _last_match(self, relative: str, name: str, paths, names) -> bool:
+        """Tells whether the last glob matching a path excludes it."""
+        last = -1
+        for regex, subject in ((paths, relative), (names, name)):
+            match = regex.fullmatch(subject) if regex is not None else None
+            if match is not None:
+                last = max(last, int(match.lastgroup[1:]))
+        return last >= 0 and not self.globs[last].negated
+
+    def _relative(self, path: str) -> Optional[str]:
+        """Returns a path relative to the root, or None if outside it."""
+        if os.path.isabs(path):
+            path = os.path.relpath(path, self.root)
+        elif self._prefix:
+            path = os.path.join(self._prefix, path)
+        path = os.path.normpath(path)
+        if os.sep != "/":
+            path = path.replace(os.sep, "/")
+        if path == "." or path == ".." or path.startswith("../"):
+            return None
+        return path
+
+
+def load_excludes(
+    patterns: Sequence[str] = (),
+    root: Optional[str] = None,
+    cwd: Optional[str] = None,
+) -> ExcludeMatcher:
+    """Compiles the regex patterns and the globs of the ignore file.
+
+    Args:
+        patterns: The --exclude regex patterns.
+        root: The repository root, where the ignore file is (default: the
+            root of the current repository).
+        cwd: The directory relative paths are relative to (default: the
+            current directory).
+
+    Returns:
+        The matcher.
+
+    Raises:
+        re.error: If a pattern is not a valid regex.
+    """
+    if root is None:
+        # pylint: disable=import-outside-toplevel
+        from hooks.git import repo_root
+
+        root = repo_root()
+    return ExcludeMatcher(
+        patterns, read_globs(os.path.join(root, IGNORE_FILE)), root, cwd
+    )
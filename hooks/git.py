@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+This module provides helpers to query the git repository the hooks run in.
+Every git call is made lazily and at most once per process, and object
+contents are streamed from a single git cat-file process.
+"""
+
+# pylint: disable=import-outside-toplevel
+import os
+from functools import lru_cache
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from hooks.timings import timed
+
+
+@lru_cache(maxsize=None)
+@timed("git", "git rev-parse")
+def _rev_parse() -> Tuple[Optional[str], Optional[str]]:
+    """Resolves the repository root and git directory with one git call.
+
+    Returns:
+        The repository root and the absolute git directory, both None if the
+        current directory is not in a git repository.
+    """
+    import subprocess
+
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--show-toplevel", "--absolute-git-dir"],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    except OSError:
+        return None, None
+    lines = result.stdout.splitlines()
+    if result.returncode != 0 or len(lines) != 2:
+        return None, None
+    return lines[0], lines[1]
+
+
+def repo_root() -> str:
+    """Returns the root of the git repository.
+
+    Returns:
+        The repository root, or the current directory outside a repository.
+    """
+    return _rev_parse()[0] or os.getcwd()
+
+
+def git_dir() -> Optional[str]:
+    """Returns the absolute git directory of the repository.
+
+    Returns:
+        The git directory, or None outside a repository.
+    """
+    return _rev_parse()[1]
+
+
+@timed("git", "git diff --cached --name-only")
+def staged_files() -> List[str]:
+    """Lists the files staged for commit, except deleted ones.
+
+    Returns:
+        The paths of the staged files, relative to the current directory.
+
+    Raises:
+        subprocess.CalledProcessError: If git fails.
+    """
+    import subprocess
+
+    root = repo_root()
+    output = subprocess.run(
+        ["git", "diff", "--cached", "--name-only", "-z", "--diff-filter=d"],
+        capture_output=True,
+        check=True,
+        cwd=root,
+    ).stdout
+    return [
+        os.path.relpath(os.path.join(root, os.fsdecode(path)))
+        for path in output.split(b"\0")
+        if path
+    ]
+
+
+class CatFile:
+    """A long-lived git cat-file --batch process reading many objects.
+
+    Objects are requested one at a time, so reading thousands of blobs
+    costs one process instead of one per blob. The process is started on
+    the first read.
+    """
+
+    def __init__(self):
+        self._process = None
+
+    def __enter__(self) -> "CatFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @timed("git", "git cat-file")
+    def read(self, name: str) -> Optional[Tuple[str, bytes]]:
+        """Reads an object.
+
+        Args:
+            name: The object name, e.g. a SHA or ":path" for a staged file.
+
+        Returns:
+            The SHA and content of the object, or None if it does not exist.
+        """
+        if "\n" in name:
+            return None
+        if self._process is None:
+            import subprocess
+
+            self._process = subprocess.Popen(  # pylint: disable=consider-using-with
+                ["git", "cat-file", "--batch"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+        stdin, stdout = self._process.stdin, self._process.stdout
+        stdin.write(os.fsencode(name) + b"\n")
+        stdin.flush()
+        # "<sha> <type> <size>", or "<name> missing" where the name may
+        # have spaces in it
+        header = stdout.readline().rsplit(maxsplit=2)
+        if len(header) != 3 or not header[2].isdigit():
+            return None
+        data = stdout.read(int(header[2]))
+        stdout.read(1)
+        return header[0].decode(), data
+
+    def read_staged(self, path: str) -> Optional[Tuple[str, bytes]]:
+        """Reads the staged blob of a file.
+
+        Args:
+            path: The path of the file, relative to the current directory.
+
+        Returns:
+            The SHA and content of the blob, or None if the file is not in
+            the index.
+        """
+        return self.read(":./" + os.path.relpath(path))
+
+    def close(self) -> None:
+        """Stops the git cat-file process."""
+        if self._process is None:
+            return
+        self._process.stdin.close()
+        self._process.stdout.close()
+        self._process.wait()
+
+
+def history_blobs(rev_range: str) -> Iterator[Tuple[str, str]]:
+    """Streams the unique blobs reachable from a revision range.
+
+    git rev-list prints each object once, so every blob is yielded once,
+    with the path it was first seen at, however many commits contain it.
+
+    Args:
+        rev_range: The revisions to walk, e.g. "HEAD" or "main..feature".
+
+    Yields:
+        The SHA and a path of each blob.
+
+    Raises:
+        subprocess.CalledProcessError: If git fails.
+    """
+    import subprocess
+
+    command = [
+        "git",
+        "-c",
+        "core.quotePath=false",
+        "rev-list",
+        "--objects",
+        "--filter=object:type=blob",
+        *rev_range.split(),
+    ]
+    with subprocess.Popen(command, stdout=subprocess.PIPE) as process:
+        for line in process.stdout:
+            sha, _, path = line.rstrip(b"\n").partition(b" ")
+            if path:
+                yield sha.decode(), os.fsdecode(path)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+
+def _added_blobs(rev_range: str) -> Iterator[Tuple[str, str, str]]:
+    """Streams the blobs each commit adds, from the oldest commit.
+
+    Args:
+        rev_range: The revisions to walk.
+
+    Yields:
+        The SHA of the commit, and the SHA and path of each blob it adds
+        or modifies. Merges are not diffed.
+    """
+    import subprocess
+
+    command = [
+        "git",
+        "-c",
+        "core.quotePath=false",
+        "log",
+        "--reverse",
+        "--raw",
+        "--no-abbrev",
+        "--no-renames",
+        "--format=commit %H",
+        *rev_range.split(),
+    ]
+    commit = ""
+    with subprocess.Popen(command, stdout=subprocess.PIPE) as process:
+        try:
+            for line in process.stdout:
+                line = line.rstrip(b"\n")
+                if line.startswith(b"commit "):
+                    commit = line[7:].decode()
+                elif line.startswith(b":"):
+                    info, _, path = line.partition(b"\t")
+                    sha = info.split()[3].decode()
+                    yield commit, sha, os.fsdecode(path)
+        finally:
+            # The caller may stop before the end of the history
+            process.terminate()
+
+
+def first_appearances(
+    rev_range: str, shas: Set[str]
+) -> Dict[str, Tuple[str, str]]:
+    """Finds the first commit and path at which each blob appears.
+
+    The history is walked once from the oldest commit, stopping as soon as
+    every blob has been found.
+
+    Args:
+        rev_range: The revisions to walk.
+        shas: The SHAs of the blobs to look for.
+
+    Returns:
+        A dict of blob SHA to the SHA of the first commit adding it and the
+        path it was added at.
+    """
+    from contextlib import closing
+
+    found: Dict[str, Tuple[str, str]] = {}
+    if not shas:
+        return found
+    with closing(_added_blobs(rev_range)) as added:
+        for commit, sha, path in added:
+            if sha in shas and sha not in found:
+                found[sha] = (commit, path)
+                if len(found) == len(shas):
+                    break
+    return found
+
+
+def blob_paths(rev_range: str, shas: Set[str]) -> Dict[str, Set[str]]:
+    """Finds every path at which blobs are added in a revision range.
+
+    Args:
+        rev_range: The revisions to walk.
+        shas: The SHAs of the blobs to look for.
+
+    Returns:
+        A dict of blob SHA to the paths it was added at, for the blobs
+        that were found.
+    """
+    paths: Dict[str, Set[str]] = {}
+    if shas:
+        for _, sha, path in _added_blobs(rev_range):
+            if sha in shas:
+                paths.setdefault(sha, set()).add(path)
+    return paths
+
+
+class StagedChange(NamedTuple):
+    """The lines a staged diff adds to a file.
+
+    Attributes:
+        blob: The SHA of the staged blob.
+        hunks: The lines added by each hunk, or None if the file is new.
+        drops_sops: Whether the diff removes top-level SOPS metadata, as
+            decrypting a file does.
+        lines: The first line, from 1, and the number of lines of each hunk
+            in the staged blob, or None if the file is new.
+    """
+
+    blob: str
+    hunks: Optional[List[bytes]]
+    drops_sops: bool = False
+    lines: Optional[List[Tuple[int, int]]] = None
+
+
+@timed("git", "git diff --cached -U0")
+def staged_changes(paths: Sequence[str]) -> Dict[str, StagedChange]:
+    """Lists the lines added to files by the staged diff, with one git call.
+
+    Files whose staged content does not differ from HEAD, or whose diff
+    cannot be parsed (e.g. quoted paths), are left out.
+
+    Args:
+        paths: The paths of the files, relative to the current directory.
+
+    Returns:
+        A dict of path, as given, to its staged change.
+
+    Raises:
+        subprocess.CalledProcessError: If git fails.
+    """
+    import subprocess
+
+    if not paths:
+        return {}
+    output = subprocess.run(
+        [
+            "git",
+            "-c",
+            "core.quotePath=false",
+            "diff",
+            "--cached",
+            "--relative",
+            "--unified=0",
+            "--no-color",
+            "--no-ext-diff",
+            "--no-prefix",
+            "--full-index",
+            "--diff-filter=d",
+            "--no-renames",
+            "--no-indent-heuristic",
+            "--diff-algorithm=myers",
+            "--",
+            *paths,
+        ],
+        capture_output=True,
+        check=True,
+    ).stdout
+
+    by_name = {os.path.normpath(path): path for path in paths}
+    changes: Dict[str, StagedChange] = {}
+    change: Optional[StagedChange] = None
+    blob = ""
+    new_file = in_header = False
+    for line in output.split(b"\n"):
+        if line.startswith(b"diff --git "):
+            blob, new_file, in_header, change = "", False, True, None
+        elif not in_header:
+            if change is None or change.hunks is None:
+                continue
+            if line.startswith(b"@@ "):
+                change.hunks.append([])
+                # @@ -<old start>[,<count>] +<new start>[,<count>] @@
+                new = line.split(b" ")[2][1:].split(b",")
+                count = int(new[1]) if len(new) > 1 else 1
+                change.lines.append((int(new[0]), count))
+            elif line.startswith(b"+"):
+                change.hunks[-1].append(line[1:])
+            elif line.startswith(b"-sops:"):
+                changes[path] = change = change._replace(drops_sops=True)
+        elif line.startswith(b"index "):
+            blob = line.split()[1].split(b"..")[1].decode()
+        elif line.startswith(b"--- "):
+            new_file = line == b"--- /dev/null"
+        elif line.startswith(b"+++ "):
+            in_header = False
+            # git ends paths with spaces in them with a tab
+            name = os.fsdecode(line[4:].rstrip(b"\t"))
+            path = by_name.get(os.path.normpath(name))
+            if path is not None:
+                if new_file:
+                    change = StagedChange(blob, None)
+                else:
+                    change = StagedChange(blob, [], lines=[])
+                changes[path] = change
+    # Join the lines of each hunk, dropping hunks that only remove lines
+    for path, change in changes.items():
+        if change.hunks is not None:
+            hunks = [b"\n".join(lines) + b"\n" for lines in change.hunks]
+            kept = [i for i, hunk in enumerate(hunks) if hunk != b"\n"]
+            changes[path] = change._replace(
+                hunks=[hunks[i] for i in kept],
+                lines=[change.lines[i] for i in kept],
+            )
+    return changes
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+This module scans the history of a git repository for secrets, to audit
+secrets committed before the hooks were installed.
+
+Every unique blob reachable from a revision range is scanned exactly once,
+streamed from a single git cat-file process and scanned by a pool of worker
+processes. Only a bounded number of blobs are in flight at a time, so memory
+use does not grow with the size of the history.
+"""
+
+from collections import deque
+from itertools import chain
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from hooks.exclude import ExcludeMatcher, load_excludes
+from hooks.forbid_secrets import SCAN_TIME_BUDGET, ScanResult, scan_file
+from hooks.git import (
+    CatFile,
+    blob_paths,
+    first_appearances,
+    history_blobs,
+    repo_root,
+)
+
+if TYPE_CHECKING:
+    from hooks.cache import ScanCache
+
+# Blobs scanned or queued per worker process at any time
+BLOBS_IN_FLIGHT_PER_JOB = 16
+
+
+class HistoryFinding(NamedTuple):
+    """A blob in the history with unencrypted secrets, or not fully scanned.
+
+    Attributes:
+        blob: The SHA of the blob.
+        commit: The SHA of the first commit adding the blob, or None if it
+            was only added by a merge.
+        path: The path the blob was first added at.
+        kubernetes_secret: Whether the blob has a Kubernetes Secret.
+        detectors: The identifiers of the detectors that matched.
+        timed_out: Whether scanning the blob exceeded its time budget, in
+            which case it was not checked for secrets.
+        errors: Errors encountered while scanning the blob, e.g. YAML that
+            could not be parsed.
+    """
+
+    blob: str
+    commit: Optional[str]
+    path: str
+    kubernetes_secret: bool
+    detectors: List[str]
+    timed_out: bool = False
+    errors: List[str] = []
+
+
+def scan_history(
+    rev_range: str,
+    hook_ids: Sequence[str],
+    jobs: int = 1,
+    cache: Optional["ScanCache"] = None,
+    excludes: Optional[ExcludeMatcher] = None,
+    budget: Optional[float] = SCAN_TIME_BUDGET,
+) -> List[HistoryFinding]:
+    """Scans every unique blob reachable from a revision range.
+
+    Args:
+        rev_range: The revisions to walk, e.g. "HEAD" or "main..feature".
+        hook_ids: The identifiers of the hooks to run.
+        jobs: The maximum number of worker processes.
+        cache: The scan cache (optional); verdicts are keyed by blob SHA,
+            so cached blobs are not even read.
+        excludes: The paths to skip, relative to the repository root
+            (default: the globs of .forbidsecretsignore).
+        budget: The seconds the scan of each blob may take.
+
+    Returns:
+        The blobs with unencrypted secrets, with errors or that could not
+        be scanned in time, in the order git listed them. A blob git listed
+        at an excluded path is only skipped if every path it was added at
+        is excluded; it is scanned last otherwise.
+    """
+    hook_ids = tuple(hook_ids)
+    if excludes is None:
+        root = repo_root()
+        excludes = load_excludes((), root, cwd=root)
+    excluded: Set[str] = set()
+
+    def listed() -> Iterator[Tuple[str, str]]:
+        for sha, path in history_blobs(rev_range):
+            if excludes.excluded(path):
+                excluded.add(sha)
+            else:
+                yield sha, path
+
+    def included_elsewhere() -> Iterator[Tuple[str, str]]:
+        # git lists each blob at one of its paths only
+        for sha, paths in blob_paths(rev_range, excluded).items():
+            included = sorted(p for p in paths if not excludes.excluded(p))
+            if included:
+                yield sha, included[0]
+
+    blobs = chain(listed(), included_elsewhere())
+
+    results = []
+    with CatFile() as cat_file:
+        scanned = _scan_blobs(blobs, cat_file, hook_ids, jobs, cache, budget)
+        for key, result in scanned:
+            if key and cache is not None and not result.errors:
+                cache.put(key, result.verdict())
+            if result.found or result.errors:
+                results.append(result)
+
+    commits = first_appearances(rev_range, {r.blob for r in results})
+    return [
+        HistoryFinding(
+            result.blob,
+            *commits.get(result.blob, (None, result.filename)),
+            result.kubernetes_secret,
+            result.detectors,
+            result.timed_out,
+            result.errors,
+        )
+        for result in results
+    ]
+
+
+def _scan_blobs(
+    blobs: Iterable[Tuple[str, str]],
+    cat_file: CatFile,
+    hook_ids: Tuple[str, ...],
+    jobs: int,
+    cache: Optional["ScanCache"],
+    budget: Optional[float] = SCAN_TIME_BUDGET,
+) -> Iterator[Tuple[Optional[str], ScanResult]]:
+    """Scans blobs, in a process pool if more than one job is allowed.
+
+    Args:
+        blobs: The SHA and path of each blob.
+        cat_file: The git cat-file process to read blobs with.
+        hook_ids: The identifiers of the hooks to run.
+        jobs: The maximum number of worker processes.
+        cache: The scan cache (optional).
+        budget: The seconds the scan of each blob may take.
+
+    Yields:
+        The cache key to store the verdict under (None for cache hits and
+        without a cache) and the scan result of each blob.
+    """
+
+    def read() -> Iterator[Tuple[Optional[str], Any]]:
+        """Yields cached results, or blobs to scan, with their cache key."""
+        for sha, path in blobs:
+            key = None
+            if cache is not None:
+                key, verdict = cache.get_blob(sha, hook_ids)
+                if verdict is not None:
+                    yield None, ScanResult(path, blob=sha, **verdict)
+                    continue
+            blob = cat_file.read(sha)
+            if blob is not None:
+                yield key, (path, sha, blob[1])
+
+    scan = _ScanBlob(hook_ids, budget)
+    if jobs <= 1:
+        for key, item in read():
+            yield key, item if isinstance(item, ScanResult) else scan(item)
+        return
+
+    # pylint: disable=import-outside-toplevel
+    from concurrent.futures import ProcessPoolExecutor
+
+    from hooks.registry import load_detectors
+
+    limit = jobs * BLOBS_IN_FLIGHT_PER_JOB
+    pending: deque = deque()
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=load_detectors
+    ) as executor:
+        for key, item in read():
+            if not isinstance(item, ScanResult):
+                item = executor.submit(scan, item)
+            pending.append((key, item))
+            while len(pending) >= limit:
+                yield _resolve(*pending.popleft())
+        while pending:
+            yield _resolve(*pending.popleft())
+
+
+def _resolve(key, item) -> Tuple[Optional[str], ScanResult]:
+    """Waits for the result of a blob scanned by a worker process."""
+    return key, item if isinstance(item, ScanResult) else item.result()
+
+
+class _ScanBlob:  # pylint: disable=too-few-public-methods
+    """Scans one blob; a class rather than a closure so it can be pickled."""
+
+    def __init__(
+        self,
+        hook_ids: Tuple[str, ...],
+        budget: Optional[float] = SCAN_TIME_BUDGET,
+    ):
+        self.hook_ids = hook_ids
+        self.budget = budget
+
+    def __call__(self, item: Tuple[str, str, bytes]) -> ScanResult:
+        path, sha, data = item
+        result = scan_file(path, self.hook_ids, data, self.budget)
+        return result._replace(blob=sha)
+
+
+def scan_history_main(
+    rev_range: str,
+    hook_ids: Sequence[str],
+    jobs: int,
+    cache: Optional["ScanCache"],
+    excludes: Optional[ExcludeMatcher],
+    report: Callable[[int, str], None],
+    budget: Optional[float] = SCAN_TIME_BUDGET,
+    summary: Optional[Callable[[int, str], None]] = None,
+) -> int:
+    """Scans the history and reports each finding.
+
+    Args:
+        rev_range: The revisions to walk.
+        hook_ids: The identifiers of the hooks to run.
+        jobs: The maximum number of worker processes.
+        cache: The scan cache (optional).
+        excludes: The paths to skip, relative to the repository root.
+        report: The function printing messages, taking a debug level.
+        budget: The seconds the scan of each blob may take.
+        summary: The function printing the blobs that could not be scanned
+            in time and the number of blobs with secrets, which are printed
+            in quiet mode too (default: report).
+
+    Returns:
+        Exit code: 1 if secrets were found in the history or a blob could
+        not be scanned in time, 0 otherwise.
+    """
+    summary = report if summary is None else summary
+    findings = scan_history(
+        rev_range, hook_ids, jobs, cache, excludes, budget
+    )
+    for finding in findings:
+        where = (
+            f"{finding.path} at commit {finding.commit}"
+            if finding.commit
+            else f"{finding.path} (blob {finding.blob})"
+        )
+        if finding.timed_out:
+            summary(
+                1,
+                f"WARNING: Scanning {where} exceeded the time budget of "
+                f"{budget:g}s; it was not checked for secrets",
+            )
+        else:
+            for error in finding.errors:
+                report(2, f"{error} ({where})")
+        if finding.kubernetes_secret:
+            report(
+                1,
+                f"WARNING: Detected unencrypted Kubernetes Secret in {where}",
+            )
+        for hook_id in finding.detectors:
+            report(
+                1,
+                f"WARNING: Detected potential "
+                f"{hook_id.replace('-', ' ').title()} in {where}",
+            )
+    secrets = [
+        finding
+        for finding in findings
+        if finding.kubernetes_secret or finding.detectors
+    ]
+    if secrets:
+        summary(
+            1,
+            f"Secrets were found in {len(secrets)} blob(s) of the history. "
+            "Rotate them; encrypting the files now does not remove them "
+            "from the history.",
+        )
+    failed = secrets or any(finding.timed_out for finding in findings)
+    return 1 if failed else 0
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+This module provides the log of the hooks.
+
+Messages are printed with the date, the hostname and their level, in the
+level's color. What does not change during a run, i.e. the level threshold
+set by DEBUG_LEVEL, the hostname and whether the stream shows colors, is
+resolved once when the log is created, so that a message below the
+threshold costs a comparison. The lines are buffered and written in
+batches, as hooks log several messages per file.
+"""
+
+import os
+import sys
+import time
+from typing import List, Optional, TextIO
+
+# Debug levels
+DEBUG_LEVELS = {
+    "INFO": 0,
+    "WARN": 1,
+    "ERROR": 2,
+    "DEBUG": 3,
+    "TRACE": 4,
+    "FATAL": 5,
+}
+FATAL = DEBUG_LEVELS["FATAL"]
+
+# ANSI colors of the debug levels
+COLOR_CODES = (
+    "\033[1;32m",
+    "\033[1;33m",
+    "\033[1;31m",
+    "\033[1;34m",
+    "\033[1;38;5;208m",
+    "\033[1;3;31m",
+)
+RESET_COLOR = "\033[0m"
+
+# Number of lines buffered before they are written
+BUFFER_LINES = 256
+
+
+def use_colors(stream: TextIO) -> bool:
+    """Tells whether messages written to a stream should be colored.
+
+    NO_COLOR turns colors off and FORCE_COLOR on, e.g. for the scan daemon,
+    which writes to a buffer its client prints to a terminal. Otherwise
+    only terminals get colors.
+
+    Args:
+        stream: The stream the messages are written to.
+
+    Returns:
+        True if the messages should be colored.
+    """
+    if os.environ.get("NO_COLOR"):
+        return False
+    if os.environ.get("FORCE_COLOR"):
+        return True
+    try:
+        return stream.isatty()
+    except (AttributeError, ValueError):  # No isatty() or closed
+        return False
+
+
+class Logger:
+    """Prints the messages of a run, buffered.
+
+    Call flush() when the run ends, or when the messages must be seen
+    before something else is printed.
+    """
+
+    def __init__(
+        self,
+        stream: Optional[TextIO] = None,
+        quiet: bool = False,
+        buffered: bool = True,
+    ):
+        """Resolves the settings of the log.
+
+        Args:
+            stream: Where messages go (default: standard output).
+            quiet: Whether to only print summary() messages, and fatal ones.
+            buffered: Whether to batch the lines; a long-running command
+                whose messages must appear as they happen passes False.
+        """
+        import socket  # pylint: disable=import-outside-toplevel
+
+        self.stream = sys.stdout if stream is None else stream
+        self.quiet = quiet
+        self.buffered = buffered
+        threshold = DEBUG_LEVELS.get(os.environ.get("DEBUG_LEVEL", "WARN"), 1)
+        # Whether each level is printed, and how its lines start and end
+        self._enabled = [
+            level == FATAL or (level <= threshold and not quiet)
+            for level in range(len(COLOR_CODES))
+        ]
+        self._summary = [
+            level == FATAL or level <= threshold
+            for level in range(len(COLOR_CODES))
+        ]
+        colors = COLOR_CODES
+        if not use_colors(self.stream):
+            colors = ("",) * len(COLOR_CODES)
+        reset = RESET_COLOR if colors[0] else ""
+        hostname = socket.gethostname()
+        self._prefixes = [
+            f" {hostname} {color}{name}:{reset}\t{color}"
+            for name, color in zip(DEBUG_LEVELS, colors)
+        ]
+        self._suffix = f"{reset}\n"
+        self._lines: List[str] = []
+        self._second = -1
+        self._date = ""
+
+    def enabled(self, level: int) -> bool:
+        """Tells whether messages of a level are printed.
+
+        Args:
+            level: The debug level (0-5).
+
+        Returns:
+            True if debug() prints messages of the level.
+        """
+        return self._enabled[level]
+
+    def debug(self, level: int, *messages: str) -> None:
+        """Logs messages if their level is printed.
+
+        Args:
+            level: The debug level (0-5).
+            *messages: The messages to log, joined by spaces.
+        """
+        if self._enabled[level]:
+            self._add(level, messages)
+
+    def summary(self, level: int, *messages: str) -> None:
+        """Logs messages that are printed in quiet mode too.
+
+        Args:
+            level: The debug level (0-5).
+            *messages: The messages to log, joined by spaces.
+        """
+        if self._summary[level]:
+            self._add(level, messages)
+
+    def flush(self) -> None:
+        """Writes the buffered lines."""
+        if self._lines:
+            self.stream.write("".join(self._lines))
+            self._lines.clear()
+            self.stream.flush()
+
+    def _add(self, level: int, messages: tuple) -> None:
+        """Buffers a line, writing the buffer when it is full."""
+        second = int(time.time())
+        if second != self._second:
+            self._second = second
+            self._date = time.strftime(
+                "%b %d %H:%M:%S", time.localtime(second)
+            )
+        self._lines.append(
+            f"{self._date}{self._prefixes[level]}{' '.join(messages)}"
+            f"{self._suffix}"
+        )
+        if (
+            not self.buffered
+            or level == FATAL
+            or len(self._lines) >= BUFFER_LINES
+        ):
+            self.flush()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+This module loads custom secret detectors from the repository configuration
+and registers them next to the built-in ones.
+
+Detectors are read from .forbid-secrets.toml or .forbid-secrets.yaml at the
+root of the repository. Parsing and validating the rules, and finding the
+literal prefix of every pattern, is done once per version of the file: the
+result is stored in the git directory keyed by the hash of the file, so that
+later runs only read it back. Patterns are compiled lazily, once per process.
+The file is looked at again on every load, so a long running process such as
+the scan daemon picks up changes on its next request.
+"""
+
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from hooks import detectors
+from hooks.backtracking import hazards
+from hooks.cache import code_version
+from hooks.detectors import (
+    DETECTORS,
+    SECRET_CHECKS,
+    Detector,
+    EntropyDetector,
+    required_prefix,
+)
+from hooks.environment import StatKey, stat_key
+from hooks.git import git_dir, repo_root
+
+# Configuration files, in order of precedence
+CONFIG_FILES = (
+    ".forbid-secrets.toml",
+    ".forbid-secrets.yaml",
+    ".forbid-secrets.yml",
+)
+
+# Bump when the stored form of the rules changes
+REGISTRY_FORMAT = 1
+
+SEVERITIES = ("error", "warning", "note")
+
+FLAGS = {
+    "IGNORECASE": re.IGNORECASE,
+    "MULTILINE": re.MULTILINE,
+    "DOTALL": re.DOTALL,
+}
+
+DETECTOR_ID_REGEX = re.compile(r"[a-z0-9][a-z0-9-]*")
+
+# Identifiers with a meaning of their own on the command line
+RESERVED_IDS = frozenset(("all", "kubernetes-secret"))
+
+# The built-in detectors, restored before custom ones are registered
+_BUILTIN_DETECTORS = dict(DETECTORS)
+_BUILTIN_CHECKS = dict(SECRET_CHECKS)
+
+# The configuration registered in this process, as (path, stat)
+_registered: List[Tuple[Optional[str], StatKey]] = []
+
+
+def config_path(root: Optional[str] = None) -> Optional[str]:
+    """Finds the detector configuration of a repository.
+
+    Args:
+        root: The repository root (default: the current repository).
+
+    Returns:
+        The path of the first configuration file found, or None.
+    """
+    root = root or repo_root()
+    for name in CONFIG_FILES:
+        path = os.path.join(root, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def load_detectors(root: Optional[str] = None) -> List[str]:
+    """Registers the detectors of the repository configuration.
+
+    Custom detectors are added to DETECTORS and SECRET_CHECKS, so every hook
+    id, "all" included, sees them. A custom detector with the id of a
+    built-in one replaces it. Nothing is done while the configuration is
+    unchanged since the last load.
+
+    Args:
+        root: The repository root (default: the current repository).
+
+    Returns:
+        The identifiers of the custom detectors, in order.
+
+    Raises:
+        ValueError: If the configuration is invalid.
+    """
+    path = config_path(root)
+    key = (path, stat_key(path) if path else None)
+    if _registered and _registered[0] == key:
+        return [i for i in DETECTORS if DETECTORS[i] is not _builtin(i)]
+    specs = _load_specs(path) if path else []
+    register([build_detector(spec) for spec in specs])
+    _registered[:] = [key]
+    return [spec["id"] for spec in specs]
+
+
+def _builtin(detector_id: str) -> Optional[Detector]:
+    return _BUILTIN_DETECTORS.get(detector_id)
+
+
+def register(custom: List[Detector]) -> None:
+    """Replaces the custom detectors with new ones.
+
+    Args:
+        custom: The custom detectors, in order.
+    """
+    DETECTORS.clear()
+    DETECTORS.update(_BUILTIN_DETECTORS)
+    SECRET_CHECKS.clear()
+    SECRET_CHECKS.update(_BUILTIN_CHECKS)
+    for detector in custom:
+        DETECTORS[detector.id] = detector
+        SECRET_CHECKS[detector.id] = detector.search
+    detectors._ENGINES.clear()  # pylint: disable=protected-access
+    detectors.generation += 1
+
+
+def build_detector(spec: dict) -> Detector:
+    """Creates a detector from its validated rule.
+
+    Args:
+        spec: The rule, as returned by parse_rules().
+
+    Returns:
+        The detector, with its regex not compiled yet.
+    """
+    if spec["type"] == "entropy":
+        detector: Detector = EntropyDetector(
+            spec["id"],
+            spec["base64_threshold"],
+            spec["hex_threshold"],
+            spec["min_length"],
+        )
+    else:
+        detector = Detector(
+            spec["id"], spec["pattern"], spec["flags"], spec["prefix"]
+        )
+        detector.combinable = spec["combinable"]
+    detector.severity = spec["severity"]
+    return detector
+
+
+def _index_path() -> Optional[str]:
+    directory = git_dir()
+    if directory is None:
+        return None
+    return os.path.join(directory, "sops-pre-commit", "detectors.json")
+
+
+def _load_specs(path: str) -> List[dict]:
+    """Reads the rules of a configuration file, from the index if current.
+
+    Args:
+        path: The path of the configuration file.
+
+    Returns:
+        The validated rules.
+
+    Raises:
+        ValueError: If the configuration is invalid.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    digest = hashlib.sha256(
+        f"{REGISTRY_FORMAT}\0{code_version()}\0{path}\0".encode() + data
+    ).hexdigest()
+    index_path = _index_path()
+    if index_path is not None:
+        try:
+            with open(index_path, "r", encoding="utf-8") as file:
+                index = json.load(file)
+            if index["hash"] == digest:
+                return index["detectors"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    specs = parse_rules(path, data)
+    if index_path is not None:
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            temporary = f"{index_path}.{os.getpid()}.tmp"
+            with open(temporary, "w", encoding="utf-8") as file:
+                json.dump({"hash": digest, "detectors": specs}, file)
+            os.replace(temporary, index_path)
+        except OSError:
+            pass
+    return specs
+
+
+def parse_rules(path: str, data: bytes) -> List[dict]:
+    """Parses and validates the detectors of a configuration file.
+
+    Args:
+        path: The path of the file, whose extension selects TOML or YAML.
+        data: The content of the file.
+
+    Returns:
+        The rules, with flags resolved to an int and the literal prefix of
+        each pattern computed.
+
+    Raises:
+        ValueError: If the configuration is invalid.
+    """
+    try:
+        if path.endswith(".toml"):
+            import tomllib  # pylint: disable=import-outside-toplevel
+
+            config = tomllib.loads(data.decode("utf-8"))
+        else:
+            # pylint: disable=import-outside-toplevel
+            from hooks.forbid_secrets import _safe_yaml_loader
+
+            config = _safe_yaml_loader().load(data)
+    except ImportError as e:
+        raise ValueError(f"{path}: TOML needs Python 3.11 or later") from e
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        raise ValueError(f"{path}: {e}") from e
+
+    rules = config.get("detectors") if isinstance(config, dict) else None
+    if not isinstance(rules, list):
+        raise ValueError(f"{path}: expected a list of detectors")
+    specs: List[dict] = []
+    seen: Dict[str, int] = {}
+    for index, rule in enumerate(rules):
+        where = f"{path}: detector {index + 1}"
+        if not isinstance(rule, dict):
+            raise ValueError(f"{where}: expected a table of settings")
+        spec = _validate(rule, where)
+        if spec["id"] in seen:
+            raise ValueError(f"{where}: duplicate id {spec['id']!r}")
+        seen[spec["id"]] = index
+        specs.append(spec)
+    return specs
+
+
+def _validate(rule: dict, where: str) -> dict:
+    """Validates one rule and resolves what can be computed ahead of time.
+
+    Args:
+        rule: The settings of the detector.
+        where: The location of the rule, for error messages.
+
+    Returns:
+        The rule, ready for build_detector().
+
+    Raises:
+        ValueError: If the rule is invalid.
+    """
+    detector_id = rule.get("id")
+    if not isinstance(detector_id, str) or not DETECTOR_ID_REGEX.fullmatch(
+        detector_id
+    ):
+        raise ValueError(f"{where}: id must be lowercase letters, digits, -")
+    if detector_id in RESERVED_IDS:
+        raise ValueError(f"{where}: id {detector_id!r} is reserved")
+    severity = rule.get("severity", "error")
+    if severity not in SEVERITIES:
+        raise ValueError(f"{where}: severity must be one of {SEVERITIES}")
+    kind = rule.get("type", "regex")
+
+    if kind == "entropy":
+        spec = {"type": "entropy", "id": detector_id, "severity": severity}
+        for setting, default in (
+            ("base64_threshold", detectors.ENTROPY_BASE64_THRESHOLD),
+            ("hex_threshold", detectors.ENTROPY_HEX_THRESHOLD),
+            ("min_length", detectors.ENTROPY_MIN_LENGTH),
+        ):
+            value = rule.get(setting, default)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{where}: {setting} must be a number")
+            spec[setting] = int(value) if setting == "min_length" else value
+        return spec
+    if kind != "regex":
+        raise ValueError(f"{where}: type must be regex or entropy")
+
+    pattern = rule.get("pattern")
+    if not isinstance(pattern, str) or not pattern:
+        raise ValueError(f"{where}: pattern is required")
+    flags = 0
+    names = rule.get("flags", [])
+    if not isinstance(names, list):
+        names = [names]
+    for name in names:
+        if name not in FLAGS:
+            raise ValueError(f"{where}: flags must be among {list(FLAGS)}")
+        flags |= FLAGS[name]
+    try:
+        # Scoped like in the combined regex, where global flags are invalid
+        regex = re.compile(f"(?:{pattern})", flags)
+    except re.error as e:
+        raise ValueError(f"{where}: invalid pattern: {e}") from e
+    problems = hazards(pattern, flags)
+    if problems:
+        raise ValueError(
+            f"{where}: pattern can backtrack catastrophically, "
+            f"{'; '.join(problems)}; make them match different characters "
+            "or use a possessive quantifier (Python 3.11+)"
+        )
+
+    derived = required_prefix(pattern)
+    prefix = rule.get("prefix", derived)
+    if not isinstance(prefix, str):
+        raise ValueError(f"{where}: prefix must be a string")
+    # The prefix is searched for before the regex is tried: one that some
+    # matches do not start with would hide them
+    if not derived.lower().startswith(prefix.lower()):
+        raise ValueError(
+            f"{where}: prefix must start the literal text every match "
+            f"starts with, {derived!r}"
+        )
+    return {
+        "type": "regex",
+        "id": detector_id,
+        "pattern": pattern,
+        "flags": flags,
+        "prefix": prefix,
+        # Groups would clash or be renumbered in the combined alternation
+        "combinable": not regex.groups,
+        "severity": severity,
+    }
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+This module reports where secrets were found, as JSON, JSON Lines or SARIF.
+
+Scans only record which detectors matched a file, so that verdicts can be
+cached. The files with findings are searched again here for every match of
+those detectors, and each finding is written as soon as it is located, so
+the output of a large scan is never held in memory.
+"""
+
+import abc
+import heapq
+import json
+import mmap
+import os
+import re
+from typing import IO, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from hooks.detectors import DETECTORS, SECRET_CHECKS, _text
+from hooks.encoding import ASCII_COMPATIBLE, SNIFF_SIZE, decode, sniff
+from hooks.forbid_secrets import (
+    LARGE_FILE_THRESHOLD,
+    ScanResult,
+    is_unencrypted_secret,
+    kubernetes_secret_probes,
+)
+
+# Output formats of --format; "text" is the log of the hook itself
+FORMATS = ("text", "json", "jsonl", "sarif")
+
+# Characters of a secret left visible in snippets, when it is long enough to
+# keep most of it hidden
+REDACT_KEEP = 4
+
+# Replaces the rest of the secret, whatever its length
+REDACTION = "****"
+
+# Characters of tokens, such as base64, base64url and JWTs: a secret is
+# redacted up to the first other character, so that the snippet does not
+# show the rest of a token a detector only matched the start of
+TOKEN_CHARACTERS = r"[A-Za-z0-9+/=_.~-]*"
+_TOKEN_REST = re.compile(TOKEN_CHARACTERS)
+_BYTE_TOKEN_REST = re.compile(TOKEN_CHARACTERS.encode())
+
+# Maximum length of a snippet, cut around the secret
+SNIPPET_MAX_LENGTH = 160
+
+# Bytes of a memory map copied at a time to count its lines
+COUNT_CHUNK_SIZE = 64 * 1024
+
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+SARIF_TOOL = "forbid-secrets"
+SARIF_TOOL_URI = "https://github.com/djh00t/sops-pre-commit"
+
+
+class Finding(NamedTuple):
+    """A secret found in a file.
+
+    Attributes:
+        path: The path of the file.
+        detector: The identifier of the hook that found the secret.
+        line: The line of the start of the secret, from 1.
+        column: The column of the start of the secret, from 1, in
+            characters.
+        snippet: The line of the secret, with the secret redacted.
+        blob: The git blob SHA of the scanned content, when it was read
+            from the index rather than the working tree.
+        severity: The severity of the detector: error, warning or note.
+    """
+
+    path: str
+    detector: str
+    line: int
+    column: int
+    snippet: str
+    blob: Optional[str] = None
+    severity: str = "error"
+
+    def to_dict(self) -> dict:
+        """Returns the finding as a JSON object, without an empty blob."""
+        finding = self._asdict()
+        if self.blob is None:
+            del finding["blob"]
+        return finding
+
+
+def redact(secret: str) -> str:
+    """Hides a secret, keeping its first characters if it is long enough.
+
+    Args:
+        secret: The secret.
+
+    Returns:
+        The redacted secret, which does not reveal its length.
+    """
+    if len(secret) < 3 * REDACT_KEEP:
+        return REDACTION
+    return secret[:REDACT_KEEP] + REDACTION
+
+
+def find_secrets(
+    path: str,
+    content,
+    hook_ids: Sequence[str],
+    blob: Optional[str] = None,
+) -> Iterator[Finding]:
+    """Locates every match of the given hooks in some content.
+
+    Args:
+        path: The path of the file the content is from.
+        content: The str or bytes-like content, such as an mmap.
+        hook_ids: The identifiers of the hooks to locate, including
+            kubernetes-secret.
+        blob: The git blob SHA of the content, if read from the index.
+
+    Yields:
+        The findings in order of position, then of hook.
+    """
+    spans: List[Iterator[Tuple[int, int, int, str]]] = []
+    for order, hook_id in enumerate(hook_ids):
+        if hook_id in SECRET_CHECKS:
+            spans.append(_detector_spans(DETECTORS[hook_id], content, order))
+        elif hook_id == "kubernetes-secret":
+            spans.append(_kubernetes_secret_spans(content, order))
+
+    newline = "\n" if isinstance(content, str) else b"\n"
+    line, last = 1, 0
+    for start, _, end, hook_id in heapq.merge(*spans):
+        line += _count(content, newline, last, start)
+        last = start
+        line_start = content.rfind(newline, 0, start) + 1
+        line_end = content.find(newline, start)
+        if line_end == -1:
+            line_end = len(content)
+        end = min(end, line_end)
+        if hook_id != "kubernetes-secret":
+            rest = _BYTE_TOKEN_REST if newline == b"\n" else _TOKEN_REST
+            end = rest.match(content, end, line_end).end()
+        head = _text(content[line_start:start])
+        secret = _text(content[start:end])
+        tail = _text(content[end:line_end])
+        if hook_id != "kubernetes-secret":
+            secret = redact(secret)
+        yield Finding(
+            path,
+            hook_id,
+            line,
+            len(head) + 1,
+            _snippet(head, secret, tail.rstrip("\r")),
+            blob,
+            _severity(hook_id),
+        )
+
+
+def _count(content, needle, start: int, end: int) -> int:
+    """Counts a character between two positions of some content.
+
+    Memory maps have no count(), and are copied a chunk at a time rather
+    than whole.
+    """
+    if isinstance(content, (str, bytes)):
+        return content.count(needle, start, end)
+    return sum(
+        content[i : min(i + COUNT_CHUNK_SIZE, end)].count(needle)
+        for i in range(start, end, COUNT_CHUNK_SIZE)
+    )
+
+
+def _severity(hook_id: str) -> str:
+    """Returns the severity of the findings of a hook."""
+    detector = DETECTORS.get(hook_id)
+    return "error" if detector is None else detector.severity
+
+
+def _detector_spans(
+    detector, content, order: int
+) -> Iterator[Tuple[int, int, int, str]]:
+    """Yields the start, order, end and hook id of each match of a detector."""
+    for match in detector.finditer(content):
+        start, end = detector.secret_span(match)
+        yield start, order, end, detector.id
+
+
+def _kubernetes_secret_spans(
+    content, order: int
+) -> Iterator[Tuple[int, int, int, str]]:
+    """Yields the span of the kind line of each unencrypted Secret.
+
+    Bytes-like content is probed in place, and only the documents with a
+    "kind: Secret" line are decoded.
+    """
+    from ruamel.yaml import YAMLError  # pylint: disable=import-error
+
+    for position, document in kubernetes_secret_probes(content):
+        try:
+            unencrypted = is_unencrypted_secret(document)
+        except YAMLError:
+            continue
+        if unencrypted:
+            yield position, order, position, "kubernetes-secret"
+
+
+def _snippet(head: str, secret: str, tail: str) -> str:
+    """Joins a line around a secret, cut to at most SNIPPET_MAX_LENGTH."""
+    snippet = head + secret + tail
+    if len(snippet) <= SNIPPET_MAX_LENGTH:
+        return snippet
+    start = max(0, len(head) - SNIPPET_MAX_LENGTH // 2)
+    return snippet[start : start + SNIPPET_MAX_LENGTH]
+
+
+def locate(
+    result: ScanResult, hook_ids: Sequence[str], cat_file=None
+) -> Iterator[Finding]:
+    """Locates the findings of a scan result.
+
+    Only the hooks that matched are searched. Staged content is read again
+    from its blob; large files are memory-mapped, unless they are UTF-16 or
+    UTF-32 text.
+
+    Args:
+        result: The result of scanning a file.
+        hook_ids: The identifiers of the hooks that were run, for ordering.
+        cat_file: A git cat-file process, to read staged blobs (optional).
+
+    Yields:
+        The findings of the file, in order of position.
+
+    Raises:
+        OSError: If the file cannot be read.
+    """
+    if not result.found:
+        return
+    matched = [
+        hook_id
+        for hook_id in hook_ids
+        if hook_id in result.detectors
+        or (hook_id == "kubernetes-secret" and result.kubernetes_secret)
+    ]
+    if result.blob is not None and cat_file is not None:
+        blob = cat_file.read(result.blob)
+        if blob is not None:
+            content = decode(blob[1], sniff(blob[1][:SNIFF_SIZE]))
+            yield from find_secrets(
+                result.filename, content, matched, result.blob
+            )
+        return
+
+    with open(result.filename, "rb") as file:
+        codec = sniff(file.read(SNIFF_SIZE))
+        file.seek(0)
+        if (
+            os.fstat(file.fileno()).st_size < LARGE_FILE_THRESHOLD
+            or codec not in ASCII_COMPATIBLE
+        ):
+            content = decode(file.read(), codec)
+            yield from find_secrets(result.filename, content, matched)
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield from find_secrets(result.filename, buffer, matched)
+
+
+class Reporter(abc.ABC):
+    """Writes findings to a stream as they are found.
+
+    Reporters are context managers: entering one writes what comes before
+    the findings, exiting writes what comes after.
+
+    Attributes:
+        stream: The text stream to write to.
+        hook_ids: The identifiers of the hooks that are run.
+        count: The number of findings written.
+    """
+
+    def __init__(self, stream: IO[str], hook_ids: Sequence[str] = ()):
+        self.stream = stream
+        self.hook_ids = list(hook_ids)
+        self.count = 0
+
+    def __enter__(self) -> "Reporter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stream.flush()
+
+    @abc.abstractmethod
+    def add(self, finding: Finding) -> None:
+        """Writes a finding."""
+
+    def add_all(self, findings: Iterator[Finding]) -> None:
+        """Writes findings, then flushes the stream so they can be read."""
+        for finding in findings:
+            self.add(finding)
+        self.stream.flush()
+
+
+class JsonLinesReporter(Reporter):
+    """Writes one JSON object per finding and line."""
+
+    def add(self, finding: Finding) -> None:
+        self.stream.write(json.dumps(finding.to_dict()) + "\n")
+        self.count += 1
+
+
+class JsonReporter(Reporter):
+    """Writes a JSON array of finding objects."""
+
+    def __enter__(self) -> "Reporter":
+        self.stream.write("[")
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stream.write("\n]\n" if self.count else "]\n")
+        super().__exit__(*exc_info)
+
+    def add(self, finding: Finding) -> None:
+        separator = ",\n  " if self.count else "\n  "
+        self.stream.write(separator + json.dumps(finding.to_dict()))
+        self.count += 1
+
+
+class SarifReporter(Reporter):
+    """Writes a SARIF 2.1.0 log with one run and a result per finding."""
+
+    def __enter__(self) -> "Reporter":
+        log = {
+            "$schema": SARIF_SCHEMA,
+            "version": "2.1.0",
+            "runs": [
+                {
+                    "tool": {
+                        "driver": {
+                            "name": SARIF_TOOL,
+                            "informationUri": SARIF_TOOL_URI,
+                            "rules": [
+                                {
+                                    "id": hook_id,
+                                    "shortDescription": {
+                                        "text": f"Potential {_title(hook_id)}"
+                                    },
+                                    "defaultConfiguration": {
+                                        "level": _severity(hook_id)
+                                    },
+                                }
+                                for hook_id in self.hook_ids
+                            ],
+                        }
+                    },
+                    "columnKind": "unicodeCodePoints",
+                    "results": [],
+                }
+            ],
+        }
+        # The results array is the last member of the log: everything up to
+        # its opening bracket is written now, the findings as they come.
+        self.stream.write(json.dumps(log)[: -len("]}]}")])
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stream.write("]}]}\n")
+        super().__exit__(*exc_info)
+
+    def add(self, finding: Finding) -> None:
+        result = {
+            "ruleId": finding.detector,
+            "level": finding.severity,
+            "message": {
+                "text": f"Potential {_title(finding.detector)} in "
+                f"{finding.path}"
+            },
+            "locations": [
+                {
+                    "physicalLocation": {
+                        "artifactLocation": {
+                            "uri": finding.path.replace(os.sep, "/")
+                        },
+                        "region": {
+                            "startLine": finding.line,
+                            "startColumn": finding.column,
+                            "snippet": {"text": finding.snippet},
+                        },
+                    }
+                }
+            ],
+        }
+        if finding.blob is not None:
+            result["properties"] = {"blob": finding.blob}
+        self.stream.write((", " if self.count else "") + json.dumps(result))
+        self.count += 1
+
+
+REPORTERS = {
+    "json": JsonReporter,
+    "jsonl": JsonLinesReporter,
+    "sarif": SarifReporter,
+}
+
+
+def _title(hook_id: str) -> str:
+    """Returns the name of a hook as the text log spells it."""
+    return hook_id.replace("-", " ").title()
+
+
+def open_reporter(
+    output_format: str, stream: IO[str], hook_ids: Sequence[str]
+) -> Reporter:
+    """Creates the reporter of an output format.
+
+    Args:
+        output_format: One of the FORMATS other than "text".
+        stream: The text stream to write to.
+        hook_ids: The identifiers of the hooks that are run.
+
+    Returns:
+        The reporter, to be entered before adding findings.
+    """
+    hook_ids = [
+        hook_id
+        for hook_id in hook_ids
+        if hook_id in SECRET_CHECKS or hook_id == "kubernetes-secret"
+    ]
+    return REPORTERS[output_format](stream, hook_ids)
+
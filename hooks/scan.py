@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+This module scans large files for secrets without loading them into memory.
+
+Large files are memory-mapped and the detectors run directly on the mapped
+bytes. Files that cannot be mapped are streamed in chunks cut at line ends,
+each chunk scanned together with the tail of the previous one so that matches
+spanning a chunk boundary are not missed. UTF-16 and UTF-32 files are
+streamed too, transcoded to UTF-8 for the detectors. The Kubernetes Secret
+check probes the mapped bytes, or the lines of the stream, for "kind: Secret"
+lines, and only decodes and parses the documents that have one.
+"""
+
+import io
+import mmap
+import re
+from itertools import islice
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Tuple
+
+from hooks.detectors import DetectorEngine
+from hooks.encoding import ASCII_COMPATIBLE, SNIFF_SIZE, sniff
+from hooks.forbid_secrets import (
+    ENCRYPTED_FILE_REGEX,
+    KUBERNETES_SECRET_PROBE_REGEX,
+    YAML_DOCUMENT_START_REGEX,
+    is_unencrypted_secret,
+    kubernetes_secret_probes,
+)
+
+# Chunk size used when streaming a file that cannot be memory-mapped
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# Bytes of the previous chunk scanned again with the next one. Secrets are
+# far shorter, so any match spanning a chunk boundary is found whole.
+CHUNK_OVERLAP = 64 * 1024
+
+ENCRYPTED_FILE_BYTES_REGEX = re.compile(
+    ENCRYPTED_FILE_REGEX.pattern.encode(), re.MULTILINE
+)
+
+
+def sniff_file(path: str) -> Optional[str]:
+    """Tells the encoding of a file from its first bytes.
+
+    Args:
+        path: The path to the file.
+
+    Returns:
+        The codec of the file, or None if it is binary.
+
+    Raises:
+        OSError: If the file cannot be read.
+    """
+    with open(path, "rb") as file:
+        return sniff(file.read(SNIFF_SIZE))
+
+
+def scan_large_file(
+    path: str, detector_ids: Sequence[str], codec: str = "utf-8"
+) -> Tuple[bool, List[str]]:
+    """Checks if a large file is encrypted and scans it for secrets.
+
+    Args:
+        path: The path to the file.
+        detector_ids: The identifiers of the detectors to run.
+        codec: The encoding of the file, see sniff_file().
+
+    Returns:
+        Whether the file is encrypted, and the identifiers of the detectors
+        that matched (empty if the file is encrypted).
+
+    Raises:
+        OSError: If the file cannot be read.
+    """
+    engine = DetectorEngine.for_ids(detector_ids)
+    with open(path, "rb") as file:
+        if codec not in ASCII_COMPATIBLE:
+            return scan_stream(Utf8Reader(file, codec), engine)
+        try:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return scan_stream(file, engine)
+        with buffer:
+            if ENCRYPTED_FILE_BYTES_REGEX.search(buffer):
+                return True, []
+            return False, list(engine.scan_bytes(buffer))
+
+
+def scan_stream(
+    file: BinaryIO,
+    engine: DetectorEngine,
+    chunk_size: int = CHUNK_SIZE,
+    overlap: int = CHUNK_OVERLAP,
+) -> Tuple[bool, List[str]]:
+    """Checks if a stream is encrypted and scans it for secrets in chunks.
+
+    Windows are cut at line ends, so no detector sees a line cut in two,
+    unless a line is longer than a chunk. Memory use is bounded by about
+    twice chunk_size + overlap whatever the stream size.
+
+    Args:
+        file: The binary stream to scan.
+        engine: The detector engine to scan with.
+        chunk_size: The number of bytes read at a time.
+        overlap: The number of bytes of the previous chunk scanned again.
+
+    Returns:
+        Whether the stream is encrypted, and the identifiers of the
+        detectors that matched (empty if the stream is encrypted).
+    """
+    found = set()
+    tail = b""
+    unscanned = 0  # Bytes at the end of the tail not scanned yet
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk and not unscanned:
+            break
+        window = tail + chunk
+        end = len(window)
+        if chunk:
+            # The last partial line is scanned with the next chunk
+            cut = window.rfind(b"\n") + 1
+            if end - cut <= chunk_size:
+                end = cut
+        scanned = window if end == len(window) else window[:end]
+        if ENCRYPTED_FILE_BYTES_REGEX.search(scanned):
+            return True, []
+        found.update(engine.scan_bytes(scanned))
+        if not chunk:
+            break
+        # Start the next window at a line start, overlap bytes back
+        start = max(0, end - overlap)
+        line_start = window.rfind(b"\n", 0, start) + 1
+        if start - line_start > overlap:
+            line_start = start
+        tail = window[line_start:]
+        unscanned = len(window) - end
+    return False, [d.id for d in engine.detectors if d.id in found]
+
+
+def large_file_kubernetes_secret(path: str, codec: str = "utf-8") -> bool:
+    """Checks if a large file has an unencrypted Kubernetes Secret document.
+
+    Args:
+        path: The path to the file.
+        codec: The encoding of the file, see sniff_file().
+
+    Returns:
+        True if any YAML document in the file is an unencrypted Kubernetes
+        Secret.
+
+    Raises:
+        OSError: If the file cannot be read.
+        YAMLError: If a candidate document is not valid YAML.
+    """
+    return any(map(is_unencrypted_secret, _secret_candidates(path, codec)))
+
+
+def _secret_candidates(path: str, codec: str) -> Iterator[str]:
+    """Yields the documents of a large file with a "kind: Secret" line."""
+    if codec in ASCII_COMPATIBLE:
+        with open(path, "rb") as file:
+            try:
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                buffer = None
+            if buffer is not None:
+                with buffer:
+                    for _, document in kubernetes_secret_probes(buffer, codec):
+                        yield document
+                return
+    yield from _streamed_secret_candidates(path, codec)
+
+
+def _streamed_secret_candidates(path: str, codec: str) -> Iterator[str]:
+    """Yields the candidate documents of a file that cannot be mapped.
+
+    A first pass over the lines finds the candidate documents, and a second
+    one only keeps their lines, so one line and one candidate document are
+    in memory at a time.
+    """
+    candidates: List[Tuple[int, int]] = []  # First and last line + 1
+    start, candidate, count = 0, False, 0
+    with open(path, "r", encoding=codec, errors="replace", newline="") as file:
+        for count, line in enumerate(file, 1):
+            if YAML_DOCUMENT_START_REGEX.match(line):
+                if candidate:
+                    candidates.append((start, count - 1))
+                start, candidate = count - 1, False
+            if not candidate and KUBERNETES_SECRET_PROBE_REGEX.search(line):
+                candidate = True
+    if candidate:
+        candidates.append((start, count))
+    if not candidates:
+        return
+
+    with open(path, "r", encoding=codec, errors="replace", newline="") as file:
+        read = 0
+        for first, end in candidates:
+            yield "".join(islice(file, first - read, end - read))
+            read = end
+
+
+class Utf8Reader:  # pylint: disable=too-few-public-methods
+    """Reads a binary stream of another encoding as UTF-8."""
+
+    def __init__(self, file: BinaryIO, codec: str):
+        self.text = io.TextIOWrapper(file, codec, "replace", newline="")
+
+    def read(self, size: int = -1) -> bytes:
+        """Reads up to size characters, encoded as UTF-8.
+
+        Args:
+            size: The number of characters to read, -1 for all of them.
+
+        Returns:
+            The UTF-8 bytes, empty at the end of the stream.
+        """
+        return self.text.read(size).encode("utf-8")
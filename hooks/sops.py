@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+This module wraps the sops command line: running sops on a batch of files
+concurrently, sharing a local sops keyservice between those runs, and
+finding the .sops.yaml creation rule sops will encrypt each file with.
+"""
+
+import json
+import os
+import re
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Dict, Iterator, List, Optional, Pattern, Sequence, Tuple
+
+from hooks.environment import StatKey, stat_key
+from hooks.git import git_dir
+from hooks.timings import span
+
+# Minimum batch size before a shared sops keyservice is started
+KEYSERVICE_MIN_FILES = 8
+
+# Seconds to wait for the sops keyservice socket to appear
+KEYSERVICE_TIMEOUT = 5.0
+
+# Name of the sops configuration file
+SOPS_CONFIG = ".sops.yaml"
+
+
+class CreationRules:
+    """The creation rules of a .sops.yaml file, with compiled path regexes.
+
+    Attributes:
+        path: The path to the .sops.yaml file.
+        regexes: The path_regex of each creation rule, in order, or None for
+            rules without one, which match every file.
+    """
+
+    def __init__(self, path: str, regexes: List[Optional[Pattern]]):
+        self.path = path
+        self.regexes = regexes
+        self._directory = os.path.dirname(os.path.abspath(path))
+
+    def match(self, file_path: str) -> Optional[int]:
+        """Finds the creation rule sops will encrypt a file with.
+
+        Like sops, the file path is matched relative to the directory of
+        .sops.yaml, and the first matching rule wins.
+
+        Args:
+            file_path: The path to the file.
+
+        Returns:
+            The index of the rule, or None if no rule matches.
+        """
+        path = os.path.abspath(file_path)
+        prefix = self._directory + os.sep
+        if path.startswith(prefix):
+            path = path[len(prefix) :]
+        for index, regex in enumerate(self.regexes):
+            if regex is None or regex.search(path):
+                return index
+        return None
+
+    def route(
+        self, file_paths: Sequence[str]
+    ) -> Tuple[Dict[str, int], List[str]]:
+        """Finds the creation rule of each file of a batch.
+
+        Args:
+            file_paths: The paths to the files.
+
+        Returns:
+            A dict of file path to rule index for the files a rule matches,
+            and the files no rule matches, which sops would refuse.
+        """
+        routed = {}
+        unmatched = []
+        for file_path in file_paths:
+            index = self.match(file_path)
+            if index is None:
+                unmatched.append(file_path)
+            else:
+                routed[file_path] = index
+        return routed, unmatched
+
+
+def find_sops_config(directory: Optional[str] = None) -> Optional[str]:
+    """Finds the .sops.yaml file sops uses, like sops does.
+
+    Args:
+        directory: The directory sops runs in (default: the current one).
+
+    Returns:
+        The path to the nearest .sops.yaml in the directory or above it, or
+        None if there is none.
+    """
+    directory = os.path.abspath(directory or os.getcwd())
+    while True:
+        path = os.path.join(directory, SOPS_CONFIG)
+        if os.path.isfile(path):
+            return path
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+# Parsed creation rules of this process, by .sops.yaml path
+_rules_cache: Dict[str, Tuple[StatKey, Optional[List[Optional[str]]]]] = {}
+
+
+def creation_rules(directory: Optional[str] = None) -> Optional[CreationRules]:
+    """Returns the creation rules sops will use, parsed at most once.
+
+    The path regexes are cached in memory and in the git directory, keyed
+    by the stat information of .sops.yaml, so it is only parsed again after
+    it changes.
+
+    Args:
+        directory: The directory sops runs in (default: the current one).
+
+    Returns:
+        The creation rules, or None if there is no .sops.yaml or the rules
+        cannot be understood, in which case sops is left to decide.
+    """
+    path = find_sops_config(directory)
+    if path is None:
+        return None
+    stat = stat_key(path)
+    cached = _rules_cache.get(path)
+    if cached is None or cached[0] != stat:
+        cached = stat, _load_path_regexes(path, stat)
+        _rules_cache[path] = cached
+    patterns = cached[1]
+    if patterns is None:
+        return None
+    try:
+        regexes = [
+            re.compile(pattern) if pattern else None for pattern in patterns
+        ]
+    except re.error:
+        return None  # A Go regex Python does not understand
+    return CreationRules(path, regexes)
+
+
+def _index_path() -> Optional[str]:
+    directory = git_dir()
+    if directory is None:
+        return None
+    return os.path.join(directory, "sops-pre-commit", "creation_rules.json")
+
+
+def _load_path_regexes(
+    path: str, stat: StatKey
+) -> Optional[List[Optional[str]]]:
+    """Reads the path regexes of a .sops.yaml, from the index if current.
+
+    Args:
+        path: The path to the .sops.yaml file.
+        stat: Its stat information.
+
+    Returns:
+        The path_regex of each creation rule (None when a rule has none),
+        or None if the file cannot be parsed or has no creation rules.
+    """
+    index_path = _index_path()
+    index: Dict[str, dict] = {}
+    if index_path is not None:
+        try:
+            with open(index_path, "r", encoding="utf-8") as file:
+                index = json.load(file)
+            entry = index[path]
+            if entry["stat"] == list(stat or ()):
+                return entry["patterns"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    patterns = _parse_path_regexes(path)
+    if index_path is not None:
+        if not isinstance(index, dict):
+            index = {}
+        index[path] = {"stat": list(stat or ()), "patterns": patterns}
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            temporary = f"{index_path}.{os.getpid()}.tmp"
+            with open(temporary, "w", encoding="utf-8") as file:
+                json.dump(index, file)
+            os.replace(temporary, index_path)
+        except OSError:
+            pass
+    return patterns
+
+
+def _parse_path_regexes(path: str) -> Optional[List[Optional[str]]]:
+    """Parses the path regexes of the creation rules of a .sops.yaml.
+
+    Args:
+        path: The path to the .sops.yaml file.
+
+    Returns:
+        The path_regex of each creation rule (None when a rule has none),
+        or None if the file cannot be parsed or has no creation rules.
+    """
+    # pylint: disable=import-outside-toplevel
+    from hooks.forbid_secrets import _safe_yaml_loader
+
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            config = _safe_yaml_loader().load(file)
+    except Exception:  # pylint: disable=broad-exception-caught
+        return None
+    rules = config.get("creation_rules") if isinstance(config, dict) else None
+    if not isinstance(rules, list) or not rules:
+        return None
+    patterns: List[Optional[str]] = []
+    for rule in rules:
+        if not isinstance(rule, dict):
+            return None
+        pattern = rule.get("path_regex")
+        patterns.append(str(pattern) if pattern else None)
+    return patterns
+
+
+def run_sops(
+    action: str, file_path: str, keyservice: Optional[str] = None
+) -> Optional[str]:
+    """Encrypts or decrypts a file in place with sops.
+
+    Args:
+        action: Either "encrypt" or "decrypt".
+        file_path: The path to the file.
+        keyservice: The address of a sops keyservice to use instead of the
+            local one (optional).
+
+    Returns:
+        None on success, or the error reported by sops.
+    """
+    command = ["sops", f"--{action}", "--in-place"]
+    if keyservice:
+        command += [
+            "--keyservice",
+            keyservice,
+            "--enable-local-keyservice=false",
+        ]
+    command.append(file_path)
+    with span(f"sops --{action}", "sops", file=file_path):
+        try:
+            subprocess.run(
+                command, check=True, capture_output=True, text=True
+            )
+        except subprocess.CalledProcessError as e:
+            return (e.stderr or "").strip() or str(e)
+        except OSError as e:
+            return str(e)
+    return None
+
+
+@contextmanager
+def sops_keyservice(file_count: int) -> Iterator[Optional[str]]:
+    """Runs a local sops keyservice shared by a batch of sops runs.
+
+    Key material is then loaded once by the keyservice rather than by every
+    sops process. No keyservice is started for small batches, when the user
+    already points sops at one with SOPS_KEYSERVICE, or when it fails to
+    start.
+
+    Args:
+        file_count: The number of files in the batch.
+
+    Yields:
+        The keyservice address, or None if sops should use its local one.
+    """
+    if file_count < KEYSERVICE_MIN_FILES or os.environ.get("SOPS_KEYSERVICE"):
+        yield None
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        socket_path = os.path.join(directory, "keyservice.sock")
+        try:
+            process = subprocess.Popen(  # pylint: disable=consider-using-with
+                [
+                    "sops",
+                    "keyservice",
+                    "--network",
+                    "unix",
+                    "--address",
+                    socket_path,
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError:
+            yield None
+            return
+
+        try:
+            deadline = time.monotonic() + KEYSERVICE_TIMEOUT
+            while (
+                not os.path.exists(socket_path)
+                and process.poll() is None
+                and time.monotonic() < deadline
+            ):
+                time.sleep(0.01)
+            ready = os.path.exists(socket_path) and process.poll() is None
+            yield f"unix://{socket_path}" if ready else None
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=KEYSERVICE_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+def run_sops_batch(
+    action: str, file_paths: Sequence[str], jobs: int = 1
+) -> Dict[str, Optional[str]]:
+    """Encrypts or decrypts files with sops through a bounded worker pool.
+
+    A failure on one file does not stop the others.
+
+    Args:
+        action: Either "encrypt" or "decrypt".
+        file_paths: The paths to the files.
+        jobs: The maximum number of concurrent sops processes.
+
+    Returns:
+        A dict of file path to None on success, or the error reported by
+        sops, in the order of file_paths.
+    """
+    if not file_paths:
+        return {}
+    with sops_keyservice(len(file_paths)) as keyservice:
+        run = partial(run_sops, action, keyservice=keyservice)
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            return dict(zip(file_paths, executor.map(run, file_paths)))
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+This module records where the time of a run goes, for --timings.
+
+Stages, git and sops subprocesses are recorded as spans, and every detector
+records the time it spent, and the files and bytes it scanned. Recording is
+off unless a run enables it: a timed function then costs one global lookup
+per call. The spans are summarised as a table and can be written as a trace
+for the Chrome trace viewer (chrome://tracing or https://ui.perfetto.dev).
+"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import (
+    IO,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    TypeVar,
+)
+
+Function = TypeVar("Function", bound=Callable)
+
+# Functions listed in the --profile summary
+PROFILE_LINES = 25
+
+
+class Span(NamedTuple):
+    """A timed section of a run.
+
+    Attributes:
+        name: What was timed, e.g. a stage or a command.
+        category: The kind of span: stage, method, git or sops.
+        start: The start, in seconds since the recording started.
+        duration: The wall time, in seconds.
+        thread: The identifier of the thread it ran in.
+        args: Details shown in the trace viewer, e.g. the file.
+    """
+
+    name: str
+    category: str
+    start: float
+    duration: float
+    thread: int
+    args: dict
+
+
+class DetectorTotals:
+    """The time a detector spent and what it scanned.
+
+    Attributes:
+        seconds: The wall time spent searching.
+        files: The number of contents searched.
+        bytes: The number of characters or bytes searched.
+        matches: The number of contents the detector matched.
+    """
+
+    __slots__ = ("seconds", "files", "bytes", "matches")
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.files = 0
+        self.bytes = 0
+        self.matches = 0
+
+
+class Recorder:
+    """Collects the spans and detector totals of a run.
+
+    Attributes:
+        origin: The perf_counter() value the span starts are relative to.
+        spans: The finished spans, in order of completion.
+        detectors: The totals of each detector, by id.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self.detectors: Dict[str, DetectorTotals] = {}
+
+    @contextmanager
+    def span(self, name: str, category: str, **args) -> Iterator[dict]:
+        """Times a section of code.
+
+        Args:
+            name: What is timed.
+            category: The kind of span.
+            **args: Details to show in the trace viewer.
+
+        Yields:
+            The details, which the section may add to.
+        """
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            self.spans.append(
+                Span(
+                    name,
+                    category,
+                    start - self.origin,
+                    end - start,
+                    threading.get_ident(),
+                    args,
+                )
+            )
+
+    def detector(
+        self, detector_id: str, seconds: float, size: int, matched: bool
+    ) -> None:
+        """Adds a search of one content by a detector to its totals."""
+        totals = self.detectors.get(detector_id)
+        if totals is None:
+            totals = self.detectors[detector_id] = DetectorTotals()
+        totals.seconds += seconds
+        totals.files += 1
+        totals.bytes += size
+        totals.matches += matched
+
+    def summary(self) -> str:
+        """Returns the spans and detector totals as a table."""
+        stages: Dict[tuple, List[float]] = {}
+        for span in self.spans:
+            stages.setdefault((span.category, span.name), []).append(
+                span.duration
+            )
+        lines = [
+            f"{'category':<8} {'name':<40} {'calls':>7} {'total':>10} "
+            f"{'mean':>9} {'max':>9}"
+        ]
+        for (category, name), durations in sorted(
+            stages.items(), key=lambda item: -sum(item[1])
+        ):
+            total = sum(durations)
+            lines.append(
+                f"{category:<8} {name[:40]:<40} {len(durations):>7} "
+                f"{total * 1000:>8.1f}ms {total / len(durations) * 1000:>7.2f}"
+                f"ms {max(durations) * 1000:>7.2f}ms"
+            )
+        if self.detectors:
+            lines.append("")
+            lines.append(
+                f"{'detector':<28} {'files':>7} {'MB':>9} {'matches':>8} "
+                f"{'total':>10} {'MB/s':>8}"
+            )
+            for detector_id, totals in sorted(
+                self.detectors.items(), key=lambda item: -item[1].seconds
+            ):
+                megabytes = totals.bytes / 1e6
+                rate = megabytes / totals.seconds if totals.seconds else 0
+                lines.append(
+                    f"{detector_id:<28} {totals.files:>7} {megabytes:>9.2f} "
+                    f"{totals.matches:>8} {totals.seconds * 1000:>8.1f}ms "
+                    f"{rate:>8.1f}"
+                )
+        return "\n".join(lines)
+
+    def trace(self) -> dict:
+        """Returns the run in the Chrome trace event format.
+
+        Spans are complete ("X") events in microseconds, and the detector
+        totals are in the trace metadata.
+        """
+        pid = os.getpid()
+        events = [
+            {
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round(span.start * 1e6, 3),
+                "dur": round(span.duration * 1e6, 3),
+                "pid": pid,
+                "tid": span.thread,
+                "args": span.args,
+            }
+            for span in self.spans
+        ]
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "detectors": {
+                    detector_id: {
+                        "seconds": totals.seconds,
+                        "files": totals.files,
+                        "bytes": totals.bytes,
+                        "matches": totals.matches,
+                    }
+                    for detector_id, totals in self.detectors.items()
+                }
+            },
+        }
+
+
+# The recorder of the current run, None when recording is off
+_recorder: Optional[Recorder] = None
+
+
+def recorder() -> Optional[Recorder]:
+    """Returns the recorder of the current run, or None if recording is off."""
+    return _recorder
+
+
+@contextmanager
+def span(name: str, category: str = "stage", **args) -> Iterator[dict]:
+    """Times a section of code if recording is on.
+
+    Args:
+        name: What is timed.
+        category: The kind of span.
+        **args: Details to show in the trace viewer.
+
+    Yields:
+        The details, which the section may add to.
+    """
+    current = _recorder
+    if current is None:
+        yield args
+        return
+    with current.span(name, category, **args) as details:
+        yield details
+
+
+def timed(
+    category: str = "method", name: Optional[str] = None
+) -> Callable[[Function], Function]:
+    """Decorates a function so that its calls are recorded as spans.
+
+    Args:
+        category: The kind of span.
+        name: What is timed (default: the qualified name of the function).
+
+    Returns:
+        The decorator.
+    """
+
+    def decorate(function: Function) -> Function:
+        label = name or function.__qualname__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            current = _recorder
+            if current is None:
+                return function(*args, **kwargs)
+            with current.span(label, category):
+                return function(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def instrumented(
+    function: Callable[[], int],
+    trace_path: Optional[str] = None,
+    profile_path: Optional[str] = None,
+    output: Optional[IO[str]] = None,
+) -> int:
+    """Runs a function with recording, profiling or both turned on.
+
+    Args:
+        function: The run, e.g. the body of main().
+        trace_path: Where to write the Chrome trace, "" to only print the
+            summary, or None to not record spans.
+        profile_path: Where to dump the cProfile statistics, or None to not
+            profile.
+        output: Where to print the summaries (default: standard error).
+
+    Returns:
+        What the function returned.
+    """
+    # pylint: disable=global-statement,import-outside-toplevel
+    global _recorder
+    output = output or sys.stderr
+    if trace_path is not None:
+        _recorder = Recorder()
+    profiler = None
+    if profile_path is not None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with span("main"):
+            return function()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            import pstats
+
+            profiler.dump_stats(profile_path)
+            print(f"Profile written to {profile_path}", file=output)
+            stats = pstats.Stats(profiler, stream=output)
+            stats.sort_stats("cumulative").print_stats(PROFILE_LINES)
+        current, _recorder = _recorder, None
+        if current is not None:
+            print(current.summary(), file=output)
+            if trace_path:
+                import json
+
+                with open(trace_path, "w", encoding="utf-8") as file:
+                    json.dump(current.trace(), file)
+                print(f"Trace written to {trace_path}", file=output)
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+This module pre-scans YAML files as they are saved, so that the check at
+commit time finds its verdicts in the scan cache instead of scanning.
+
+Changes are watched with inotify where it is available, and by polling the
+files' stat information otherwise. Rapid saves are coalesced: a batch of
+changed files is scanned once no change was seen for a short while.
+"""
+
+# pylint: disable=import-outside-toplevel
+import os
+import re
+import select
+import struct
+import time
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from hooks.exclude import ExcludeMatcher, load_excludes
+from hooks.forbid_secrets import scan_files
+
+if TYPE_CHECKING:
+    from hooks.cache import ScanCache
+
+# Files the hooks scan, as in .pre-commit-hooks.yaml
+WATCHED_FILE_REGEX = re.compile(r"\.ya?ml$")
+
+# Seconds without changes after which a batch of changes is scanned
+DEBOUNCE = 0.3
+
+# Seconds after its first change at which a batch is scanned, even if files
+# keep changing
+MAX_BATCH_DELAY = 10 * DEBOUNCE
+
+# Seconds between two stat passes of the polling watcher
+POLL_INTERVAL = 1.0
+
+# inotify event masks, see inotify(7)
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def _never(path: str) -> bool:  # pylint: disable=unused-argument
+    """Prunes no directory."""
+    return False
+
+
+def _subdirectories(
+    directory: str, dirnames: List[str], prune: Callable[[str], bool]
+) -> List[str]:
+    """Returns the subdirectories of a directory to walk into."""
+    return [
+        d
+        for d in dirnames
+        if d != ".git" and not prune(os.path.join(directory, d))
+    ]
+
+
+def walk_files(
+    root: str,
+    include: Callable[[str], bool],
+    prune: Callable[[str], bool] = _never,
+) -> Iterator[Tuple[str, os.stat_result]]:
+    """Lists the watched files under a directory, skipping .git.
+
+    Args:
+        root: The directory to walk.
+        include: Whether a path is watched.
+        prune: Whether a directory is skipped with everything in it.
+
+    Yields:
+        The path and stat information of each watched file.
+    """
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = _subdirectories(directory, dirnames, prune)
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            if include(path):
+                try:
+                    yield path, os.stat(path)
+                except OSError:
+                    pass
+
+
+class PollingWatcher:
+    """Finds changed files by comparing their stat information."""
+
+    def __init__(
+        self,
+        root: str,
+        include: Callable[[str], bool],
+        interval: float = POLL_INTERVAL,
+        prune: Callable[[str], bool] = _never,
+    ):
+        self.root = root
+        self.include = include
+        self.interval = interval
+        self.prune = prune
+        self._snapshot = self._stat_all()
+        self._next_poll = time.monotonic() + interval
+
+    def _stat_all(self) -> Dict[str, Tuple[int, int, int]]:
+        return {
+            path: (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            for path, stat in walk_files(self.root, self.include, self.prune)
+        }
+
+    def wait(self, timeout: float) -> Set[str]:
+        """Waits for changes.
+
+        Args:
+            timeout: The maximum number of seconds to wait.
+
+        Returns:
+            The paths of the files that changed, empty on timeout.
+        """
+        delay = self._next_poll - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(0.0, delay))
+        self._next_poll = time.monotonic() + self.interval
+        snapshot = self._stat_all()
+        changed = {
+            path
+            for path, stat in snapshot.items()
+            if self._snapshot.get(path) != stat
+        }
+        self._snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        """Releases the resources of the watcher."""
+
+
+class InotifyWatcher:
+    """Finds changed files with Linux inotify, through ctypes."""
+
+    def __init__(
+        self,
+        root: str,
+        include: Callable[[str], bool],
+        prune: Callable[[str], bool] = _never,
+    ):
+        import ctypes
+        import ctypes.util
+
+        self.root = root
+        self.include = include
+        self.prune = prune
+        self._libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+        )
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories: Dict[int, str] = {}
+        try:
+            self._watch_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def _watch_tree(self, root: str) -> Set[str]:
+        """Watches a directory tree and returns the watched files in it."""
+        import ctypes
+
+        files = set()
+        for directory, dirnames, filenames in os.walk(root):
+            dirnames[:] = _subdirectories(directory, dirnames, self.prune)
+            descriptor = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(directory), WATCH_MASK
+            )
+            if descriptor < 0:
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+            self._directories[descriptor] = directory
+            files.update(
+                path
+                for path in (os.path.join(directory, f) for f in filenames)
+                if self.include(path)
+            )
+        return files
+
+    def wait(self, timeout: float) -> Set[str]:
+        """Waits for changes.
+
+        Args:
+            timeout: The maximum number of seconds to wait.
+
+        Returns:
+            The paths of the files that changed, empty on timeout.
+        """
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return set()
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            descriptor, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost: everything may have changed
+                return {
+                    path
+                    for path, _ in walk_files(
+                        self.root, self.include, self.prune
+                    )
+                }
+            directory = self._directories.get(descriptor)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if (
+                    mask & (IN_CREATE | IN_MOVED_TO)
+                    and name != ".git"
+                    and not self.prune(path)
+                ):
+                    changed |= self._watch_tree(path)
+            elif self.include(path):
+                changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        """Stops watching."""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def open_watcher(
+    root: str,
+    include: Callable[[str], bool],
+    prune: Callable[[str], bool] = _never,
+) -> Union[InotifyWatcher, PollingWatcher]:
+    """Watches a directory tree with inotify, or by polling without it.
+
+    Args:
+        root: The directory to watch.
+        include: Whether a path is watched.
+        prune: Whether a directory is not watched, with everything in it.
+
+    Returns:
+        The watcher.
+    """
+    try:
+        return InotifyWatcher(root, include, prune)
+    except (OSError, AttributeError):
+        # Not Linux, or out of inotify watches
+        return PollingWatcher(root, include, prune=prune)
+
+
+def batches(
+    watcher: Union[InotifyWatcher, PollingWatcher],
+    debounce: float = DEBOUNCE,
+    idle_timeout: Optional[float] = None,
+    max_delay: float = MAX_BATCH_DELAY,
+) -> Iterator[Set[str]]:
+    """Coalesces changes into batches, once no change was seen for a while.
+
+    Args:
+        watcher: The watcher to get changes from.
+        debounce: The number of seconds without changes that ends a batch.
+        idle_timeout: Stop after this many seconds without any change
+            (default: never).
+        max_delay: The number of seconds after its first change at which
+            a batch ends anyway, so files that are rewritten continuously
+            are still scanned.
+
+    Yields:
+        The paths of the files changed in each batch.
+    """
+    pending: Set[str] = set()
+    pending_since = idle_since = time.monotonic()
+    while True:
+        changed = watcher.wait(debounce if pending else 1.0)
+        now = time.monotonic()
+        if changed:
+            if not pending:
+                pending_since = now
+            pending |= changed
+        if pending and (not changed or now - pending_since >= max_delay):
+            yield pending
+            pending = set()
+            idle_since = time.monotonic()
+        elif (
+            not changed
+            and idle_timeout is not None
+            and now - idle_since >= idle_timeout
+        ):
+            return
+
+
+def watch(
+    root: str,
+    hook_ids: Sequence[str],
+    cache: "ScanCache",
+    excludes: Optional[ExcludeMatcher] = None,
+    report: Callable[[int, str], None] = lambda level, message: None,
+    idle_timeout: Optional[float] = None,
+) -> int:
+    """Scans the watched files under a directory whenever they change.
+
+    Verdicts are written to the scan cache, keyed by path, stat information
+    and content hash, where the check at commit time looks them up.
+
+    Args:
+        root: The directory to watch.
+        hook_ids: The identifiers of the hooks to run; the commit-time
+            check must run the same ones to use the verdicts.
+        cache: The scan cache to write the verdicts to.
+        excludes: The files not to scan, relative to the watched directory
+            (default: the globs of its .forbidsecretsignore).
+        report: The function printing messages, taking a debug level.
+        idle_timeout: Stop after this many seconds without any change
+            (default: never).
+
+    Returns:
+        Exit code.
+    """
+    if excludes is None:
+        excludes = load_excludes((), root, cwd=root)
+
+    def include(path: str) -> bool:
+        if not WATCHED_FILE_REGEX.search(path):
+            return False
+        return not excludes.excluded(os.path.relpath(path, root))
+
+    def prune(path: str) -> bool:
+        return excludes.excluded_directory(os.path.relpath(path, root))
+
+    watcher = open_watcher(root, include, prune)
+    report(0, f"Watching {root} with {type(watcher).__name__}")
+    try:
+        # Scan everything once, so files saved before watching are ready too
+        _scan_batch(
+            {path for path, _ in walk_files(root, include, prune)},
+            hook_ids,
+            cache,
+            report,
+        )
+        for batch in batches(watcher, idle_timeout=idle_timeout):
+            _scan_batch(batch, hook_ids, cache, report)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return 0
+
+
+def _scan_batch(
+    paths: Set[str],
+    hook_ids: Sequence[str],
+    cache: "ScanCache",
+    report: Callable[[int, str], None],
+) -> None:
+    """Scans a batch of changed files and stores their verdicts."""
+    existing = sorted(path for path in paths if os.path.isfile(path))
+    for result in scan_files(existing, hook_ids, cache=cache):
+        if result.found:
+            report(
+                1,
+                f"WARNING: Unencrypted secrets in {result.filename}: "
+                + ", ".join(
+                    (["kubernetes-secret"] if result.kubernetes_secret else [])
+                    + result.detectors
+                ),
+            )
+    cache.flush()
+    report(0, f"Scanned {len(existing)} changed file(s)")
@@ -0,0 +1,37 @@
+"""
+Fixtures shared by the tests.
+"""
+
+import pytest
+
+from benchmarks.corpus import SAMPLE_SECRETS
+from hooks import forbid_secrets
+
+
+@pytest.fixture(name="no_preflight")
+def fixture_no_preflight(monkeypatch):
+    """Skips the environment checks that need age and sops installed."""
+    for check in (
+        "check_age_installed",
+        "check_sops_yaml",
+        "check_age_public_key",
+        "check_age_private_key",
+        "check_sops_installed",
+    ):
+        monkeypatch.setattr(forbid_secrets, check, lambda: None)
+    monkeypatch.setattr(forbid_secrets, "preflight", lambda: None)
+    monkeypatch.setattr(forbid_secrets, "PARALLEL_MIN_FILES", 2)
+
+
+@pytest.fixture(name="manifests")
+def fixture_manifests(tmp_path):
+    """Writes clean manifests with a secret in every third file."""
+    paths = []
+    for i, secret in enumerate(list(SAMPLE_SECRETS.values()) * 2):
+        path = tmp_path / f"manifest-{i:02d}.yaml"
+        path.write_text(
+            f"kind: ConfigMap\n{secret if i % 3 == 0 else 'a: b'}\n",
+            encoding="utf-8",
+        )
+        paths.append(str(path))
+    return paths
@@ -0,0 +1,125 @@
+"""
+Tests for the scan daemon and its client.
+"""
+
+import os
+import socket
+import subprocess
+import threading
+import time
+
+import pytest
+
+from hooks import client, forbid_secrets, git, registry
+from hooks import daemon as daemon_module
+from hooks.daemon import serve
+from hooks.forbid_secrets import main
+
+
+@pytest.fixture(name="daemon")
+def fixture_daemon(tmp_path, no_preflight):  # pylint: disable=unused-argument
+    """Runs a scan daemon in a thread and returns its socket path."""
+    path = str(tmp_path / "daemon.sock")
+    thread = threading.Thread(target=serve, kwargs={"path": path})
+    thread.start()
+    deadline = time.monotonic() + 10
+    while client.request({"ping": True}, path) is None:
+        assert time.monotonic() < deadline and thread.is_alive()
+        time.sleep(0.01)
+    yield path
+    assert client.request({"stop": True}, path) == {"ok": True}
+    thread.join(timeout=10)
+    assert not os.path.exists(path)
+
+
+def strip(output):
+    """Drops the timestamp and hostname of each line of output."""
+    return [line.split(" ", 4)[-1] for line in output.splitlines()]
+
+
+@pytest.fixture(name="repo")
+def fixture_repo(tmp_path, monkeypatch):
+    """Creates a repository, makes it current and restores the built-ins."""
+    repo = tmp_path / "repo"
+    subprocess.run(["git", "init", "-q", str(repo)], check=True)
+    monkeypatch.chdir(repo)
+    git._rev_parse.cache_clear()  # pylint: disable=protected-access
+    yield repo
+    registry.register([])
+    monkeypatch.setattr(registry, "_registered", [])
+    git._rev_parse.cache_clear()  # pylint: disable=protected-access
+
+
+def test_daemon_output_matches_in_process(daemon, manifests, capsys):
+    """The daemon answers exactly what running in-process prints."""
+    argv = ["--hook-id", "all", *manifests]
+    assert main(argv + ["--no-cache"]) == 1
+    expected = capsys.readouterr().out
+
+    for _ in range(2):
+        exit_code, stdout, stderr = client.run(argv, daemon)
+        assert exit_code == 1 and not stderr
+        assert strip(stdout) == strip(expected)
+    assert os.getcwd() != str(daemon)
+
+
+def test_daemon_reports_usage_errors(daemon):
+    """Command line errors come back as exit code and standard error."""
+    exit_code, stdout, stderr = client.run(["--jobs", "x"], daemon)
+    assert exit_code == 2 and not stdout and "--jobs" in stderr
+
+
+def test_client_falls_back_without_daemon(tmp_path, monkeypatch, no_preflight):
+    """Without a daemon the client runs the hooks in-process."""
+    # pylint: disable=unused-argument
+    monkeypatch.setattr(client, "socket_path", lambda: str(tmp_path / "none"))
+    calls = []
+    monkeypatch.setattr(forbid_secrets, "main", lambda argv: calls.append(argv))
+    client.main(["--hook-id", "jwt"])
+    assert calls == [["--hook-id", "jwt"]]
+
+
+def test_daemon_reloads_changed_rules(repo, daemon):
+    """A rule changed between two requests applies to cached files too."""
+    config = repo / ".forbid-secrets.yaml"
+    rule = "detectors:\n  - id: acme-token\n    pattern: acme_{}{{16}}\n"
+    config.write_text(rule.format("[0-9]"))
+    (repo / "a.yaml").write_text("token: acme_abcdefghijklmnop\n")
+    argv = ["--hook-id", "all", "a.yaml"]
+    assert client.run(argv, daemon)[0] == 0
+
+    config.write_text(rule.format("[A-Za-z]"))
+    exit_code, stdout, _ = client.run(argv, daemon)
+    assert exit_code == 1 and "Acme Token" in stdout
+
+
+def test_client_only_trusts_private_sockets(daemon):
+    """The client does not talk to a socket other users can connect to."""
+    assert client.is_trusted(daemon)
+    os.chmod(daemon, 0o666)
+    try:
+        assert not client.is_trusted(daemon)
+        assert client.request({"ping": True}, daemon) is None
+    finally:
+        os.chmod(daemon, 0o600)
+
+
+def test_client_forwards_only_needed_env(monkeypatch):
+    """The client does not send unrelated variables to the daemon."""
+    monkeypatch.setenv("SOPS_AGE_KEY_FILE", "keys.txt")
+    monkeypatch.setenv("GIT_INDEX_FILE", "index")
+    monkeypatch.setenv("UNRELATED_TOKEN", "secret")
+    env = client.forwarded_env()
+    assert env["SOPS_AGE_KEY_FILE"] == "keys.txt"
+    assert env["GIT_INDEX_FILE"] == "index"
+    assert "UNRELATED_TOKEN" not in env
+
+
+def test_daemon_drops_silent_clients(daemon, monkeypatch):
+    """A client that never finishes its request does not block the others."""
+    monkeypatch.setattr(daemon_module, "REQUEST_TIMEOUT", 0.1)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as silent:
+        silent.connect(daemon)
+        start = time.monotonic()
+        assert client.request({"ping": True}, daemon) == {"ok": True}
+        assert time.monotonic() - start < 5
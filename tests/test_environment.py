@@ -0,0 +1,145 @@
+"""
+Tests for skipping the environment checks while nothing changed.
+"""
+
+import os
+import subprocess
+
+import pytest
+
+from hooks import forbid_secrets, git
+from hooks.environment import snapshot_path
+
+CHECKS = (
+    "check_age_installed",
+    "check_sops_yaml",
+    "check_age_public_key",
+    "check_age_private_key",
+    "check_sops_installed",
+)
+
+
+@pytest.fixture(name="environment")
+def fixture_environment(tmp_path, monkeypatch):
+    """Sets up a repository, age and sops binaries, keys and fake checks.
+
+    Returns:
+        The repository, and the list of check names run so far.
+    """
+    repo = tmp_path / "repo"
+    subprocess.run(["git", "init", "-q", str(repo)], check=True)
+    monkeypatch.chdir(repo)
+    git._rev_parse.cache_clear()  # pylint: disable=protected-access
+
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for tool in ("age", "sops"):
+        (bin_dir / tool).write_text("#!/bin/sh\n")
+        (bin_dir / tool).chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    (repo / ".age.pub").write_text("age1public\n")
+    private_key = tmp_path / "keys.txt"
+    private_key.write_text("# created\nAGE-SECRET-KEY-1\n")
+    monkeypatch.setattr(
+        forbid_secrets, "AGE_PRIVATE_KEY_PATH", str(private_key)
+    )
+    monkeypatch.delenv("SOPS_AGE_RECIPIENTS", raising=False)
+
+    runs = []
+    for check in CHECKS:
+        monkeypatch.setattr(
+            forbid_secrets, check, lambda check=check: runs.append(check)
+        )
+    forbid_secrets._preflight.cache_clear()  # pylint: disable=protected-access
+    yield repo, runs
+    forbid_secrets._preflight.cache_clear()  # pylint: disable=protected-access
+    git._rev_parse.cache_clear()  # pylint: disable=protected-access
+
+
+def run_preflight():
+    """Runs the environment checks as a new process would."""
+    forbid_secrets._preflight.cache_clear()  # pylint: disable=protected-access
+    forbid_secrets.preflight()
+
+
+def test_preflight_runs_once_per_process(environment):
+    """Several hooks in one process check the environment once."""
+    _, runs = environment
+    forbid_secrets.preflight()
+    forbid_secrets.preflight()
+    assert runs == list(CHECKS)
+
+
+def test_preflight_runs_again_in_process_after_a_change(
+    environment, monkeypatch
+):
+    """A process serving several environments checks each of them."""
+    _, runs = environment
+    forbid_secrets.preflight()
+    monkeypatch.setenv("SOPS_AGE_RECIPIENTS", "age1recipient")
+    forbid_secrets.preflight()
+    forbid_secrets.preflight()
+    assert runs == list(CHECKS) * 2
+
+
+def test_preflight_is_skipped_while_nothing_changed(environment):
+    """A matching snapshot skips every check."""
+    _, runs = environment
+    run_preflight()
+    assert os.path.isfile(snapshot_path())
+    run_preflight()
+    assert runs == list(CHECKS)
+
+
+@pytest.mark.parametrize(
+    "change",
+    ["public_key", "sops_yaml", "variable", "tool", "cwd"],
+)
+def test_preflight_runs_again_after_a_change(environment, monkeypatch, change):
+    """Changing a checked file, variable, binary or directory reruns them."""
+    repo, runs = environment
+    run_preflight()
+    if change == "public_key":
+        (repo / ".age.pub").write_text("age1other-public-key\n")
+    elif change == "sops_yaml":
+        (repo / ".sops.yaml").write_text("creation_rules: []\n")
+    elif change == "variable":
+        monkeypatch.setenv("SOPS_AGE_RECIPIENTS", "age1recipient")
+    elif change == "tool":
+        sops = repo.parent / "bin" / "sops"
+        sops.write_text("#!/bin/sh\n# upgraded\n")
+    else:
+        (repo / "sub").mkdir()
+        monkeypatch.chdir(repo / "sub")
+    run_preflight()
+    assert runs == list(CHECKS) * 2
+
+
+def test_failed_preflight_is_not_recorded(environment, monkeypatch):
+    """Checks that fail exit, and run again next time."""
+    _, runs = environment
+
+    def fail():
+        runs.append("check_sops_installed")
+        raise SystemExit(1)
+
+    monkeypatch.setattr(forbid_secrets, "check_sops_installed", fail)
+    with pytest.raises(SystemExit):
+        run_preflight()
+    assert not os.path.exists(snapshot_path())
+    with pytest.raises(SystemExit):
+        run_preflight()
+    assert runs == list(CHECKS) * 2
+
+
+def test_read_key_file_reads_one_line(tmp_path):
+    """A key line is read without reading the whole file into a list."""
+    path = tmp_path / "keys.txt"
+    path.write_text("# created\n AGE-SECRET-KEY-1 \n")
+    manager = forbid_secrets.SecretsManager.__new__(
+        forbid_secrets.SecretsManager
+    )
+    # pylint: disable=protected-access
+    assert manager._read_key_file(str(path), 1) == "AGE-SECRET-KEY-1"
+    assert manager._read_key_file(str(path), 2) is None
+    assert manager._read_key_file(str(path)).endswith("AGE-SECRET-KEY-1")
@@ -0,0 +1,173 @@
+"""
+Tests for excluding files with regex patterns and gitignore-style globs.
+"""
+
+import re
+import subprocess
+
+import pytest
+
+from benchmarks.corpus import SAMPLE_SECRETS
+from hooks import git
+from hooks.exclude import ExcludeMatcher, parse_glob
+from hooks.forbid_secrets import is_excluded, main
+from hooks.watch import walk_files
+
+IGNORE = """\
+# Logs, except one
+*.log
+!keep.log
+/build
+vendor/
+!vendor/ok.yaml
+docs/**/*.yaml
+**/tmp/*.yml
+foo?.yaml
+[!x]y.yaml
+\\#hash
+charts/*/secrets/
+"""
+
+
+@pytest.fixture(name="repo")
+def fixture_repo(tmp_path, monkeypatch):
+    """Creates a repository with an ignore file and makes it current."""
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    (tmp_path / ".forbidsecretsignore").write_text(IGNORE)
+    monkeypatch.chdir(tmp_path)
+    git._rev_parse.cache_clear()  # pylint: disable=protected-access
+    yield tmp_path
+    git._rev_parse.cache_clear()  # pylint: disable=protected-access
+
+
+def matcher(root, cwd=None):
+    """Returns a matcher of the globs of IGNORE."""
+    globs = [parse_glob(line) for line in IGNORE.splitlines()]
+    return ExcludeMatcher(
+        (), [g for g in globs if g is not None], str(root), cwd
+    )
+
+
+@pytest.mark.parametrize(
+    "path, excluded",
+    [
+        ("x.log", True),
+        ("sub/x.log", True),
+        ("sub/keep.log", False),
+        ("build/a.yaml", True),
+        ("sub/build/a.yaml", False),
+        ("vendor/a.yaml", True),
+        ("sub/vendor/b.yaml", True),
+        # A file of an excluded directory cannot be included again
+        ("vendor/ok.yaml", True),
+        ("docs/a.yaml", True),
+        ("docs/x/y/a.yaml", True),
+        ("docs/a.yml", False),
+        ("tmp/a.yml", True),
+        ("q/tmp/a.yml", True),
+        ("q/tmp/z/a.yml", False),
+        ("foo1.yaml", True),
+        ("foo12.yaml", False),
+        ("ay.yaml", True),
+        ("xy.yaml", False),
+        ("#hash", True),
+        ("charts/c/secrets/s.yaml", True),
+        ("charts/c/d/secrets/s.yaml", False),
+        ("charts/c/secrets", False),
+    ],
+)
+def test_globs_match_like_gitignore(tmp_path, path, excluded):
+    """Globs follow the .gitignore rules, as checked with git."""
+    assert matcher(tmp_path, tmp_path).excluded(path) == excluded
+
+
+def test_paths_are_matched_from_the_root(tmp_path):
+    """Relative paths are resolved from the current directory."""
+    (tmp_path / "sub").mkdir()
+    from_sub = matcher(tmp_path, tmp_path / "sub")
+    assert from_sub.excluded("x.log")
+    assert not from_sub.excluded("build/a.yaml")
+    assert from_sub.excluded("../build/a.yaml")
+    assert from_sub.excluded(str(tmp_path / "build" / "a.yaml"))
+    assert not from_sub.excluded("../../outside/build/a.yaml")
+    assert from_sub.excluded_directory(str(tmp_path / "vendor"))
+
+
+def test_regex_patterns_are_combined():
+    """Combined regexes match as the patterns would one by one."""
+    patterns = [
+        r"^k8s/",
+        r"(a)\1",
+        "(?i)^README",
+        r"^tmpl|\.tpl$",
+        r"(?P<x>\.j2)$",
+    ]
+    paths = ["k8s/a.yaml", "xaa.yaml", "a.yaml.j2", "readme.md", "b/c.tpl"]
+    for count in (2, 3, 4, 5):
+        # The same group name twice cannot be combined
+        subset = patterns[:count] + (["(?P<x>tmpl)/"] if count == 5 else [])
+        for path in paths + ["tmpl/a"]:
+            expected = any(re.search(p, path) for p in subset)
+            assert is_excluded(path, ExcludeMatcher(subset)) == expected
+            assert is_excluded(path, subset) == expected
+
+
+@pytest.mark.parametrize(
+    "pattern, anchored",
+    [
+        (r"^k8s/", True),
+        (r"\Ak8s/", True),
+        (r"^(a|b)/", True),
+        (r"^[|]", True),
+        (r"^a|b", False),
+        (r"^(?:a)|b", False),
+        (r"^[]([]|b", False),
+        (r"^a(?#(|)|b", False),
+        (r"(^a)", False),
+    ],
+)
+def test_anchored_patterns_are_only_tried_at_the_start(pattern, anchored):
+    """Patterns that can match elsewhere are searched for, like the others."""
+    # pylint: disable=protected-access
+    assert (ExcludeMatcher([pattern])._anchored is not None) == anchored
+    for path in ("a/b", "b/a", "k8s/x", "|x", "x/(", "a"):
+        expected = re.search(pattern, path) is not None
+        assert ExcludeMatcher([pattern]).excluded(path) == expected
+
+
+def test_excluded_directories_are_pruned(tmp_path):
+    """Walks skip excluded directories without looking at their files."""
+    for name in ("a.yaml", "vendor/b.yaml", "vendor/deep/c.yaml"):
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text("a: b\n")
+    excludes = matcher(tmp_path, tmp_path)
+    seen = []
+
+    def include(path):
+        seen.append(path)
+        return True
+
+    paths = [
+        path
+        for path, _ in walk_files(
+            str(tmp_path), include, excludes.excluded_directory
+        )
+    ]
+    assert [p for p in paths if p.endswith(".yaml")] == [
+        str(tmp_path / "a.yaml")
+    ]
+    assert not any("vendor" in path for path in seen)
+
+
+def test_main_skips_ignored_files(
+    repo, no_preflight, capsys
+):  # pylint: disable=unused-argument
+    """Files matched by .forbidsecretsignore are not scanned."""
+    (repo / "vendor").mkdir()
+    (repo / "vendor" / "a.yaml").write_text(f"{SAMPLE_SECRETS['jwt']}\n")
+    (repo / "app.yaml").write_text("a: b\n")
+    argv = ["--hook-id", "jwt", "--no-cache", "vendor/a.yaml", "app.yaml"]
+    assert main(argv) == 0
+    with pytest.raises(SystemExit):
+        main(argv + ["--exclude", "("])
+    assert "invalid --exclude pattern" in capsys.readouterr().err
@@ -0,0 +1,105 @@
+"""
+Tests for scanning files and the forbid_secrets command line.
+"""
+
+import os
+
+import pytest
+
+from benchmarks.corpus import SAMPLE_SECRETS
+from hooks import forbid_secrets
+from hooks.forbid_secrets import main, resolve_hook_ids, scan_file, scan_files
+
+TESTS_DIR = os.path.dirname(__file__)
+
+
+def fixture(name):
+    """Returns the path of a test fixture."""
+    return os.path.join(TESTS_DIR, name)
+
+
+def test_scan_file_kubernetes_secret():
+    """Unencrypted Kubernetes Secrets are found."""
+    result = scan_file(fixture("secret-fail.yaml"), ["kubernetes-secret"])
+    assert result.kubernetes_secret and result.found
+    assert not scan_file(fixture("secret-fail.yaml"), ["jwt"]).found
+
+
+def test_kubernetes_secret_per_document(tmp_path):
+    """Only Secret documents without SOPS metadata count as unencrypted."""
+    encrypted = (
+        "apiVersion: v1\nkind: Secret\ndata:\n  a: ENC[AES256_GCM,data:x]\n"
+        "sops:\n  version: 3.8.1\n"
+    )
+    path = tmp_path / "bundle.yaml"
+    path.write_text(
+        f"kind: ConfigMap\ndata:\n  kind: Secret\n---\n{encrypted}",
+        encoding="utf-8",
+    )
+    context = forbid_secrets.ScanContext(str(path))
+    candidates = forbid_secrets.kubernetes_secret_candidates(context.content)
+    assert len(list(candidates)) == 2
+    assert not context.kubernetes_secret
+
+    path.write_text(
+        f"{encrypted}---\n{{\"kind\": \"Secret\", \"data\": {{}}}}\n",
+        encoding="utf-8",
+    )
+    assert forbid_secrets.ScanContext(str(path)).kubernetes_secret
+
+
+def test_kubernetes_secret_probe_skips_parsing(tmp_path):
+    """Files without a Secret kind are not parsed, even if invalid YAML."""
+    path = tmp_path / "template.yaml"
+    path.write_text(
+        "kind: ConfigMap\ndata: {{ .Values }}: [\n", encoding="utf-8"
+    )
+    assert not scan_file(str(path), ["kubernetes-secret"]).errors
+
+
+def test_scan_file_missing_file():
+    """Unreadable files are reported as errors instead of raising."""
+    result = scan_file(fixture("missing.yaml"), ["jwt"])
+    assert result.errors and not result.found
+
+
+def test_scan_files_parallel_matches_serial(manifests, monkeypatch):
+    """Parallel results come back in the same order as serial ones."""
+    monkeypatch.setattr(forbid_secrets, "PARALLEL_MIN_FILES", 2)
+    hook_ids = list(SAMPLE_SECRETS)
+    serial = list(scan_files(manifests, hook_ids, jobs=1))
+    parallel = list(scan_files(manifests, hook_ids, jobs=3))
+    assert parallel == serial
+    assert [r.filename for r in parallel] == manifests
+
+
+def test_main_parallel_output_matches_serial(
+    manifests, no_preflight, capsys
+):  # pylint: disable=unused-argument
+    """--jobs changes neither the output order nor the exit code."""
+    argv = ["--hook-id", "all", "--no-cache", *manifests]
+    assert main(argv + ["--jobs", "1"]) == 1
+    serial = capsys.readouterr().out
+    assert main(argv + ["--jobs", "3"]) == 1
+    parallel = capsys.readouterr().out
+
+    def strip(output):
+        return [line.split(" ", 4)[-1] for line in output.splitlines()]
+
+    assert strip(parallel) == strip(serial)
+    assert "manifest-00.yaml" in serial
+
+
+def test_scan_file_reads_each_file_once(tmp_path):
+    """The encryption check, kind probe and detectors share one read."""
+    path = tmp_path / "secret.yaml"
+    path.write_text(
+        "apiVersion: v1\nkind: Secret\n"
+        f"data:\n  {SAMPLE_SECRETS['jwt']}\n",
+        encoding="utf-8",
+    )
+    reads = forbid_secrets.ScanContext.reads
+    result = scan_file(str(path), resolve_hook_ids("all"))
+    assert result.kubernetes_secret
+    assert result.detectors == ["jwt"]
+    assert forbid_secrets.ScanContext.reads == reads + 1
@@ -0,0 +1,224 @@
+"""
+Tests for the git helpers and scanning staged content.
+"""
+
+import subprocess
+
+import pytest
+
+from benchmarks.corpus import SAMPLE_SECRETS
+from hooks import git
+from hooks.cache import ScanCache, blob_sha
+from hooks.exclude import ExcludeMatcher
+from hooks.forbid_secrets import scan_staged
+from hooks.git import CatFile, staged_changes, staged_files
+from hooks.history import HistoryFinding, scan_history, scan_history_main
+
+
+@pytest.fixture(name="repo")
+def fixture_repo(tmp_path, monkeypatch):
+    """Creates a git repository and makes it the current directory."""
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    monkeypatch.chdir(tmp_path)
+    git._rev_parse.cache_clear()  # pylint: disable=protected-access
+    yield tmp_path
+    git._rev_parse.cache_clear()  # pylint: disable=protected-access
+
+
+def stage(repo, name, content):
+    """Writes a file and stages it."""
+    (repo / name).write_text(content, encoding="utf-8")
+    subprocess.run(["git", "add", name], check=True)
+
+
+def test_staged_files(repo):
+    """Staged files are listed, deleted and unstaged ones are not."""
+    stage(repo, "a.yaml", "a: b\n")
+    stage(repo, "with space.yaml", "a: b\n")
+    (repo / "unstaged.yaml").write_text("a: b\n", encoding="utf-8")
+    assert sorted(staged_files()) == ["a.yaml", "with space.yaml"]
+
+
+def test_cat_file_reads_staged_blobs(repo):
+    """Blobs are read from the index through one process."""
+    stage(repo, "a.yaml", "a: b\n")
+    (repo / "a.yaml").write_text("changed\n", encoding="utf-8")
+    with CatFile() as cat_file:
+        assert cat_file.read_staged("a.yaml") == (
+            blob_sha(b"a: b\n"),
+            b"a: b\n",
+        )
+        assert cat_file.read_staged("missing.yaml") is None
+        assert cat_file.read_staged("a b.yaml") is None
+        assert cat_file.read_staged("a 1 b.yaml") is None
+        assert cat_file.read_staged("a.yaml")[1] == b"a: b\n"
+
+
+def test_scan_staged_scans_what_is_committed(repo):
+    """A secret only in the staged blob is found, one only on disk is not."""
+    stage(repo, "staged.yaml", f"{SAMPLE_SECRETS['jwt']}\n")
+    (repo / "staged.yaml").write_text("a: b\n", encoding="utf-8")
+    stage(repo, "clean.yaml", "a: b\n")
+    (repo / "clean.yaml").write_text(
+        f"{SAMPLE_SECRETS['jwt']}\n", encoding="utf-8"
+    )
+
+    results = list(scan_staged(["staged.yaml", "clean.yaml"], ["jwt"]))
+    assert [r.detectors for r in results] == [["jwt"], []]
+    assert results[0].blob == blob_sha(f"{SAMPLE_SECRETS['jwt']}\n".encode())
+
+
+def test_scan_staged_uses_cache(repo):
+    """Verdicts of staged blobs are cached by blob SHA."""
+    stage(repo, "a.yaml", f"{SAMPLE_SECRETS['jwt']}\n")
+    with ScanCache(str(repo / "scan.sqlite3")) as cache:
+        first = list(scan_staged(["a.yaml"], ["jwt"], cache))
+        second = list(scan_staged(["a.yaml"], ["jwt"], cache))
+        assert cache.hits == 1
+    assert first == second
+
+
+def commit(message):
+    """Commits the staged files and returns the commit SHA."""
+    subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", "commit"]
+        + ["-qm", message],
+        check=True,
+    )
+    return subprocess.run(
+        ["git", "rev-parse", "HEAD"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip()
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_scan_history(repo, jobs):
+    """Each secret is reported once, at its first commit and path."""
+    secret = f"{SAMPLE_SECRETS['jwt']}\n"
+    stage(repo, "clean.yaml", "a: b\n")
+    commit("clean")
+    stage(repo, "old.yaml", secret)
+    added = commit("secret")
+    subprocess.run(["git", "mv", "old.yaml", "new.yaml"], check=True)
+    stage(repo, "copy.yaml", secret)
+    (repo / "binary.bin").write_bytes(b"\xff\xfe\x00")
+    subprocess.run(["git", "add", "binary.bin"], check=True)
+    commit("copy")
+    subprocess.run(["git", "rm", "-q", "new.yaml", "copy.yaml"], check=True)
+    commit("remove")
+
+    sha = blob_sha(secret.encode())
+    assert scan_history("HEAD", ["jwt"], jobs=jobs) == [
+        HistoryFinding(sha, added, "old.yaml", False, ["jwt"])
+    ]
+    assert not scan_history(f"{added}..HEAD", ["jwt"], jobs=jobs)
+    assert not scan_history("HEAD", ["jwt"], excludes=ExcludeMatcher(["yaml$"]))
+
+
+def test_scan_history_excludes_blobs_at_every_path(repo):
+    """A blob is only skipped when every path it was added at is excluded."""
+    secret = f"{SAMPLE_SECRETS['jwt']}\n"
+    (repo / "vendor").mkdir()
+    stage(repo, "vendor/x.yaml", secret)
+    commit("vendored")
+    stage(repo, "app.yaml", secret)
+    commit("copied")
+
+    for pattern in (r"^vendor/", r"^app\.yaml$"):
+        excludes = ExcludeMatcher([pattern])
+        findings = scan_history("HEAD", ["jwt"], excludes=excludes)
+        assert [f.detectors for f in findings] == [["jwt"]]
+    excludes = ExcludeMatcher([r"^vendor/", r"^app\.yaml$"])
+    assert not scan_history("HEAD", ["jwt"], excludes=excludes)
+
+
+def test_scan_history_reports_errors(repo, capsys):
+    """Blobs that cannot be parsed are reported and not cached."""
+    stage(repo, "broken.yaml", "kind: Secret\ndata: [\n")
+    commit("broken")
+    with ScanCache(str(repo / "scan.sqlite3")) as cache:
+        for _ in range(2):
+            findings = scan_history("HEAD", ["kubernetes-secret"], cache=cache)
+            assert [f.path for f in findings] == ["broken.yaml"]
+            assert "Error parsing YAML" in findings[0].errors[0]
+    assert (
+        scan_history_main("HEAD", ["kubernetes-secret"], 1, None, None, print)
+        == 0
+    )
+    assert "broken.yaml at commit" in capsys.readouterr().out
+
+
+def test_staged_changes(repo):
+    """The lines added by each hunk are listed, new files have no hunks."""
+    stage(repo, "a.yaml", "".join(f"line{i}\n" for i in range(10)))
+    commit("a")
+    stage(repo, "a.yaml", "line0\n+++ b\nline2\nline3\nline4\n")
+    stage(repo, "sub dir.yaml", "new\n")
+    changes = staged_changes(["a.yaml", "sub dir.yaml", "clean.yaml"])
+    assert changes["a.yaml"].hunks == [b"+++ b\n"]
+    assert changes["a.yaml"].blob == blob_sha(
+        b"line0\n+++ b\nline2\nline3\nline4\n"
+    )
+    assert changes["sub dir.yaml"].hunks is None
+    assert "clean.yaml" not in changes
+
+
+def test_scan_staged_incremental(repo):
+    """Only added lines are scanned, unless a PEM block straddles a hunk."""
+    rsa = SAMPLE_SECRETS["rsa-private-key"].split("\n")
+    old = f"{SAMPLE_SECRETS['jwt']}\n{rsa[0]}\n{rsa[1]}\n"
+    stage(repo, "values.yaml", old)
+    commit("values")
+    stage(repo, "values.yaml", f"{old}{SAMPLE_SECRETS['gcp-api-key']}\n")
+    stage(repo, "new.yaml", f"{SAMPLE_SECRETS['jwt']}\n")
+    hook_ids = ["jwt", "gcp-api-key", "rsa-private-key"]
+
+    results = list(
+        scan_staged(["values.yaml", "new.yaml"], hook_ids, incremental=True)
+    )
+    assert [r.detectors for r in results] == [["gcp-api-key"], ["jwt"]]
+
+    stage(repo, "values.yaml", f"{old}{rsa[2]}\n{rsa[3]}\n")
+    (result,) = scan_staged(["values.yaml"], hook_ids, incremental=True)
+    assert result.detectors == ["jwt", "rsa-private-key"]
+
+
+def test_scan_staged_incremental_inside_pem_block(repo):
+    """A hunk changing the body of a key alone is scanned with the key."""
+    rsa = SAMPLE_SECRETS["rsa-private-key"].split("\n")
+    lines = ["a: b", *rsa[:2], "  AAAA", rsa[3], "c: d"]
+    stage(repo, "key.pem", "\n".join(lines) + "\n")
+    commit("key")
+    lines[3] = rsa[2]
+    stage(repo, "key.pem", "\n".join(lines) + "\n")
+    hook_ids = ["rsa-private-key"]
+
+    changes = staged_changes(["key.pem"])
+    assert changes["key.pem"].hunks == [f"{rsa[2]}\n".encode()]
+    assert changes["key.pem"].lines == [(4, 1)]
+    (result,) = scan_staged(["key.pem"], hook_ids, incremental=True)
+    assert result.detectors == ["rsa-private-key"]
+
+    commit("key")
+    lines[5] = "c: e"
+    stage(repo, "key.pem", "\n".join(lines) + "\n")
+    (result,) = scan_staged(["key.pem"], hook_ids, incremental=True)
+    assert result.detectors == []
+
+
+def test_scan_staged_incremental_kubernetes_secret(repo):
+    """Decrypting a Secret is caught although its kind line is unchanged."""
+    secret = "apiVersion: v1\nkind: Secret\ndata:\n  password: {}\n"
+    stage(
+        repo,
+        "secret.yaml",
+        secret.format("ENC[AES256_GCM,data:eA==]") + "sops:\n  version: 3\n",
+    )
+    commit("encrypted")
+    stage(repo, "secret.yaml", secret.format("eA=="))
+    (result,) = scan_staged(
+        ["secret.yaml"], ["kubernetes-secret"], incremental=True
+    )
+    assert result.kubernetes_secret and result.found
@@ -0,0 +1,80 @@
+"""
+Tests for the log of the hooks.
+"""
+
+import io
+
+from hooks.forbid_secrets import main
+from hooks.log import BUFFER_LINES, COLOR_CODES, Logger
+
+
+def test_settings_are_resolved_once(monkeypatch):
+    """DEBUG_LEVEL is read when the log is created, not per message."""
+    monkeypatch.setenv("DEBUG_LEVEL", "ERROR")
+    stream = io.StringIO()
+    logger = Logger(stream)
+    monkeypatch.setenv("DEBUG_LEVEL", "INFO")
+    logger.debug(2, "shown")
+    logger.debug(3, "hidden")
+    logger.debug(5, "fatal")
+    logger.flush()
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 2
+    assert lines[0].endswith("ERROR:\tshown")
+    assert lines[1].endswith("FATAL:\tfatal")
+    assert logger.enabled(2) and not logger.enabled(3)
+
+
+def test_lines_are_written_in_batches():
+    """Lines are held until flushed or the buffer is full."""
+    stream = io.StringIO()
+    logger = Logger(stream)
+    logger.debug(1, "a", "b")
+    assert stream.getvalue() == ""
+    logger.flush()
+    assert stream.getvalue().endswith("WARN:\ta b\n")
+    for _ in range(BUFFER_LINES):
+        logger.debug(0, "line")
+    assert stream.getvalue().count("\n") == BUFFER_LINES + 1
+
+    unbuffered = Logger(stream, buffered=False)
+    unbuffered.debug(0, "now")
+    assert stream.getvalue().endswith("INFO:\tnow\n")
+
+
+def test_colors_only_for_terminals(monkeypatch):
+    """Colors are used on terminals, or when FORCE_COLOR asks for them."""
+    monkeypatch.delenv("NO_COLOR", raising=False)
+    monkeypatch.delenv("FORCE_COLOR", raising=False)
+    stream = io.StringIO()
+    Logger(stream, buffered=False).debug(1, "plain")
+    assert "\033[" not in stream.getvalue()
+
+    monkeypatch.setenv("FORCE_COLOR", "1")
+    Logger(stream, buffered=False).debug(1, "colored")
+    assert f"{COLOR_CODES[1]}colored" in stream.getvalue()
+
+    monkeypatch.setenv("NO_COLOR", "1")
+    stream = io.StringIO()
+    Logger(stream, buffered=False).debug(1, "plain")
+    assert "\033[" not in stream.getvalue()
+
+
+def test_quiet_prints_only_the_summary(
+    manifests, no_preflight, capsys
+):  # pylint: disable=unused-argument
+    """--quiet drops the messages logged per file."""
+    argv = ["--detectors", "all,high-entropy-string", "--no-cache", "--jobs"]
+    argv += ["1"] + manifests
+    assert main(argv) == 1
+    output = capsys.readouterr().out
+    assert "Detected potential" in output
+
+    assert main(["--quiet"] + argv) == 1
+    lines = capsys.readouterr().out.splitlines()
+    assert "Detected potential" not in "\n".join(lines)
+    assert sum("Potential unencrypted secret" in line for line in lines) == 8
+    assert all(
+        "Potential unencrypted secret" in line or "Secrets were" in line
+        for line in lines
+    )
@@ -0,0 +1,142 @@
+"""
+Tests for loading custom detectors from the repository configuration.
+"""
+
+import subprocess
+
+import pytest
+
+from hooks import git, registry
+from hooks.detectors import (
+    DETECTORS,
+    SECRET_CHECKS,
+    DetectorEngine,
+    resolve_hook_ids,
+)
+from hooks.forbid_secrets import main
+from hooks.registry import load_detectors
+from hooks.report import find_secrets
+
+YAML_CONFIG = """\
+detectors:
+  - id: acme-token
+    pattern: acme_[A-Za-z0-9]{16}
+    flags: [IGNORECASE]
+    severity: warning
+  - id: high-entropy-string
+    type: entropy
+    base64_threshold: 5.5
+"""
+
+TOML_CONFIG = """\
+[[detectors]]
+id = "acme-token"
+pattern = "acme_[A-Za-z0-9]{16}"
+flags = ["IGNORECASE"]
+severity = "warning"
+"""
+
+
+@pytest.fixture(name="repo")
+def fixture_repo(tmp_path, monkeypatch):
+    """Creates a repository, makes it current and restores the built-ins."""
+    repo = tmp_path / "repo"
+    subprocess.run(["git", "init", "-q", str(repo)], check=True)
+    monkeypatch.chdir(repo)
+    git._rev_parse.cache_clear()  # pylint: disable=protected-access
+    yield repo
+    registry.register([])
+    monkeypatch.setattr(registry, "_registered", [])
+    git._rev_parse.cache_clear()  # pylint: disable=protected-access
+
+
+@pytest.mark.parametrize(
+    "name, config",
+    [
+        (".forbid-secrets.yaml", YAML_CONFIG),
+        (".forbid-secrets.toml", TOML_CONFIG),
+    ],
+)
+def test_custom_detectors_are_registered(repo, name, config):
+    """Custom detectors join "all", the engine and the reports."""
+    (repo / name).write_text(config, encoding="utf-8")
+    assert load_detectors()[0] == "acme-token"
+    assert "acme-token" in resolve_hook_ids("all", None)
+
+    content = "a: b\ntoken: ACME_0123456789abcdef\n"
+    engine = DetectorEngine.for_ids(["jwt", "acme-token"])
+    assert list(engine.scan(content)) == ["acme-token"]
+    assert SECRET_CHECKS["acme-token"](content)
+    [finding] = find_secrets("a.yaml", content, ["acme-token"])
+    assert (finding.line, finding.column) == (2, 8)
+    assert finding.severity == "warning"
+
+
+def test_custom_detector_replaces_builtin(repo):
+    """A detector with the id of a built-in one replaces it."""
+    builtin = DETECTORS["high-entropy-string"]
+    (repo / ".forbid-secrets.yaml").write_text(YAML_CONFIG, encoding="utf-8")
+    load_detectors()
+    assert DETECTORS["high-entropy-string"].base64_threshold == 5.5
+    assert not SECRET_CHECKS["high-entropy-string"](
+        "password: Zx8qL2vN7pR4tW9yB3mK6hJ1\n"
+    )
+
+    (repo / ".forbid-secrets.yaml").unlink()
+    assert not load_detectors()
+    assert DETECTORS["high-entropy-string"] is builtin
+    assert "acme-token" not in SECRET_CHECKS
+
+
+def test_rules_are_parsed_once_per_version(repo, monkeypatch):
+    """Unchanged rules are read back from the git directory."""
+    parsed = []
+    parse = registry.parse_rules
+
+    def counting_parse(path, data):
+        parsed.append(path)
+        return parse(path, data)
+
+    monkeypatch.setattr(registry, "parse_rules", counting_parse)
+    config = repo / ".forbid-secrets.yaml"
+    config.write_text(YAML_CONFIG, encoding="utf-8")
+    load_detectors()
+    load_detectors()
+    monkeypatch.setattr(registry, "_registered", [])  # A new process
+    assert load_detectors() == ["acme-token", "high-entropy-string"]
+    assert len(parsed) == 1
+
+    config.write_text(YAML_CONFIG.replace("acme_", "acme-"), encoding="utf-8")
+    load_detectors()
+    assert len(parsed) == 2
+    assert DETECTORS["acme-token"].pattern.startswith("acme-")
+
+
+@pytest.mark.parametrize(
+    "rule, error",
+    [
+        ("{id: Bad Id, pattern: x}", "id must be"),
+        ("{id: all, pattern: x}", "reserved"),
+        ("{id: a, pattern: '(?i)x'}", "invalid pattern"),
+        ("{id: a, pattern: '['}", "invalid pattern"),
+        ("{id: a, pattern: x, flags: [VERBOSE]}", "flags must be"),
+        ("{id: a, pattern: '(\\w+\\.?)+x'}", "backtrack catastrophically"),
+        ("{id: a, pattern: x, severity: fatal}", "severity must be"),
+        ("{id: a, pattern: acme_x, prefix: acme-}", "prefix must start"),
+        ("{id: a, pattern: '(?:acme_)x', prefix: acme_}", "prefix must"),
+        ("{id: a, type: entropy, min_length: many}", "must be a number"),
+    ],
+)
+def test_invalid_rules_are_reported(repo, rule, error):
+    """Mistakes are reported with the file and detector they are in."""
+    (repo / ".forbid-secrets.yaml").write_text(f"detectors:\n  - {rule}\n")
+    with pytest.raises(ValueError, match=error) as raised:
+        load_detectors()
+    assert ".forbid-secrets.yaml: detector 1" in str(raised.value)
+
+
+def test_main_fails_on_invalid_configuration(repo, capsys):
+    """An invalid configuration stops the hook before scanning."""
+    (repo / ".forbid-secrets.yaml").write_text("detectors: {}\n")
+    assert main(["--hook-id", "all", "--no-cache"]) == 1
+    assert "expected a list of detectors" in capsys.readouterr().err
@@ -0,0 +1,87 @@
+"""
+Tests for scanning large files from a memory map or a stream.
+"""
+
+import io
+import mmap
+
+import pytest
+
+from benchmarks.corpus import SAMPLE_SECRETS
+from hooks import forbid_secrets
+from hooks.detectors import SECRET_CHECKS, DetectorEngine
+from hooks.forbid_secrets import ScanContext, has_kubernetes_secret, scan_file
+from hooks.scan import (
+    large_file_kubernetes_secret,
+    scan_large_file,
+    scan_stream,
+)
+
+FILLER = b"key: value\n" * 1000
+
+
+@pytest.mark.parametrize("hook_id", list(SAMPLE_SECRETS))
+def test_stream_finds_secrets_across_chunk_boundaries(hook_id):
+    """A secret split between two chunks is still found."""
+    secret = SAMPLE_SECRETS[hook_id].encode()
+    content = FILLER + secret + b"\n" + FILLER
+    engine = DetectorEngine.for_ids(SECRET_CHECKS)
+    expected = list(engine.scan(content.decode()))
+    for split in (1, len(secret) // 2, len(secret) - 1):
+        chunk_size = len(FILLER) + split
+        stream = io.BytesIO(content)
+        result = scan_stream(stream, engine, chunk_size, overlap=1024)
+        assert result == (False, expected)
+
+
+def test_stream_detects_encryption():
+    """Encrypted streams report no detectors."""
+    content = FILLER + b"ENC[AES256_GCM,data:abc,type:str]\n"
+    content += SAMPLE_SECRETS["jwt"].encode()
+    engine = DetectorEngine.for_ids(["jwt"])
+    assert scan_stream(io.BytesIO(content), engine, 4096, 1024) == (True, [])
+
+
+def test_large_files_are_memory_mapped(tmp_path, monkeypatch):
+    """Files over the threshold go through the memory-mapped path."""
+    path = tmp_path / "large.yaml"
+    path.write_bytes(FILLER + SAMPLE_SECRETS["gcp-api-key"].encode() + FILLER)
+    hook_ids = list(SECRET_CHECKS)
+    assert scan_large_file(str(path), hook_ids) == (False, ["gcp-api-key"])
+
+    monkeypatch.setattr(forbid_secrets, "LARGE_FILE_THRESHOLD", 1024)
+    assert scan_file(str(path), hook_ids).detectors == ["gcp-api-key"]
+
+
+@pytest.mark.parametrize("codec", ["utf-8", "utf-16"])
+@pytest.mark.parametrize("mapped", [True, False])
+@pytest.mark.parametrize(
+    "document, expected",
+    [
+        ("kind: Secret\nstringData:\n  a: b\n", True),
+        ("kind: Secret\nsops:\n  version: 3.8.1\n", False),
+        ("kind: ConfigMap\ndata:\n  kind: Secret\n", False),
+    ],
+)
+def test_large_files_are_probed_for_secrets(
+    tmp_path, monkeypatch, codec, mapped, document, expected
+):
+    """Secret documents are found without reading the whole file."""
+    path = tmp_path / "large.yaml"
+    text = FILLER.decode() + "---\n" + document + "---\n" + FILLER.decode()
+    path.write_text(text, encoding=codec, newline="")
+    assert has_kubernetes_secret(str(path)) == expected
+
+    if not mapped:
+
+        def unmappable(*args, **kwargs):
+            raise OSError("cannot map")
+
+        monkeypatch.setattr(mmap, "mmap", unmappable)
+    assert large_file_kubernetes_secret(str(path), codec) == expected
+
+    monkeypatch.setattr(forbid_secrets, "LARGE_FILE_THRESHOLD", 1024)
+    reads = ScanContext.reads
+    result = scan_file(str(path), ["kubernetes-secret", "jwt"])
+    assert result.kubernetes_secret == expected and not result.errors
+    assert ScanContext.reads == reads
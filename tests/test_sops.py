@@ -0,0 +1,143 @@
+"""
+Tests for running sops on batches of files, using a fake sops stand-in.
+"""
+
+import subprocess
+
+import pytest
+
+from benchmarks.corpus import install_fake_sops
+from hooks import git, sops
+from hooks.forbid_secrets import SecretsManager
+from hooks.log import Logger
+from hooks.sops import creation_rules, run_sops_batch, sops_keyservice
+
+
+@pytest.fixture(name="fake_sops", autouse=True)
+def fixture_fake_sops(tmp_path, monkeypatch):
+    """Puts the fake sops first on the PATH."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    monkeypatch.setenv("PATH", install_fake_sops(str(bin_dir)))
+    monkeypatch.setenv("FAKE_SOPS_DELAY", "0")
+    monkeypatch.delenv("SOPS_KEYSERVICE", raising=False)
+
+
+def test_batch_reports_failures_without_aborting(tmp_path):
+    """One failing file does not stop the rest of the batch."""
+    paths = []
+    for name in ("a.yaml", "fail.yaml", "b.yaml"):
+        path = tmp_path / name
+        path.write_text("a: b\n", encoding="utf-8")
+        paths.append(str(path))
+
+    results = run_sops_batch("encrypt", paths, jobs=2)
+    assert list(results) == paths
+    assert results[paths[0]] is None and results[paths[2]] is None
+    assert "no matching creation rules" in results[paths[1]]
+    assert "ENC[AES256_GCM" in (tmp_path / "b.yaml").read_text("utf-8")
+
+
+def test_keyservice_only_for_large_batches(monkeypatch):
+    """A shared keyservice is started for large batches only."""
+    with sops_keyservice(1) as address:
+        assert address is None
+    monkeypatch.setattr(sops, "KEYSERVICE_MIN_FILES", 2)
+    with sops_keyservice(2) as address:
+        assert address.startswith("unix://")
+
+
+@pytest.fixture(name="sops_repo")
+def fixture_sops_repo(tmp_path, monkeypatch):
+    """Creates a repository with creation rules and makes it current."""
+    repo = tmp_path / "repo"
+    subprocess.run(["git", "init", "-q", str(repo)], check=True)
+    (repo / ".sops.yaml").write_text(
+        "creation_rules:\n"
+        "  - path_regex: ^secrets/.*\\.yaml$\n"
+        "    age: age1first\n"
+        "  - path_regex: \\.enc\\.yaml$\n"
+        "    age: age1second\n",
+        encoding="utf-8",
+    )
+    (repo / "secrets").mkdir()
+    monkeypatch.chdir(repo)
+    git._rev_parse.cache_clear()  # pylint: disable=protected-access
+    monkeypatch.setattr(sops, "_rules_cache", {})
+    yield repo
+    git._rev_parse.cache_clear()  # pylint: disable=protected-access
+
+
+def test_creation_rules_route_files_like_sops(sops_repo):
+    """Paths are matched relative to .sops.yaml, the first rule wins."""
+    (sops_repo / "sub").mkdir()
+    rules = creation_rules(str(sops_repo / "sub"))
+    assert rules.path == str(sops_repo / ".sops.yaml")
+    routed, unmatched = rules.route(
+        [
+            "secrets/a.yaml",
+            str(sops_repo / "secrets" / "b.enc.yaml"),
+            "app/c.enc.yaml",
+            "values.yaml",
+        ]
+    )
+    assert routed == {
+        "secrets/a.yaml": 0,
+        str(sops_repo / "secrets" / "b.enc.yaml"): 0,
+        "app/c.enc.yaml": 1,
+    }
+    assert unmatched == ["values.yaml"]
+
+    (sops_repo / "sub" / ".sops.yaml").write_text(
+        "creation_rules:\n  - age: age1all\n", encoding="utf-8"
+    )
+    assert creation_rules(str(sops_repo / "sub")).match("values.yaml") == 0
+
+
+def test_creation_rules_are_parsed_once(sops_repo, monkeypatch):
+    """The index is reused, in memory and on disk, until .sops.yaml changes."""
+    parsed = []
+    parse = sops._parse_path_regexes  # pylint: disable=protected-access
+
+    def counting_parse(path):
+        parsed.append(path)
+        return parse(path)
+
+    monkeypatch.setattr(sops, "_parse_path_regexes", counting_parse)
+    assert creation_rules().match("secrets/a.yaml") == 0
+    assert creation_rules().match("secrets/a.yaml") == 0
+    monkeypatch.setattr(sops, "_rules_cache", {})  # A new process
+    assert creation_rules().match("secrets/a.yaml") == 0
+    assert len(parsed) == 1
+
+    (sops_repo / ".sops.yaml").write_text(
+        "creation_rules:\n  - path_regex: \\.yaml$\n", encoding="utf-8"
+    )
+    assert creation_rules().match("values.yaml") == 0
+    assert len(parsed) == 2
+
+
+def test_creation_rules_leave_unknown_configs_to_sops(sops_repo):
+    """Configs that cannot be understood route nothing."""
+    (sops_repo / ".sops.yaml").write_text("[not, a, config]\n")
+    assert creation_rules() is None
+    (sops_repo / ".sops.yaml").write_text(
+        "creation_rules:\n  - path_regex: (?<!\n"
+    )
+    assert creation_rules() is None
+
+
+def test_encrypt_files_skips_unmatched_files(sops_repo):
+    """Files no rule matches fail without running sops."""
+    (sops_repo / "secrets" / "a.yaml").write_text("a: b\n", encoding="utf-8")
+    (sops_repo / "values.yaml").write_text("a: b\n", encoding="utf-8")
+    manager = SecretsManager.__new__(SecretsManager)
+    manager.cache = None
+    manager.warn_only_mode = False
+    manager.logger = Logger()
+
+    failures = manager.encrypt_files(["secrets/a.yaml", "values.yaml"])
+    assert list(failures) == ["values.yaml"]
+    assert "no creation rule" in failures["values.yaml"]
+    assert "ENC[AES256_GCM" in (sops_repo / "secrets" / "a.yaml").read_text()
+    assert (sops_repo / "values.yaml").read_text() == "a: b\n"
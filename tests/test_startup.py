@@ -0,0 +1,75 @@
+"""
+Startup time benchmark for the hooks, based on python -X importtime.
+
+Every hook run pays for importing hooks.forbid_secrets, so importing it must
+not run git or load modules that only some hooks need.
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time budget of hooks.forbid_secrets, in microseconds.
+# It takes about 15ms on a laptop; eagerly importing ruamel.yaml, sqlite3 or
+# concurrent.futures alone would add 20-40ms.
+IMPORT_BUDGET_US = 60_000
+
+# Modules only needed by some hooks or by main(), which must be imported
+# lazily.
+LAZY_MODULES = {
+    "argparse",
+    "concurrent.futures",
+    "dataclasses",
+    "hooks.cache",
+    "importlib.metadata",
+    "ruamel.yaml",
+    "sqlite3",
+    "subprocess",
+}
+
+
+def import_times(module):
+    """Imports a module in a fresh interpreter and returns its import times.
+
+    Args:
+        module: The module to import.
+
+    Returns:
+        A dict of module name to cumulative import time in microseconds.
+    """
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_import_does_not_load_lazy_modules():
+    """Importing the hooks loads neither git nor optional modules."""
+    loaded = set(import_times("hooks.forbid_secrets"))
+    assert not loaded & LAZY_MODULES
+
+
+def test_import_time_budget():
+    """Importing the hooks stays within the startup time budget."""
+    import_times("hooks.forbid_secrets")  # write the bytecode cache
+    best = min(
+        import_times("hooks.forbid_secrets")["hooks.forbid_secrets"]
+        for _ in range(3)
+    )
+    assert best < IMPORT_BUDGET_US, f"import took {best}us"
@@ -0,0 +1,44 @@
+"""
+Tests for the benchmark suite and its synthetic repository.
+"""
+
+import json
+
+from benchmarks import suite
+from benchmarks.corpus import SAMPLE_SECRETS, write_repository
+from hooks.forbid_secrets import scan_file
+
+
+def test_repository_has_a_secret_for_every_detector(tmp_path):
+    """Dirty files cover every detector, encrypted ones look encrypted."""
+    repository = write_repository(
+        str(tmp_path / "repo"), files=40, large_size=64 * 1024
+    )
+    assert sorted(set(repository.secrets.values())) == sorted(SAMPLE_SECRETS)
+    for path, hook_id in repository.secrets.items():
+        assert hook_id in scan_file(path, [hook_id]).detectors
+    assert all(scan_file(p, []).encrypted for p in repository.encrypted)
+    assert scan_file(repository.large[0], ["aws-access-key-id"]).detectors
+
+
+def test_suite_writes_machine_readable_results(tmp_path, capsys):
+    """Every stage is timed and a slower run is flagged as a regression."""
+    results = tmp_path / "results.json"
+    argv = [
+        "--files", "20",
+        "--large-size", "65536",
+        "--repeat", "1",
+        "--sops-delay", "0",
+        "--json", str(results),
+    ]  # fmt: skip
+    assert suite.main(argv) == 0
+    document = json.loads(results.read_text())
+    assert list(document["stages"]) == list(suite.STAGES)
+    assert document["corpus"]["files"] == 21
+    assert all(s["best"] >= 0 for s in document["stages"].values())
+    assert "detection" in capsys.readouterr().out
+
+    baseline = {stage: {"best": 1e-9} for stage in suite.STAGES}
+    assert suite.compare(document["stages"], baseline, 1.25) == list(
+        suite.STAGES
+    )
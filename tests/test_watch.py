@@ -0,0 +1,160 @@
+"""
+Tests for pre-scanning files as they are saved.
+"""
+
+import builtins
+import os
+import time
+
+from benchmarks.corpus import SAMPLE_SECRETS
+from hooks import git
+from hooks.cache import ScanCache
+from hooks.exclude import ExcludeMatcher
+from hooks.forbid_secrets import main, scan_files
+from hooks.watch import (
+    InotifyWatcher,
+    PollingWatcher,
+    batches,
+    walk_files,
+    watch,
+)
+
+
+def is_yaml(path):
+    """Watches YAML files only."""
+    return path.endswith(".yaml")
+
+
+def test_walk_files_skips_git_dir(tmp_path):
+    """Files in .git and unwatched files are not listed."""
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "config.yaml").write_text("a: b\n")
+    (tmp_path / "a.yaml").write_text("a: b\n")
+    (tmp_path / "a.txt").write_text("a: b\n")
+    paths = [path for path, _ in walk_files(str(tmp_path), is_yaml)]
+    assert paths == [str(tmp_path / "a.yaml")]
+
+
+def test_polling_watcher_finds_changes(tmp_path):
+    """New and modified files are found on the next poll."""
+    (tmp_path / "a.yaml").write_text("a: b\n")
+    (tmp_path / "b.yaml").write_text("a: b\n")
+    watcher = PollingWatcher(str(tmp_path), is_yaml, interval=0.01)
+    assert not watcher.wait(0.05)
+
+    (tmp_path / "a.yaml").write_text("changed: value\n")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "c.yaml").write_text("a: b\n")
+    (tmp_path / "c.txt").write_text("a: b\n")
+    assert watcher.wait(0.05) == {
+        str(tmp_path / "a.yaml"),
+        str(tmp_path / "sub" / "c.yaml"),
+    }
+
+
+def test_inotify_watcher_finds_changes(tmp_path):
+    """Saved files, also in new directories, are reported by inotify."""
+    watcher = InotifyWatcher(str(tmp_path), is_yaml)
+    try:
+        assert not watcher.wait(0.01)
+        (tmp_path / "a.yaml").write_text("a: b\n")
+        (tmp_path / "a.txt").write_text("a: b\n")
+        assert watcher.wait(1) == {str(tmp_path / "a.yaml")}
+
+        (tmp_path / "sub").mkdir()
+        assert not watcher.wait(1)
+        (tmp_path / "sub" / "b.yaml").write_text("a: b\n")
+        assert watcher.wait(1) == {str(tmp_path / "sub" / "b.yaml")}
+    finally:
+        watcher.close()
+
+
+class FakeWatcher:  # pylint: disable=too-few-public-methods
+    """Replays a list of changes, one per wait."""
+
+    def __init__(self, changes):
+        self.changes = list(changes)
+        self.timeouts = []
+
+    def wait(self, timeout):
+        """Returns the next change."""
+        self.timeouts.append(timeout)
+        return self.changes.pop(0) if self.changes else set()
+
+
+def test_batches_coalesce_rapid_saves():
+    """Changes are scanned once no change was seen for the debounce delay."""
+    watcher = FakeWatcher([{"a"}, {"a", "b"}, {"a"}, set(), {"c"}])
+    assert list(batches(watcher, debounce=0.5, idle_timeout=0)) == [
+        {"a", "b"},
+        {"c"},
+    ]
+    assert watcher.timeouts[:5] == [1.0, 0.5, 0.5, 0.5, 1.0]
+
+
+def test_batches_end_while_files_keep_changing(monkeypatch):
+    """A file saved more often than the debounce delay is still scanned."""
+    clock = [0.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+
+    class SavingWatcher:  # pylint: disable=too-few-public-methods
+        """Sees a save every 0.25 seconds."""
+
+        def wait(self, timeout):  # pylint: disable=unused-argument
+            """Returns the next save."""
+            clock[0] += 0.25
+            return {"log.yaml"}
+
+    watched = batches(SavingWatcher(), debounce=0.5, max_delay=2.0)
+    assert next(watched) == {"log.yaml"}
+    assert clock[0] == 2.25
+    assert next(watched) == {"log.yaml"}
+    assert clock[0] == 4.5
+
+
+def test_watch_prepares_verdicts(tmp_path, monkeypatch):
+    """The commit-time check finds the verdicts without reading files."""
+    (tmp_path / "clean.yaml").write_text("a: b\n")
+    (tmp_path / "secret.yaml").write_text(f"{SAMPLE_SECRETS['jwt']}\n")
+    (tmp_path / "excluded.yaml").write_text(f"{SAMPLE_SECRETS['jwt']}\n")
+    messages = []
+
+    with ScanCache(str(tmp_path / "scan.sqlite3")) as cache:
+        assert (
+            watch(
+                str(tmp_path),
+                ["jwt"],
+                cache,
+                ExcludeMatcher(["^excluded"]),
+                lambda level, message: messages.append(message),
+                idle_timeout=0,
+            )
+            == 0
+        )
+    assert any("secret.yaml" in message for message in messages)
+    assert not any("excluded.yaml" in message for message in messages)
+
+    opened = []
+    real_open = builtins.open
+
+    def tracking_open(file, *args, **kwargs):
+        opened.append(os.fspath(file))
+        return real_open(file, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", tracking_open)
+    filenames = [str(tmp_path / "clean.yaml"), str(tmp_path / "secret.yaml")]
+    with ScanCache(str(tmp_path / "scan.sqlite3")) as cache:
+        results = list(scan_files(filenames, ["jwt"], cache=cache))
+    assert [result.detectors for result in results] == [[], ["jwt"]]
+    assert not set(opened) & set(filenames)
+
+
+def test_watch_needs_a_cache(tmp_path, monkeypatch, capsys):
+    """Without a git directory to keep the cache in, --watch refuses."""
+    monkeypatch.chdir(tmp_path)
+    git._rev_parse.cache_clear()  # pylint: disable=protected-access
+    try:
+        assert main(["--watch", "--hook-id", "jwt"]) == 1
+    finally:
+        git._rev_parse.cache_clear()  # pylint: disable=protected-access
+    assert "could not be opened" in capsys.readouterr().err